@@ -1,19 +1,51 @@
 import logging
 from flask import Flask, jsonify
 from flask_restx import Api
+from .api.v1 import fieldsets
 from .api.v1.endpoints.users import user_ns as users_api
 from .api.v1.endpoints.places import places_api
 from .api.v1.endpoints.reviews import reviews_api
 from .api.v1.endpoints.amenities import amenities_api
 from .api.v1.endpoints.cities import cities_api
 from .api.v1.endpoints.countries import countries_api
+from . import repositories
+from .models import unit_of_work
+from .persistence import storage
 
 logging.basicConfig(level=logging.DEBUG)
 
-def create_app():
+def create_app(config=None):
+    """
+    Create the Flask application.
+
+    Args:
+        config (dict, optional): Configuration values. `STORAGE_BACKEND`
+            ('json', 'indexed', 'log' or 'sqlite'), `STORAGE_PATH` (path of the
+            data file or database) and `STORAGE_OPTIONS` (other constructor
+            arguments of the backend, such as cache or write-behind settings)
+            configure the persistence manager shared by the models; without
+            them the current one is kept. `REPOSITORY_CACHE_SIZE` sets the number
+            of entities of each type the endpoints keep in memory. `CACHE_CONTROL`
+            maps namespace names, such as 'places', to the Cache-Control header
+            of their GET responses; others get 'no-cache'. Models used
+            during a request share an identity map and their saves are committed
+            together after the request. Defaults to None.
+
+    Returns:
+        Flask: The application.
+    """
     app = Flask(__name__)
+    app.config.from_mapping(config or {})
+    if 'STORAGE_BACKEND' in app.config or 'STORAGE_PATH' in app.config:
+        storage.configure(app.config.get('STORAGE_BACKEND', 'json'), app.config.get('STORAGE_PATH'),
+                          **app.config.get('STORAGE_OPTIONS', {}))
+    if 'REPOSITORY_CACHE_SIZE' in app.config:
+        repositories.configure(app.config['REPOSITORY_CACHE_SIZE'])
+    unit_of_work.init_app(app)
+
     api = Api(app, version='1.0', title='HBnB API',
               description='A simple API for HBnB Evolution project')
+    fieldsets.init_app(app)
 
     api.add_namespace(users_api, path='/api/v1/users')
     api.add_namespace(places_api, path='/api/v1/places')
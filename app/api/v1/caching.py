@@ -0,0 +1,75 @@
+import hashlib
+from functools import wraps
+from flask import current_app, request
+from werkzeug.http import quote_etag
+
+# Cache-Control header of the GET responses of a namespace the
+# `CACHE_CONTROL` setting gives no value for. Clients may keep responses
+# but must revalidate them with their ETag.
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+class NotModified(Exception):
+    """Raised by `check_etag` when the client already holds the representation."""
+
+    def __init__(self, etag):
+        super().__init__(etag)
+        self.etag = etag
+
+def conditional(namespace):
+    """
+    Return the decorator of the resources of a namespace answering conditional GETs.
+
+    It is given to the `decorators` of the Namespace, so it wraps the whole
+    view: a `NotModified` raised while handling the request becomes an
+    empty 304 response, before anything was marshalled. GET responses get
+    the Cache-Control header set for the namespace in the `CACHE_CONTROL`
+    setting, a {namespace name: header} dict, or DEFAULT_CACHE_CONTROL.
+
+    Args:
+        namespace (str): The name of the namespace.
+
+    Returns:
+        function: The decorator of the views of the namespace.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                response = view(*args, **kwargs)
+            except NotModified as e:
+                response = current_app.response_class(status=304, headers={'ETag': e.etag})
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                cache_control = current_app.config.get('CACHE_CONTROL', {}).get(namespace, DEFAULT_CACHE_CONTROL)
+                if cache_control:
+                    response.headers.setdefault('Cache-Control', cache_control)
+            return response
+        return wrapper
+    return decorator
+
+def check_etag(entities, *parts):
+    """
+    Return the strong ETag of a response made of entities, or answer 304 if the client holds it.
+
+    The ETag is derived from the ID and `updated_at` of each entity, which
+    every save changes, as stored rather than parsed, together with the path, query string and field mask
+    of the request, so that it changes with anything the body is made from
+    without serializing it. For a list page the entities act as the version
+    of the collection: adding, deleting or updating one of them changes it.
+
+    Args:
+        entities (list): The entities of the response, or their stored data.
+        *parts: Other values the body depends on, such as the next page link.
+
+    Returns:
+        dict: The ETag header of the response.
+
+    Raises:
+        NotModified: If `If-None-Match` holds the ETag.
+    """
+    stamps = [(entity['id'], entity.get('updated_at')) if isinstance(entity, dict) else (entity.id, entity._updated_at)
+              for entity in entities]
+    mask = request.headers.get(current_app.config.get('RESTX_MASK_HEADER', 'X-Fields'))
+    digest = hashlib.sha1(repr((request.path, request.query_string, mask, stamps, parts)).encode()).hexdigest()
+    if request.if_none_match.contains_weak(digest):
+        raise NotModified(quote_etag(digest))
+    return {'ETag': quote_etag(digest)}
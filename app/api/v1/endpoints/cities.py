@@ -1,38 +1,40 @@
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.caching import check_etag, conditional
+from app.api.v1.fieldsets import FIELDS_PARAMS, requested_fields
+from app.api.v1.pagination import PAGINATION_PARAMS, paginate
+from app.models.city import City
+from app.repositories import repository
 
-cities_api = Namespace('cities', description='Cities operations')
+cities_api = Namespace('cities', description='Cities operations', decorators=[conditional('cities')])
 
 city_model = cities_api.model('City', {
     'id': fields.String(required=True, description='The city identifier'),
     'name': fields.String(required=True, description='The city name'),
     'description': fields.String(required=True, description='The city description'),
+    'country_code': fields.String(description='The code of the country of the city'),
 })
 
-# In-memory database simulation
-cities_db = {}
+cities = repository(City)
 
 @cities_api.route('/')
 class CityList(Resource):
-    @cities_api.doc('list_cities')
+    @cities_api.doc('list_cities', params={**PAGINATION_PARAMS, **FIELDS_PARAMS})
     @cities_api.marshal_list_with(city_model)
     def get(self):
         '''List all cities'''
-        return list(cities_db.values())
+        page, headers = paginate(cities, requested_fields(city_model))
+        return page, 200, {**headers, **check_etag(page, headers.get('Link'))}
 
     @cities_api.doc('create_city')
     @cities_api.expect(city_model)
     @cities_api.marshal_with(city_model, code=201)
     def post(self):
         '''Create a new city'''
-        new_city = cities_api.payload
-        city_id = str(len(cities_db) + 1)
-        new_city['id'] = city_id
-        cities_db[city_id] = new_city
-        return new_city, 201
+        return cities.create(cities_api.payload), 201
 
 @cities_api.route('/<string:city_id>')
 class CityResource(Resource):
-    @cities_api.doc('get_city')
+    @cities_api.doc('get_city', params=FIELDS_PARAMS)
     @cities_api.marshal_with(city_model)
     def get(self, city_id):
         '''Fetch a city given its identifier'''
@@ -48,10 +50,10 @@ class CityResource(Resource):
         Raises:
             404: If the city is not found in the database.
         """
-        city = cities_db.get(city_id)
+        city = cities.get(city_id)
         if city is None:
             cities_api.abort(404, "City not found")
-        return city
+        return city, 200, check_etag([city])
 
     @cities_api.doc('update_city')
     @cities_api.expect(city_model)
@@ -70,11 +72,9 @@ class CityResource(Resource):
         Raises:
             404: If the city is not found in the database.
         """
-        if city_id not in cities_db:
+        updated_city = cities.update(city_id, cities_api.payload)
+        if updated_city is None:
             cities_api.abort(404, "City not found")
-        updated_city = cities_api.payload
-        updated_city['id'] = city_id
-        cities_db[city_id] = updated_city
         return updated_city
 
     @cities_api.doc('delete_city')
@@ -92,7 +92,6 @@ class CityResource(Resource):
         Raises:
             404: If the city is not found in the database.
         """
-        if city_id in cities_db:
-            del cities_db[city_id]
+        if cities.delete(city_id):
             return '', 204
         cities_api.abort(404, "City not found")
@@ -1,37 +1,40 @@
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.caching import check_etag, conditional
+from app.api.v1.fieldsets import FIELDS_PARAMS, requested_fields
+from app.api.v1.pagination import PAGINATION_PARAMS, paginate
+from app.models.country import Country
+from app.repositories import repository
 
-countries_api = Namespace('countries', description='Country operations')
+countries_api = Namespace('countries', description='Country operations',
+                          decorators=[conditional('countries')])
 
 country_model = countries_api.model('Country', {
     'id': fields.String(required=True, description='The country identifier'),
-    'name': fields.String(required=True, description='The country name')
+    'name': fields.String(required=True, description='The country name'),
+    'code': fields.String(description='The country code')
 })
 
-# In-memory database simulation
-countries_db = {}
+countries = repository(Country)
 
 @countries_api.route('/')
 class CountryList(Resource):
-    @countries_api.doc('list_countries')
+    @countries_api.doc('list_countries', params={**PAGINATION_PARAMS, **FIELDS_PARAMS})
     @countries_api.marshal_list_with(country_model)
     def get(self):
         '''List all countries'''
-        return list(countries_db.values()), 200
+        page, headers = paginate(countries, requested_fields(country_model))
+        return page, 200, {**headers, **check_etag(page, headers.get('Link'))}
 
     @countries_api.doc('create_country')
     @countries_api.expect(country_model)
     @countries_api.marshal_with(country_model, code=201)
     def post(self):
         '''Create a new country'''
-        new_country = countries_api.payload
-        country_id = str(len(countries_db) + 1)
-        new_country['id'] = country_id
-        countries_db[country_id] = new_country
-        return new_country, 201
+        return countries.create(countries_api.payload), 201
 
 @countries_api.route('/<string:country_id>')
 class CountryResource(Resource):
-    @countries_api.doc('get_country')
+    @countries_api.doc('get_country', params=FIELDS_PARAMS)
     @countries_api.marshal_with(country_model)
     def get(self, country_id):
         '''
@@ -43,10 +46,10 @@ class CountryResource(Resource):
         Returns:
             tuple: A tuple containing the country information and the HTTP status code
         '''
-        country = countries_db.get(country_id)
+        country = countries.get(country_id)
         if country is None:
             countries_api.abort(404, "Country not found")
-        return country, 200
+        return country, 200, check_etag([country])
 
     @countries_api.doc('update_country')
     @countries_api.expect(country_model)
@@ -61,11 +64,9 @@ class CountryResource(Resource):
         Returns:
             tuple: A tuple containing the updated country information and the HTTP status code
         '''
-        if country_id not in countries_db:
+        updated_country = countries.update(country_id, countries_api.payload)
+        if updated_country is None:
             countries_api.abort(404, "Country not found")
-        updated_country = countries_api.payload
-        updated_country['id'] = country_id
-        countries_db[country_id] = updated_country
         return updated_country, 200
 
     @countries_api.doc('delete_country')
@@ -79,7 +80,6 @@ class CountryResource(Resource):
         Returns:
             tuple: A tuple containing an empty string and the HTTP status code
         '''
-        if country_id in countries_db:
-            del countries_db[country_id]
+        if countries.delete(country_id):
             return '', 204
         countries_api.abort(404, "Country not found")
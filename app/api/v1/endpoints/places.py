@@ -1,38 +1,132 @@
+from flask import request
 from flask_restx import Namespace, Resource, fields
-
-places_api = Namespace('places', description='Places operations')
+from app.api.v1.caching import check_etag, conditional
+from app.api.v1.fieldsets import FIELDS_PARAMS, requested_fields
+from app.api.v1.pagination import PAGINATION_PARAMS, paginate
+from app.models.place import Place
+from app.models.place_rating import PlaceRating
+from app.repositories import repository
+
+places_api = Namespace('places', description='Places operations', decorators=[conditional('places')])
+
+rating_model = places_api.model('PlaceRating', {
+    'count': fields.Integer(description='The number of reviews'),
+    'average': fields.Float(description='The average rating'),
+    'histogram': fields.List(fields.Integer, description='The number of reviews rated 1 to 5 stars'),
+})
 
 place_model = places_api.model('Place', {
     'id': fields.String(required=True, description='The place identifier'),
     'name': fields.String(required=True, description='The place name'),
     'description': fields.String(required=True, description='The place description'),
+    'address': fields.String(description='The place address'),
+    'city_id': fields.String(description='The city identifier'),
+    'latitude': fields.Float(description='The latitude of the place'),
+    'longitude': fields.Float(description='The longitude of the place'),
+    'host_id': fields.String(description='The host identifier'),
+    'num_rooms': fields.Integer(description='The number of rooms'),
+    'num_bathrooms': fields.Integer(description='The number of bathrooms'),
+    'price_per_night': fields.Float(description='The price per night'),
+    'max_guests': fields.Integer(description='The maximum number of guests'),
+    'rating': fields.Nested(rating_model, readonly=True, description='The rating aggregates of the place'),
 })
 
-# In-memory database simulation
-places_db = {}
+places = repository(Place)
+
+# Query parameters filtering the place list, with the stored field, operator and type of each.
+SEARCH_FILTERS = {
+    'city_id': ('city_id', '=', str),
+    'host_id': ('host_id', '=', str),
+    'min_price': ('price_per_night', '>=', float),
+    'max_price': ('price_per_night', '<=', float),
+    'min_guests': ('max_guests', '>=', int),
+    'min_rooms': ('num_rooms', '>=', int),
+    'min_bathrooms': ('num_bathrooms', '>=', int),
+}
+
+# Values of the `sort` query parameter of the place list.
+SORT_ORDERS = ('price_per_night', '-price_per_night', 'created_at', '-created_at')
+
+# Documentation of the query parameters filtering and sorting the place list.
+SEARCH_PARAMS = {
+    'city_id': 'Only places of this city',
+    'host_id': 'Only places of this host',
+    'min_price': 'Only places whose price per night is at least this amount',
+    'max_price': 'Only places whose price per night is at most this amount',
+    'min_guests': 'Only places for at least this number of guests',
+    'min_rooms': 'Only places with at least this number of rooms',
+    'min_bathrooms': 'Only places with at least this number of bathrooms',
+    'sort': f"The order of the places, one of {', '.join(SORT_ORDERS)} (default by ID)",
+}
+
+def search_query():
+    """
+    Reads the filters and the order of the place list from the query parameters.
+
+    Returns:
+        tuple: The (field, operator, value) filters and the order, or None for ID order.
+
+    Raises:
+        400: If a parameter has an invalid value.
+    """
+    filters = []
+    for param, (field, op, kind) in SEARCH_FILTERS.items():
+        value = request.args.get(param)
+        if value is None:
+            continue
+        try:
+            filters.append((field, op, kind(value)))
+        except ValueError:
+            places_api.abort(400, f"{param} must be {'an integer' if kind is int else 'a number'}")
+    order = request.args.get('sort')
+    if order is not None and order not in SORT_ORDERS:
+        places_api.abort(400, f"sort must be one of {', '.join(SORT_ORDERS)}")
+    return filters, order
+
+def with_ratings(places, requested=None):
+    """
+    Adds the rating aggregates of the places, read with a single storage call.
+
+    Args:
+        places (list): The places, or their stored data.
+        requested (tuple, optional): The requested fields; the ratings are only
+            read if they include `rating`. Defaults to None.
+
+    Returns:
+        list: The data of the places with their `rating`, without the timestamps
+            `place_model` does not return.
+    """
+    places = [place if isinstance(place, dict)
+              else {'id': place.id, **{field: getattr(place, field) for field in Place.fields}}
+              for place in places]
+    if requested is not None and 'rating' not in requested:
+        return places
+    ratings = PlaceRating.summaries([place['id'] for place in places])
+    return [dict(place, rating=ratings[place['id']]) for place in places]
 
 @places_api.route('/')
 class PlaceList(Resource):
-    @places_api.doc('list_places')
+    @places_api.doc('list_places', params={**SEARCH_PARAMS, **PAGINATION_PARAMS, **FIELDS_PARAMS})
     @places_api.marshal_list_with(place_model)
     def get(self):
         '''List all places'''
-        return list(places_db.values())
+        filters, order = search_query()
+        requested = requested_fields(place_model)
+        page, headers = paginate(places, requested, filters, order)
+        page = with_ratings(page, requested)
+        ratings = [place.get('rating') for place in page]
+        return page, 200, {**headers, **check_etag(page, ratings, headers.get('Link'))}
 
     @places_api.doc('create_place')
     @places_api.expect(place_model)
     @places_api.marshal_with(place_model, code=201)
     def post(self):
         '''Create a new place'''
-        new_place = places_api.payload
-        place_id = str(len(places_db) + 1)
-        new_place['id'] = place_id
-        places_db[place_id] = new_place
-        return new_place, 201
+        return with_ratings([places.create(places_api.payload)])[0], 201
 
 @places_api.route('/<string:place_id>')
 class PlaceResource(Resource):
-    @places_api.doc('get_place')
+    @places_api.doc('get_place', params=FIELDS_PARAMS)
     @places_api.marshal_with(place_model)
     def get(self, place_id):
         '''Fetch a place given its identifier'''
@@ -48,10 +142,11 @@ class PlaceResource(Resource):
         Raises:
             404: If the place is not found in the database.
         """
-        place = places_db.get(place_id)
+        place = places.get(place_id)
         if place is None:
             places_api.abort(404, "Place not found")
-        return place
+        data = with_ratings([place], requested_fields(place_model))[0]
+        return data, 200, check_etag([place], data.get('rating'))
 
     @places_api.doc('update_place')
     @places_api.expect(place_model)
@@ -70,12 +165,10 @@ class PlaceResource(Resource):
         Raises:
             404: If the place is not found in the database.
         """
-        if place_id not in places_db:
+        updated_place = places.update(place_id, places_api.payload)
+        if updated_place is None:
             places_api.abort(404, "Place not found")
-        updated_place = places_api.payload
-        updated_place['id'] = place_id
-        places_db[place_id] = updated_place
-        return updated_place, 200
+        return with_ratings([updated_place])[0], 200
 
     @places_api.doc('delete_place')
     def delete(self, place_id):
@@ -92,7 +185,6 @@ class PlaceResource(Resource):
         Raises:
             404: If the place is not found in the database.
         """
-        if place_id in places_db:
-            del places_db[place_id]
+        if places.delete(place_id):
             return '', 204
         places_api.abort(404, "Place not found")
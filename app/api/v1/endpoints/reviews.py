@@ -1,40 +1,56 @@
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.caching import check_etag, conditional
+from app.api.v1.fieldsets import FIELDS_PARAMS, requested_fields
+from app.api.v1.pagination import PAGINATION_PARAMS, paginate
+from app.models.review import Review
+from app.repositories import repository
 
-reviews_api = Namespace('reviews', description='Reviews operations')
+reviews_api = Namespace('reviews', description='Reviews operations', decorators=[conditional('reviews')])
 
 review_model = reviews_api.model('Review', {
     'id': fields.String(required=True, description='The review identifier'),
     'user_id': fields.String(required=True, description='The user identifier'),
     'place_id': fields.String(required=True, description='The place identifier'),
     'rating': fields.Integer(required=True, description='The rating'),
-    'text': fields.String(required=True, description='The review text'),
+    'text': fields.String(required=True, attribute='comment', description='The review text'),
 })
 
-# In-memory database simulation
-reviews_db = {}
+reviews = repository(Review)
+
+def review_values(payload):
+    """
+    Maps a review payload to the fields of the Review model.
+
+    Args:
+        payload (dict): The request payload.
+
+    Returns:
+        dict: The values of the given fields, with `text` as `comment`.
+    """
+    values = dict(payload)
+    if 'text' in values:
+        values['comment'] = values.pop('text')
+    return values
 
 @reviews_api.route('/')
 class ReviewList(Resource):
-    @reviews_api.doc('list_reviews')
+    @reviews_api.doc('list_reviews', params={**PAGINATION_PARAMS, **FIELDS_PARAMS})
     @reviews_api.marshal_list_with(review_model)
     def get(self):
         '''List all reviews'''
-        return list(reviews_db.values())
+        page, headers = paginate(reviews, requested_fields(review_model))
+        return page, 200, {**headers, **check_etag(page, headers.get('Link'))}
 
     @reviews_api.doc('create_review')
     @reviews_api.expect(review_model)
     @reviews_api.marshal_with(review_model, code=201)
     def post(self):
         '''Create a new review'''
-        new_review = reviews_api.payload
-        review_id = str(len(reviews_db) + 1)
-        new_review['id'] = review_id
-        reviews_db[review_id] = new_review
-        return new_review, 201
+        return reviews.create(review_values(reviews_api.payload)), 201
 
 @reviews_api.route('/<string:review_id>')
 class ReviewResource(Resource):
-    @reviews_api.doc('get_review')
+    @reviews_api.doc('get_review', params=FIELDS_PARAMS)
     @reviews_api.marshal_with(review_model)
     def get(self, review_id):
         '''Fetch a review given its identifier'''
@@ -50,10 +66,10 @@ class ReviewResource(Resource):
         Raises:
             404: If the review is not found in the database.
         """
-        review = reviews_db.get(review_id)
+        review = reviews.get(review_id)
         if review is None:
             reviews_api.abort(404, "Review not found")
-        return review
+        return review, 200, check_etag([review])
 
     @reviews_api.doc('update_review')
     @reviews_api.expect(review_model)
@@ -72,11 +88,9 @@ class ReviewResource(Resource):
         Raises:
             404: If the review is not found in the database.
         """
-        if review_id not in reviews_db:
+        updated_review = reviews.update(review_id, review_values(reviews_api.payload))
+        if updated_review is None:
             reviews_api.abort(404, "Review not found")
-        updated_review = reviews_api.payload
-        updated_review['id'] = review_id
-        reviews_db[review_id] = updated_review
         return updated_review, 200
 
     @reviews_api.doc('delete_review')
@@ -94,7 +108,6 @@ class ReviewResource(Resource):
         Raises:
             404: If the review is not found in the database.
         """
-        if review_id in reviews_db:
-            del reviews_db[review_id]
+        if reviews.delete(review_id):
             return '', 204
         reviews_api.abort(404, "Review not found")
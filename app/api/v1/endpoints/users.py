@@ -1,6 +1,11 @@
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.caching import check_etag, conditional
+from app.api.v1.fieldsets import FIELDS_PARAMS, requested_fields
+from app.api.v1.pagination import PAGINATION_PARAMS, paginate
+from app.models.user import User
+from app.repositories import repository
 
-user_ns = Namespace('users', description='User operations')
+user_ns = Namespace('users', description='User operations', decorators=[conditional('users')])
 
 user_model = user_ns.model('User', {
     'id': fields.String(required=True, description='The user identifier'),
@@ -9,55 +14,54 @@ user_model = user_ns.model('User', {
     'last_name': fields.String(required=True, description='The user last name'),
 })
 
-# In-memory database simulation
-users_db = {}
+users = repository(User)
 
 @user_ns.route('/')
 class UserList(Resource):
-    @user_ns.doc('list_users')
+    @user_ns.doc('list_users', params={**PAGINATION_PARAMS, **FIELDS_PARAMS})
     @user_ns.marshal_list_with(user_model)
     def get(self):
         '''List all users'''
-        return list(users_db.values())
+        page, headers = paginate(users, requested_fields(user_model))
+        return page, 200, {**headers, **check_etag(page, headers.get('Link'))}
 
     @user_ns.doc('create_user')
     @user_ns.expect(user_model)
     @user_ns.marshal_with(user_model, code=201)
     def post(self):
         '''Create a new user'''
-        new_user = user_ns.payload
-        user_id = str(len(users_db) + 1)
-        new_user['id'] = user_id
-        users_db[user_id] = new_user
-        return new_user, 201
+        try:
+            return users.create(user_ns.payload), 201
+        except ValueError as e:
+            user_ns.abort(400, str(e))
 
 @user_ns.route('/<string:user_id>')
 class UserResource(Resource):
-    @user_ns.doc('get_user')
+    @user_ns.doc('get_user', params=FIELDS_PARAMS)
     @user_ns.marshal_with(user_model)
     def get(self, user_id):
         '''Fetch a user given its identifier'''
-        user = users_db.get(user_id)
+        user = users.get(user_id)
         if user is None:
             user_ns.abort(404, "User not found")
-        return user
+        return user, 200, check_etag([user])
 
     @user_ns.doc('update_user')
     @user_ns.expect(user_model)
     @user_ns.marshal_with(user_model)
     def put(self, user_id):
         '''Update a user given its identifier'''
-        if user_id not in users_db:
+        try:
+            updated_user = users.update(user_id, user_ns.payload)
+        except ValueError as e:
+            user_ns.abort(400, str(e))
+        if updated_user is None:
             user_ns.abort(404, "User not found")
-        updated_user = user_ns.payload
-        updated_user['id'] = user_id
-        users_db[user_id] = updated_user
         return updated_user, 200
 
     @user_ns.doc('delete_user')
     def delete(self, user_id):
         '''Delete a user given its identifier'''
-        if user_id in users_db:
-            del users_db[user_id]
+        if users.delete(user_id):
             return '', 204
         user_ns.abort(404, "User not found")
@@ -0,0 +1,49 @@
+from flask import current_app, request
+from flask_restx.mask import Mask
+
+# Documentation of the query parameter selecting the returned fields.
+FIELDS_PARAMS = {
+    'fields': 'Comma-separated fields to return, e.g. id,name,price_per_night (default all)',
+}
+
+def init_app(app):
+    """
+    Accept `?fields=` as an alias of the field mask header of flask-restx.
+
+    The mask is then applied by `marshal_with` and `marshal_list_with`, so
+    only the requested fields are serialized. The header wins if both are
+    given.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.before_request(_fields_as_mask)
+
+def _fields_as_mask():
+    """Copy the `fields` query parameter to the mask header of the request."""
+    fields = request.args.get('fields')
+    if not fields:
+        return
+    header = 'HTTP_' + current_app.config.get('RESTX_MASK_HEADER', 'X-Fields').upper().replace('-', '_')
+    request.environ.setdefault(header, fields)
+
+def requested_fields(api_model):
+    """
+    Return the stored fields needed for the fields requested with the mask.
+
+    Fields of the API model renamed with `attribute` are translated to
+    the field they are read from; names unknown to the model are dropped.
+
+    Args:
+        api_model (Model): The flask-restx model of the response.
+
+    Returns:
+        tuple: The sorted names of the stored fields, or None if every field is requested.
+
+    Raises:
+        ParseError: If the mask is malformed; the API turns it into a 400 response.
+    """
+    mask = request.headers.get(current_app.config.get('RESTX_MASK_HEADER', 'X-Fields'))
+    if not mask:
+        return None
+    return tuple(sorted({api_model[name].attribute or name for name in Mask(mask) if name in api_model}))
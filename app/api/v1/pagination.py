@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+from flask import request
+from flask_restx import abort
+from app.persistence import storage
+from app.persistence.persistence_manager import sort_key
+
+# Number of entities of a page when the request gives no `limit`.
+DEFAULT_LIMIT = 100
+
+# Largest `limit` a request may ask for.
+MAX_LIMIT = 1000
+
+# Documentation of the query parameters of paginated list endpoints.
+PAGINATION_PARAMS = {
+    'limit': f'The number of items of the page, from 1 to {MAX_LIMIT} (default {DEFAULT_LIMIT})',
+    'cursor': 'The cursor of the page, from the `Link` header of the previous page',
+}
+
+def encode_cursor(position):
+    """
+    Encode the position after an entity as an opaque cursor.
+
+    Args:
+        position: The `sort_key` of the last entity of a page, its ID when
+            the page is in ID order.
+
+    Returns:
+        str: The cursor of the next page.
+    """
+    return base64.urlsafe_b64encode(json.dumps({'after': position}).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, ordered=False):
+    """
+    Decode a cursor made by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor.
+        ordered (bool, optional): Whether the page is sorted on a field rather
+            than in ID order. Defaults to False.
+
+    Returns:
+        The ID the page starts after, or the `sort_key` if `ordered`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(data, dict) or not _valid_position(data.get('after'), ordered):
+        raise ValueError("Invalid cursor")
+    return data['after']
+
+def _valid_position(position, ordered):
+    """Return whether a decoded cursor position has the shape `sort_key` gives it."""
+    if not ordered:
+        return isinstance(position, str)
+    if not isinstance(position, list) or len(position) != 3 or not isinstance(position[2], str):
+        return False
+    rank, value = position[0], position[1]
+    return (rank == 0 and value == 0) or (rank == 1 and type(value) in (int, float)) \
+        or (rank == 2 and isinstance(value, str))
+
+def paginate(repo, fields=None, filters=(), order=None):
+    """
+    Read the page of a repository requested with `?limit=&cursor=`.
+
+    Pages follow the IDs of the entities, or the order given and then the
+    IDs, so a cursor stays valid while entities are added or deleted. One
+    entity more than the page is read to know whether a next page exists;
+    if so, its URL is given in a `Link` header with `rel="next"`.
+
+    Args:
+        repo (Repository): The repository of the listed entities.
+        fields (tuple, optional): The only fields to read, as given by
+            `fieldsets.requested_fields`; `updated_at` and the order field are
+            read too. Defaults to None.
+        filters (list, optional): (field, operator, value) filters of the
+            entities. Defaults to ().
+        order (str, optional): The field to sort on, prefixed with '-' for
+            descending order. Defaults to None, for ID order.
+
+    Returns:
+        tuple: The entities of the page and the response headers.
+    """
+    limit = request.args.get('limit', str(DEFAULT_LIMIT))
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_LIMIT:
+        abort(400, f"limit must be an integer from 1 to {MAX_LIMIT}")
+    limit = int(limit)
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'], ordered=order is not None)
+        except ValueError as e:
+            abort(400, str(e))
+    if fields is not None:
+        # The ETag of the page is read from `updated_at`, the cursor of the next page from the order field.
+        fields = tuple(sorted({*fields, 'updated_at', *([order.lstrip('-')] if order is not None else [])}))
+    if filters or order is not None:
+        entities = repo.query(filters, order, limit + 1, after, fields)
+    else:
+        entities = repo.page(limit + 1, after, fields)
+    headers = {}
+    if len(entities) > limit:
+        entities = entities[:limit]
+        last = entities[-1]
+        if not isinstance(last, dict):
+            last = last.to_dict(storage.timestamp_format)
+        args = request.args.to_dict()
+        args.update(limit=limit, cursor=encode_cursor(sort_key(last, order)))
+        headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return entities, headers
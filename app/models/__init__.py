@@ -0,0 +1,9 @@
+def use_storage(storage):
+    """
+    Make every model class persist through the given persistence manager.
+
+    Args:
+        storage (IPersistenceManager): The persistence manager to use.
+    """
+    from app.persistence import storage as registry
+    registry.use(storage)
@@ -0,0 +1,538 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+import time
+import uuid
+from app.models import unit_of_work
+from app.persistence import storage
+
+# Model classes by entity type, filled in as they are defined.
+MODELS = {}
+
+EPOCH = datetime(1970, 1, 1)
+
+def _now():
+    """Returns the current UTC time in microseconds since the epoch."""
+    return time.time_ns() // 1000
+
+def _to_datetime(value):
+    """Converts a stored timestamp, epoch microseconds or ISO 8601 string, to a naive UTC datetime."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, int):
+        return EPOCH + timedelta(microseconds=value)
+    return datetime.fromisoformat(value)
+
+def _format_timestamp(value, timestamp_format):
+    """Converts a timestamp to the given storage format, 'iso' or 'epoch_us'."""
+    if timestamp_format == 'epoch_us':
+        if isinstance(value, int):
+            return value
+        return (_to_datetime(value) - EPOCH) // timedelta(microseconds=1)
+    if isinstance(value, str):
+        return value
+    return _to_datetime(value).isoformat()
+
+def commit(saved=(), deleted=(), deferred=True):
+    """
+    Saves and deletes entities of any types together.
+
+    Outside of a unit of work, or if `deferred` is False, everything is
+    written with a single `storage.commit`; inside one, the saves join its
+    pending entities and the deletions are written at once.
+
+    Args:
+        saved (iterable): The entities to save; their `updated_at` is updated.
+        deleted (iterable): The entities to delete.
+        deferred (bool, optional): Whether the saves may wait for the unit of work.
+            Writes made in a storage transaction must not. Defaults to True.
+    """
+    saved, deleted = list(saved), list(deleted)
+    now = _now()
+    for entity in saved:
+        entity._updated_at = now
+    keys = [(type(entity).__name__, entity.id) for entity in deleted]
+    unit = unit_of_work.current()
+    if unit is None or not deferred:
+        storage.commit(saved, keys)
+        if unit is not None:
+            for entity in saved:
+                unit.register(entity)
+            for entity_type, entity_id in keys:
+                unit.remove(entity_type, entity_id)
+    else:
+        for entity in saved:
+            unit.add(entity)
+        for entity_type, entity_id in keys:
+            unit.remove(entity_type, entity_id)
+        if keys:
+            storage.commit(deleted=keys)
+    for entity in saved:
+        entity._snapshot = entity._values()
+    for entity in deleted:
+        entity._snapshot = None
+
+def transaction(models):
+    """
+    Returns the storage transaction in which models read and write the
+    entities they maintain, or a context doing nothing if they maintain none.
+
+    Args:
+        models (iterable): The model classes.
+    """
+    entity_types = {entity_type for model in models if model.derived
+                    for entity_type in (model.__name__, *model.derived)}
+    if not entity_types:
+        return nullcontext()
+    return storage.transaction(sorted(entity_types))
+
+def _key(entity):
+    """Returns the (type, id) of an entity."""
+    return type(entity).__name__, entity.id
+
+def _by_model(entities):
+    """Groups entities by model class."""
+    groups = {}
+    for entity in entities:
+        groups.setdefault(type(entity), []).append(entity)
+    return groups
+
+def cascade(entities):
+    """
+    Collects entities and the dependents deleted with them.
+
+    The `cascade` relations of each model are followed level by level, with
+    one batched storage call per relation and level, using the indexes on
+    the foreign key fields. Dependents whose key is still held by an entity
+    that is not deleted, such as the cities of a country code two countries
+    share, are kept.
+
+    Args:
+        entities (list): The entities to delete.
+
+    Returns:
+        dict: The entities to delete by (type, id).
+    """
+    collected = {}
+    level = {_key(entity): entity for entity in entities}
+    while level:
+        collected.update(level)
+        found = {}
+        for model, group in _by_model(level.values()).items():
+            for name in model.cascade:
+                for dependent in getattr(model, name).dependents(group):
+                    found[_key(dependent)] = dependent
+        level = {key: entity for key, entity in found.items() if key not in collected}
+    return collected
+
+def delete_cascade(entities):
+    """
+    Deletes entities with their dependents, and saves the entities their
+    models update on deletion, in a single commit.
+
+    Args:
+        entities (list): The entities to delete.
+    """
+    if not entities:
+        return
+    deleted = cascade(entities)
+    groups = _by_model(deleted.values())
+    with transaction(groups):
+        saved = [
+            entity
+            for model, group in groups.items()
+            for entity in model._on_delete(group, deleted.keys())
+            if _key(entity) not in deleted
+        ]
+        commit(saved=saved, deleted=deleted.values(), deferred=False)
+
+class BaseModel:
+    """
+    Base class of the persisted entities.
+
+    Subclasses list their stored attributes in `fields` and declare them in
+    `__slots__`. The entity type used in storage is the class name.
+
+    Inside an application context set up with `unit_of_work.init_app`,
+    loads go through the identity map of the context and saves are deferred
+    until the unit of work is committed; queries flush the pending saves
+    first.
+
+    Deleting an entity also deletes the entities listed by the relations
+    named in `cascade`, recursively, in the same commit.
+
+    Models that maintain other entities in `_saving` and `_on_delete` list
+    their types in `derived`. Those entities are then read and written
+    together with the entity in a storage transaction, at once rather than
+    with the unit of work, so that concurrent saves never lose an update.
+
+    Entities remember the values of their fields when they are loaded or
+    saved, so saving an unchanged entity does nothing and saving a stored
+    entity hands only its changed fields to `storage.patch`.
+
+    Timestamps are kept as they were stored, epoch microseconds or ISO 8601
+    strings, and only converted to `datetime` when `created_at` or
+    `updated_at` is read, so loading and storing entities does not parse or
+    format them.
+
+    Attributes:
+        id (str): The unique identifier of the entity.
+        created_at (datetime): The date and time when the entity was created.
+        updated_at (datetime): The date and time when the entity was last updated.
+    """
+
+    __slots__ = ('id', '_created_at', '_updated_at', '_snapshot', '_related')
+    fields = ()
+    cascade = ()
+    derived = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        MODELS[cls.__name__] = cls
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self._created_at = self._updated_at = _now()
+        self._snapshot = None
+        self._related = None
+
+    @property
+    def created_at(self):
+        """datetime: The date and time when the entity was created."""
+        if not isinstance(self._created_at, datetime):
+            self._created_at = _to_datetime(self._created_at)
+        return self._created_at
+
+    @created_at.setter
+    def created_at(self, value):
+        self._created_at = value
+
+    @property
+    def updated_at(self):
+        """datetime: The date and time when the entity was last updated."""
+        if not isinstance(self._updated_at, datetime):
+            self._updated_at = _to_datetime(self._updated_at)
+        return self._updated_at
+
+    @updated_at.setter
+    def updated_at(self, value):
+        self._updated_at = value
+
+    def _values(self):
+        """Returns the values of the `fields` of the entity, in order."""
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def changed_fields(self):
+        """
+        Lists the fields modified since the entity was loaded or last saved.
+
+        Returns:
+            list: The names of the changed fields, or all of them if the entity was never stored.
+        """
+        if self._snapshot is None:
+            return list(self.fields)
+        return [field for field, value in zip(self.fields, self._snapshot) if getattr(self, field) != value]
+
+    def _saving(self, previous):
+        """
+        Returns the other entities to save together with this one.
+
+        Subclasses override this to maintain derived entities.
+
+        Args:
+            previous (tuple): The values of the `fields` when the entity was
+                loaded or last saved, or None if it was never stored.
+        """
+        return ()
+
+    @classmethod
+    def _on_delete(cls, entities, deleted):
+        """
+        Returns the other entities to save when entities of this type are deleted.
+
+        Subclasses override this to maintain derived entities.
+
+        Args:
+            entities (list): The deleted entities of this type.
+            deleted (set): The (type, id) of all the entities deleted with them.
+        """
+        return ()
+
+    @classmethod
+    def _plain_delete(cls):
+        """Returns whether deleting entities of this type affects no other entity."""
+        return not cls.cascade and cls._on_delete.__func__ is BaseModel._on_delete.__func__
+
+    def save(self):
+        """
+        Saves the entity to the storage and updates its `updated_at` timestamp.
+
+        Nothing is done if no field changed since the entity was loaded or
+        last saved.
+        """
+        changed = self.changed_fields()
+        if not changed:
+            return
+        if self.derived:
+            with transaction([type(self)]):
+                related = self._saving(self._snapshot)
+                if related:
+                    commit(saved=[self, *related], deferred=False)
+                    return
+        self._updated_at = _now()
+        unit = unit_of_work.current()
+        if unit is not None:
+            unit.add(self)
+        elif self._snapshot is None:
+            storage.save(self)
+        else:
+            changes = {field: getattr(self, field) for field in changed}
+            changes['updated_at'] = _format_timestamp(self._updated_at, storage.timestamp_format)
+            storage.patch(self, changes)
+        self._snapshot = self._values()
+
+    def delete(self):
+        """
+        Deletes the entity from the storage, together with the dependents
+        reached through the `cascade` relations of its model.
+        """
+        if not self._plain_delete():
+            delete_cascade([self])
+            return
+        unit = unit_of_work.current()
+        if unit is not None:
+            unit.remove(type(self).__name__, self.id)
+        storage.delete(self.id, type(self).__name__)
+        self._snapshot = None
+
+    def to_dict(self, timestamp_format='iso'):
+        """
+        Converts the entity to its stored dictionary representation.
+
+        Args:
+            timestamp_format (str, optional): Format of the timestamps, 'iso' for
+                ISO 8601 strings or 'epoch_us' for epoch microseconds. Defaults to 'iso'.
+
+        Returns:
+            dict: The id, the `fields` and the timestamps of the entity.
+        """
+        data = {'id': self.id}
+        for field in self.fields:
+            data[field] = getattr(self, field)
+        data['created_at'] = _format_timestamp(self._created_at, timestamp_format)
+        data['updated_at'] = _format_timestamp(self._updated_at, timestamp_format)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds an entity from its stored dictionary representation.
+
+        Unlike the constructor, this generates no ID or timestamps, since
+        they are read from `data`, in either storage format; they are not
+        parsed until they are read.
+
+        Args:
+            data (dict): The stored entity data.
+
+        Returns:
+            BaseModel: The entity.
+        """
+        entity = cls.__new__(cls)
+        entity.id = data['id']
+        values = tuple(data.get(field) for field in cls.fields)
+        for field, value in zip(cls.fields, values):
+            setattr(entity, field, value)
+        entity._snapshot = values
+        entity._related = None
+        entity._created_at = data['created_at']
+        entity._updated_at = data['updated_at']
+        return entity
+
+    @classmethod
+    def _load(cls, data, register=True):
+        """
+        Builds an entity from stored data, or returns the instance already
+        loaded by the current unit of work.
+
+        Unless `register` is False, a newly built entity is added to the
+        identity map of the unit of work.
+        """
+        unit = unit_of_work.current()
+        if unit is None:
+            return cls.from_dict(data)
+        entity = unit.get(cls.__name__, data['id'])
+        if entity is None:
+            entity = cls.from_dict(data)
+            if register:
+                unit.register(entity)
+        return entity
+
+    @classmethod
+    def get(cls, entity_id):
+        """
+        Retrieves an entity by its ID.
+
+        Args:
+            entity_id (str): The ID of the entity to retrieve.
+
+        Returns:
+            BaseModel or None: The entity if found, None otherwise.
+        """
+        unit = unit_of_work.current()
+        if unit is not None:
+            entity = unit.get(cls.__name__, entity_id)
+            if entity is not None:
+                return entity
+        data = storage.get(entity_id, cls.__name__)
+        if data:
+            return cls._load(data)
+        return None
+
+    @classmethod
+    def get_all(cls):
+        """
+        Retrieves all entities of this type.
+
+        Returns:
+            list: A list of entities.
+        """
+        unit_of_work.flush()
+        return [cls._load(item) for item in storage.get_all(cls.__name__)]
+
+    @classmethod
+    def iter_all(cls, batch_size=1000):
+        """
+        Iterates lazily over all entities of this type.
+
+        Entities already loaded by the unit of work are returned as they are,
+        but the others are not added to its identity map, so iterating keeps
+        memory constant even inside an application context.
+
+        Args:
+            batch_size (int, optional): The number of entities fetched from storage at a time. Defaults to 1000.
+
+        Yields:
+            BaseModel: The entities.
+        """
+        unit_of_work.flush()
+        for item in storage.iter_all(cls.__name__, batch_size):
+            yield cls._load(item, register=False)
+
+    @classmethod
+    def page(cls, limit, after=None):
+        """
+        Retrieves a page of the entities of this type in ID order.
+
+        Args:
+            limit (int): The number of entities to return at most.
+            after (str, optional): The ID the page starts after. Defaults to None.
+
+        Returns:
+            list: The entities of the page.
+        """
+        unit_of_work.flush()
+        return [cls._load(item) for item in storage.page(cls.__name__, limit, after)]
+
+    @classmethod
+    def query(cls, filters=(), order=None, limit=None, after=None):
+        """
+        Retrieves the entities of this type that pass filters, in a given order.
+
+        Args:
+            filters (list, optional): (field, operator, value) filters, with an operator
+                of FILTER_OPERATORS. Defaults to ().
+            order (str, optional): The field to sort on, prefixed with '-' for descending
+                order. Defaults to None, for ID order.
+            limit (int, optional): The number of entities to return at most. Defaults to None.
+            after (optional): The `sort_key` of the entity to resume after. Defaults to None.
+
+        Returns:
+            list: The matching entities.
+        """
+        unit_of_work.flush()
+        return [cls._load(item) for item in storage.query(cls.__name__, filters, order, limit, after)]
+
+    @classmethod
+    def get_many(cls, entity_ids):
+        """
+        Retrieves several entities by their IDs in a single read.
+
+        Args:
+            entity_ids (list): The IDs of the entities to retrieve.
+
+        Returns:
+            list: The entities found, in the order of `entity_ids`.
+        """
+        unit_of_work.flush()
+        return [cls._load(item) for item in storage.get_many(entity_ids, cls.__name__)]
+
+    @classmethod
+    def find_by(cls, field, value):
+        """
+        Retrieves the entities whose field equals a value, using the storage index on the field if any.
+
+        Args:
+            field (str): The name of the field.
+            value: The value the field must equal.
+
+        Returns:
+            list: A list of entities.
+        """
+        unit_of_work.flush()
+        return [cls._load(item) for item in storage.find_by(cls.__name__, field, value)]
+
+    @classmethod
+    def find_by_any(cls, field, values):
+        """
+        Retrieves the entities whose field equals any of several values in a single storage call.
+
+        Args:
+            field (str): The name of the field.
+            values (iterable): The values the field may equal.
+
+        Returns:
+            list: A list of entities.
+        """
+        unit_of_work.flush()
+        return [cls._load(item) for item in storage.find_by_any(cls.__name__, field, values)]
+
+    @classmethod
+    def save_many(cls, entities):
+        """
+        Saves several entities to the storage in a single write, skipping
+        those that did not change since they were loaded or last saved.
+
+        Args:
+            entities (list): The entities to save.
+        """
+        entities = [entity for entity in entities if entity.changed_fields()]
+        if not entities:
+            return
+        now = _now()
+        for entity in entities:
+            entity._updated_at = now
+        unit = unit_of_work.current()
+        if unit is None:
+            storage.save_many(entities)
+        for entity in entities:
+            if unit is not None:
+                unit.add(entity)
+            entity._snapshot = entity._values()
+
+    @classmethod
+    def delete_many(cls, entity_ids):
+        """
+        Deletes several entities of this type from the storage in a single write,
+        together with the dependents reached through the `cascade` relations of the model.
+
+        Args:
+            entity_ids (list): The IDs of the entities to delete.
+        """
+        if not cls._plain_delete():
+            delete_cascade(cls.get_many(list(dict.fromkeys(entity_ids))))
+            return
+        unit = unit_of_work.current()
+        if unit is not None:
+            for entity_id in entity_ids:
+                unit.remove(cls.__name__, entity_id)
+        storage.delete_many(entity_ids, cls.__name__)
@@ -0,0 +1,136 @@
+from app.models import unit_of_work
+from app.models.base_model import BaseModel, storage
+
+class PlaceRating(BaseModel):
+    """
+    The rating aggregates of a place, stored under the ID of the place.
+
+    They are updated together with the reviews of the place, so the
+    average rating of a place is known without reading its reviews.
+
+    Attributes:
+        id (str): The ID of the place.
+        count (int): The number of reviews of the place.
+        total (int): The sum of their ratings.
+        histogram (list): The number of reviews rated 1 to 5 stars.
+    """
+
+    __slots__ = ('count', 'total', 'histogram')
+    fields = __slots__
+
+    def __init__(self, place_id):
+        super().__init__()
+        self.id = place_id
+        self.count = 0
+        self.total = 0
+        self.histogram = [0] * 5
+
+    @property
+    def average(self):
+        """float: The average rating, or None if the place has no review."""
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def summary(self):
+        """
+        Returns the aggregates as shown in the API.
+
+        Returns:
+            dict: The count, average and histogram of the ratings.
+        """
+        return {'count': self.count, 'average': self.average, 'histogram': list(self.histogram)}
+
+    @classmethod
+    def summaries(cls, place_ids):
+        """
+        Returns the API summaries of the ratings of several places with a single read.
+
+        Args:
+            place_ids (list): The IDs of the places.
+
+        Returns:
+            dict: The summary of each place, with no review counted if it has no aggregates.
+        """
+        found = {aggregate.id: aggregate.summary() for aggregate in cls.get_many(place_ids)}
+        return {place_id: found.get(place_id) or {'count': 0, 'average': None, 'histogram': [0] * 5}
+                for place_id in place_ids}
+
+    def add(self, rating, sign=1):
+        """
+        Counts a rating in, or out if `sign` is -1.
+
+        Ratings that are not numbers are ignored, and only integer ratings
+        from 1 to 5 go into the histogram.
+        """
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+            return
+        self.count += sign
+        self.total += sign * rating
+        if rating in (1, 2, 3, 4, 5):
+            histogram = list(self.histogram)
+            histogram[int(rating) - 1] += sign
+            self.histogram = histogram
+
+    @classmethod
+    def rebuild(cls, place_id, exclude=None):
+        """
+        Computes the aggregates of a place from its stored reviews.
+
+        Args:
+            place_id (str): The ID of the place.
+            exclude (set, optional): The IDs of reviews to leave out. Defaults to None.
+
+        Returns:
+            PlaceRating: The aggregates, not saved.
+        """
+        unit_of_work.flush()
+        data = storage.get(place_id, cls.__name__)
+        aggregate = cls.from_dict(data) if data else cls(place_id)
+        aggregate.count, aggregate.total, aggregate.histogram = 0, 0, [0] * 5
+        for item in storage.find_by('Review', 'place_id', place_id):
+            if not exclude or item['id'] not in exclude:
+                aggregate.add(item.get('rating'))
+        return aggregate
+
+    @classmethod
+    def for_reviews(cls, changes):
+        """
+        Returns the aggregates updated for changes of several reviews.
+
+        The aggregates are read from the storage rather than from the unit
+        of work, and callers hold the storage transaction of the reviews, so
+        that they are not updated concurrently. Aggregates missing from the
+        storage, such as those of places reviewed before they were
+        maintained, are rebuilt from the stored reviews of their place,
+        leaving out the changed reviews.
+
+        Args:
+            changes (list): (review_id, removed, added) tuples, where `removed`
+                and `added` are the (place_id, rating) a review is counted out
+                of and into, or None.
+
+        Returns:
+            list: The updated aggregates, not saved.
+        """
+        review_ids = {change[0] for change in changes}
+        place_ids = {change[0] for _, removed, added in changes for change in (removed, added)
+                     if change is not None and change[0] is not None}
+        stored = {data['id']: cls.from_dict(data) for data in storage.get_many(list(place_ids), cls.__name__)}
+        updated = {}
+        rebuilt = set()
+        for _, removed, added in changes:
+            for change, sign in ((removed, -1), (added, 1)):
+                if change is None or change[0] is None:
+                    continue
+                place_id, rating = change
+                aggregate = updated.get(place_id)
+                if aggregate is None:
+                    aggregate = stored.get(place_id)
+                    if aggregate is None:
+                        aggregate = cls.rebuild(place_id, exclude=review_ids)
+                        rebuilt.add(place_id)
+                    updated[place_id] = aggregate
+                if sign > 0 or place_id not in rebuilt:
+                    aggregate.add(rating, sign)
+        return list(updated.values())
@@ -0,0 +1,176 @@
+import importlib
+import re
+from app.models.base_model import MODELS
+
+class BelongsTo:
+    """
+    Accessor of the entity referenced by a foreign key field.
+
+    Declared on a model class, `place.host` loads the User whose ID is
+    `place.host_id`, or returns the one resolved by `prefetch`.
+    """
+
+    def __init__(self, model, field):
+        """
+        Args:
+            model (str): The entity type of the referenced entity.
+            field (str): The foreign key field holding its ID.
+        """
+        self.model = model
+        self.field = field
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        entity_id = getattr(entity, self.field)
+        related = entity._related or {}
+        if self.name in related and related[self.name][0] == entity_id:
+            return related[self.name][1]
+        if entity_id is None:
+            return None
+        return _model(self.model).get(entity_id)
+
+    def prefetch(self, entities):
+        """
+        Resolve the relation of several entities with a single `get_many`.
+
+        Returns:
+            list: The distinct referenced entities found.
+        """
+        entity_ids = {getattr(entity, self.field) for entity in entities} - {None}
+        found = {item.id: item for item in _model(self.model).get_many(list(entity_ids))}
+        for entity in entities:
+            entity_id = getattr(entity, self.field)
+            _cache(entity, self.name, (entity_id, found.get(entity_id)))
+        return list(found.values())
+
+    def dependents(self, entities):
+        """
+        Resolve the entities deleted with several entities, for `cascade`.
+
+        Returns:
+            list: The distinct referenced entities found.
+        """
+        return self.prefetch(entities)
+
+
+class HasMany:
+    """
+    Accessor of the entities whose foreign key field references an entity.
+
+    Declared on a model class, `place.reviews` loads the Reviews whose
+    `place_id` is `place.id`, or returns the ones resolved by `prefetch`.
+    An entity whose key is None is referenced by none.
+    """
+
+    def __init__(self, model, field, key='id'):
+        """
+        Args:
+            model (str): The entity type of the referencing entities.
+            field (str): Their foreign key field.
+            key (str, optional): The field of the entity they reference. Defaults to 'id'.
+        """
+        self.model = model
+        self.field = field
+        self.key = key
+        self.owner = None
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        related = entity._related or {}
+        if self.name in related:
+            return related[self.name]
+        value = getattr(entity, self.key)
+        if value is None:
+            return []
+        return _model(self.model).find_by(self.field, value)
+
+    def prefetch(self, entities):
+        """
+        Resolve the relation of several entities with a single `find_by_any`.
+
+        Returns:
+            list: The referencing entities found.
+        """
+        groups = {getattr(entity, self.key): [] for entity in entities}
+        groups.pop(None, None)
+        found = _model(self.model).find_by_any(self.field, list(groups)) if groups else []
+        for item in found:
+            groups.setdefault(getattr(item, self.field), []).append(item)
+        for entity in entities:
+            _cache(entity, self.name, list(groups.get(getattr(entity, self.key), ())))
+        return found
+
+    def dependents(self, entities):
+        """
+        Resolve the entities deleted with several entities, for `cascade`.
+
+        Unless the key is the ID, other entities may share a key value with
+        the deleted ones; the referencing entities of such a value still
+        belong to them and are left out, at the cost of one more
+        `find_by_any`.
+
+        Returns:
+            list: The referencing entities left without a referenced entity.
+        """
+        found = self.prefetch(entities)
+        if self.key == 'id' or not found:
+            return found
+        deleted = {entity.id for entity in entities}
+        keys = {getattr(item, self.field) for item in found}
+        shared = {getattr(other, self.key) for other in self.owner.find_by_any(self.key, list(keys))
+                  if other.id not in deleted}
+        return [item for item in found if getattr(item, self.field) not in shared]
+
+
+def _model(entity_type):
+    """Return the model class of an entity type, importing its module if needed."""
+    if entity_type not in MODELS:
+        importlib.import_module('app.models.' + re.sub(r'(?<!^)(?=[A-Z])', '_', entity_type).lower())
+    return MODELS[entity_type]
+
+
+def _cache(entity, name, value):
+    """Store the prefetched value of a relation on an entity."""
+    if entity._related is None:
+        entity._related = {}
+    entity._related[name] = value
+
+
+def prefetch(entities, *names):
+    """
+    Resolve relations of a list of entities with one storage call per relation.
+
+    Afterwards, the relation accessors of the entities return the
+    prefetched values without reading the storage. Dotted names resolve
+    relations of the related entities, e.g. 'reviews.user'.
+
+    Args:
+        entities (list): Entities of the same type.
+        *names (str): The names of the relations to resolve.
+
+    Returns:
+        list: The entities.
+    """
+    if not entities:
+        return entities
+    owner = type(entities[0])
+    for name in names:
+        head, _, rest = name.partition('.')
+        relation = getattr(owner, head, None)
+        if not isinstance(relation, (BelongsTo, HasMany)):
+            raise ValueError(f"Unknown relation of {owner.__name__}: {head}")
+        related = relation.prefetch(entities)
+        if rest:
+            prefetch(related, rest)
+    return entities
@@ -1,10 +1,8 @@
-from datetime import datetime
-import uuid
-from app.persistence.data_manager import DataManager
+from app.models.base_model import BaseModel, commit, transaction
+from app.models.place_rating import PlaceRating
+from app.models.relations import BelongsTo
 
-storage = DataManager()
-
-class Review:
+class Review(BaseModel):
     """
     Represents a review for a place.
 
@@ -14,93 +12,78 @@ class Review:
         place_id (str): The place ID associated with the review.
         rating (int): The rating given in the review.
         comment (str): The comment provided in the review.
+        user (User): The user who wrote the review.
+        place (Place): The reviewed place.
         created_at (datetime): The timestamp when the review was created.
         updated_at (datetime): The timestamp when the review was last updated.
     """
 
+    __slots__ = ('user_id', 'place_id', 'rating', 'comment')
+    fields = __slots__
+    derived = ('PlaceRating',)
+
+    user = BelongsTo('User', 'user_id')
+    place = BelongsTo('Place', 'place_id')
+
     def __init__(self, user_id, place_id, rating, comment):
-        self.id = str(uuid.uuid4())
+        super().__init__()
         self.user_id = user_id
         self.place_id = place_id
         self.rating = rating
         self.comment = comment
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
 
-    def save(self):
-        """
-        Saves the review to the storage and updates the `updated_at` timestamp.
-        """
-        self.updated_at = datetime.utcnow()
-        storage.save(self)
+    @staticmethod
+    def _rated(values):
+        """Returns the (place_id, rating) of stored field values, or None."""
+        if values is None:
+            return None
+        return values[1], values[2]
 
-    def delete(self):
+    def _saving(self, previous):
         """
-        Deletes the review from the storage.
+        Returns the rating aggregates updated by saving the review.
         """
-        storage.delete(self.id, 'Review')
+        removed, added = self._rated(previous), (self.place_id, self.rating)
+        if removed == added:
+            return ()
+        return PlaceRating.for_reviews([(self.id, removed, added)])
 
-    def to_dict(self):
+    @classmethod
+    def _on_delete(cls, reviews, deleted):
         """
-        Converts the review object to a dictionary.
-
-        Returns:
-            dict: A dictionary representation of the review object.
+        Returns the rating aggregates updated by deleting reviews, leaving out
+        those of places deleted with them.
         """
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'place_id': self.place_id,
-            'rating': self.rating,
-            'comment': self.comment,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        return PlaceRating.for_reviews([
+            (review.id, cls._rated(review._snapshot), None) for review in reviews
+            if ('Place', review.place_id) not in deleted and ('PlaceRating', review.place_id) not in deleted
+        ])
 
-    @staticmethod
-    def get(review_id):
+    @classmethod
+    def save_many(cls, reviews):
         """
-        Retrieves a review by its ID from the storage.
+        Saves several reviews and their rating aggregates in a single write.
 
         Args:
-            review_id (str): The ID of the review to retrieve.
-
-        Returns:
-            Review: The review object if found, None otherwise.
+            reviews (list): The reviews to save.
         """
-        data = storage.get(review_id, 'Review')
-        if data:
-            review = Review(
-                user_id=data['user_id'],
-                place_id=data['place_id'],
-                rating=data['rating'],
-                comment=data['comment']
-            )
-            review.id = data['id']
-            review.created_at = datetime.fromisoformat(data['created_at'])
-            review.updated_at = datetime.fromisoformat(data['updated_at'])
-            return review
-        return None
+        reviews = [review for review in reviews if review.changed_fields()]
+        if not reviews:
+            return
+        with transaction([cls]):
+            changes = [(review.id, cls._rated(review._snapshot), (review.place_id, review.rating)) for review in reviews]
+            aggregates = PlaceRating.for_reviews([change for change in changes if change[1] != change[2]])
+            commit(saved=[*reviews, *aggregates], deferred=False)
 
-    @staticmethod
-    def get_all():
+    @classmethod
+    def for_place(cls, place_id):
         """
-        Retrieves all reviews from the storage.
+        Retrieves all reviews of a place using the storage index on `place_id`.
+
+        Args:
+            place_id (str): The ID of the place.
 
         Returns:
             list: A list of review objects.
         """
-        data = storage.get_all('Review')
-        reviews = []
-        for item in data:
-            review = Review(
-                user_id=item['user_id'],
-                place_id=item['place_id'],
-                rating=item['rating'],
-                comment=item['comment']
-            )
-            review.id = item['id']
-            review.created_at = datetime.fromisoformat(item['created_at'])
-            review.updated_at = datetime.fromisoformat(item['updated_at'])
-            reviews.append(review)
-        return reviews
+        return cls.find_by('place_id', place_id)
@@ -0,0 +1,130 @@
+from flask import current_app, g, has_app_context
+
+class UnitOfWork:
+    """
+    The entities loaded and saved during one Flask application context.
+
+    The identity map holds one instance per (type, id), so loading the same
+    entity twice returns the object loaded first. Saved entities are kept
+    pending and written with a single `save_many` call on commit.
+
+    Attributes:
+        identity_map (dict): The loaded and saved entities by (type, id).
+        pending (dict): The entities waiting to be written by (type, id).
+    """
+
+    def __init__(self):
+        self.identity_map = {}
+        self.pending = {}
+
+    def get(self, entity_type, entity_id):
+        """
+        Return the loaded instance of an entity, or None if it was not loaded.
+        """
+        return self.identity_map.get((entity_type, entity_id))
+
+    def register(self, entity):
+        """
+        Add a loaded entity to the identity map.
+        """
+        self.identity_map[(type(entity).__name__, entity.id)] = entity
+
+    def add(self, entity):
+        """
+        Mark an entity as waiting to be saved.
+        """
+        key = (type(entity).__name__, entity.id)
+        self.identity_map[key] = entity
+        self.pending[key] = entity
+
+    def remove(self, entity_type, entity_id):
+        """
+        Forget an entity that is being deleted.
+        """
+        self.identity_map.pop((entity_type, entity_id), None)
+        self.pending.pop((entity_type, entity_id), None)
+
+    def commit(self):
+        """
+        Write the pending entities to the storage in a single call.
+        """
+        if not self.pending:
+            return
+        from app.models import base_model
+        base_model.storage.save_many(list(self.pending.values()))
+        self.pending.clear()
+
+    def rollback(self):
+        """
+        Discard the pending entities and the identity map.
+        """
+        self.pending.clear()
+        self.identity_map.clear()
+
+
+def init_app(app):
+    """
+    Give every application context of the app its own unit of work.
+
+    The pending saves are committed after each request that succeeds, or
+    when a context outside of a request ends without an error, and are
+    discarded otherwise.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.extensions['unit_of_work'] = True
+    app.after_request(_commit_response)
+    app.teardown_appcontext(_teardown)
+
+
+def current():
+    """
+    Return the unit of work of the current application context.
+
+    Returns:
+        UnitOfWork or None: None outside of an application context of an
+            app set up with `init_app`.
+    """
+    if not has_app_context() or 'unit_of_work' not in current_app.extensions:
+        return None
+    if '_unit_of_work' not in g:
+        g._unit_of_work = UnitOfWork()
+    return g._unit_of_work
+
+
+def flush():
+    """
+    Write the pending entities of the current unit of work, if any.
+
+    Queries call this first so that they see the entities saved earlier in
+    the same context.
+    """
+    unit = g.get('_unit_of_work') if has_app_context() else None
+    if unit is not None:
+        unit.commit()
+
+
+def _commit_response(response):
+    """
+    Commit the unit of work of the request before a successful response is
+    sent, or discard it if the request failed.
+    """
+    unit = g.get('_unit_of_work')
+    if unit is not None:
+        if response.status_code < 400:
+            unit.commit()
+        else:
+            unit.rollback()
+    return response
+
+
+def _teardown(exc):
+    """Commit or discard the unit of work when the application context ends."""
+    unit = g.pop('_unit_of_work', None)
+    if unit is None:
+        return
+    if exc is None:
+        unit.commit()
+    else:
+        unit.rollback()
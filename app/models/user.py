@@ -1,10 +1,9 @@
-import uuid
-from datetime import datetime
-from app.persistence.data_manager import DataManager
+from app.models import base_model, unit_of_work
+from app.models.base_model import BaseModel
+from app.models.relations import HasMany
+from app.persistence.persistence_manager import index_key
 
-storage = DataManager()
-
-class User:
+class User(BaseModel):
     """
     Represents a user in the system.
 
@@ -14,18 +13,25 @@ class User:
         first_name (str): The first name of the user.
         last_name (str): The last name of the user.
         password (str): The password of the user.
+        places (list): The places hosted by the user, deleted with them.
+        reviews (list): The reviews written by the user, deleted with them.
         created_at (datetime): The timestamp when the user was created.
         updated_at (datetime): The timestamp when the user was last updated.
     """
 
+    __slots__ = ('email', 'first_name', 'last_name', 'password')
+    fields = __slots__
+
+    places = HasMany('Place', 'host_id')
+    reviews = HasMany('Review', 'user_id')
+    cascade = ('places', 'reviews')
+
     def __init__(self, email, first_name, last_name, password=None):
-        self.id = str(uuid.uuid4())
+        super().__init__()
         self.email = email
         self.first_name = first_name
         self.last_name = last_name
         self.password = password
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
 
     def save(self):
         """
@@ -34,91 +40,54 @@ class User:
         Raises:
             ValueError: If the email already exists.
         """
-        if not self.is_email_unique():
+        if 'email' in self.changed_fields() and not self.is_email_unique():
             raise ValueError("Email already exists.")
-        self.updated_at = datetime.utcnow()
-        storage.save(self)
-
-    def delete(self):
-        """
-        Deletes the user from the storage.
-        """
-        storage.delete(self.id, 'User')
-
-    def to_dict(self):
-        """
-        Converts the user object to a dictionary.
-
-        Returns:
-            dict: A dictionary representation of the user object.
-        """
-        return {
-            'id': self.id,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'password': self.password,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        super().save()
 
     def is_email_unique(self):
         """
-        Checks if the email is unique among all users.
+        Checks if the email is unique among all users, ignoring case.
+
+        The check looks the email up in the storage index, so its cost does
+        not depend on the number of users.
 
         Returns:
             bool: True if the email is unique, False otherwise.
         """
-        users = User.get_all()
-        for user in users:
-            if user.email == self.email and user.id != self.id:
-                return False
-        return True
+        unit_of_work.flush()
+        return all(item['id'] == self.id for item in base_model.storage.find_by('User', 'email', self.email))
 
-    @staticmethod
-    def get(user_id):
+    @classmethod
+    def get_by_email(cls, email):
         """
-        Retrieves a user by their ID.
+        Retrieves a user by their email, ignoring case, using the storage index on `email`.
 
         Args:
-            user_id (str): The ID of the user to retrieve.
+            email (str): The email of the user.
 
         Returns:
             User: The user object if found, None otherwise.
         """
-        data = storage.get(user_id, 'User')
-        if data:
-            user = User(
-                email=data['email'],
-                first_name=data['first_name'],
-                last_name=data['last_name'],
-                password=data.get('password')
-            )
-            user.id = data['id']
-            user.created_at = datetime.fromisoformat(data['created_at'])
-            user.updated_at = datetime.fromisoformat(data['updated_at'])
-            return user
+        found = cls.find_by('email', email)
+        if found:
+            return found[0]
         return None
 
-    @staticmethod
-    def get_all():
+    by_email = get_by_email
+
+    @classmethod
+    def save_many(cls, users):
         """
-        Retrieves all users.
+        Saves several users to the storage in a single write.
 
-        Returns:
-            list: A list of user objects.
+        Args:
+            users (list): The user objects to save.
+
+        Raises:
+            ValueError: If an email already exists or appears twice in `users`, ignoring case.
         """
-        data = storage.get_all('User')
-        users = []
-        for item in data:
-            user = User(
-                email=item['email'],
-                first_name=item['first_name'],
-                last_name=item['last_name'],
-                password=item.get('password')
-            )
-            user.id = item['id']
-            user.created_at = datetime.fromisoformat(item['created_at'])
-            user.updated_at = datetime.fromisoformat(item['updated_at'])
-            users.append(user)
-        return users
+        owners = {}
+        for user in users:
+            if owners.setdefault(index_key('User', 'email', user.email), user.id) != user.id or not user.is_email_unique():
+                raise ValueError("Email already exists.")
+        super().save_many(users)
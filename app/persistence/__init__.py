@@ -0,0 +1,118 @@
+import threading
+from app.persistence.data_manager import DataManager
+from app.persistence.indexed_data_manager import IndexedDataManager
+from app.persistence.log_data_manager import LogDataManager
+from app.persistence.sqlite_data_manager import SQLiteDataManager
+
+BACKENDS = {
+    'json': DataManager,
+    'indexed': IndexedDataManager,
+    'log': LogDataManager,
+    'sqlite': SQLiteDataManager,
+}
+
+# Constructor argument of each backend that holds the path of its main file.
+PATH_OPTIONS = {
+    'json': 'file_path',
+    'indexed': 'data_path',
+    'log': 'log_path',
+    'sqlite': 'db_path',
+}
+
+def create_storage(backend='json', **options):
+    """
+    Create a persistence manager for the given backend name.
+
+    Args:
+        backend (str, optional): One of the keys of BACKENDS. Defaults to 'json'.
+        **options: Keyword arguments passed to the backend constructor.
+
+    Returns:
+        IPersistenceManager: The new persistence manager.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    return BACKENDS[backend](**options)
+
+
+class StorageRegistry:
+    """
+    The persistence manager shared by every model of the process.
+
+    Attribute access is forwarded to the current manager, so the registry
+    can be used wherever a persistence manager is expected. The manager is
+    created with the default backend on first use, and replaced by
+    `configure` or `use`; models always reach the current one, so there
+    is a single cache, index set and write queue per process.
+    """
+
+    def __init__(self, backend='json', **options):
+        """
+        Initialize the registry.
+
+        Args:
+            backend (str, optional): Backend of the default manager. Defaults to 'json'.
+            **options: Constructor arguments of the default manager.
+        """
+        self._default = (backend, options)
+        self._manager = None
+        self._lock = threading.Lock()
+
+    @property
+    def manager(self):
+        """IPersistenceManager: The current manager, created on first use."""
+        manager = self._manager
+        if manager is None:
+            with self._lock:
+                if self._manager is None:
+                    backend, options = self._default
+                    self._manager = create_storage(backend, **options)
+                manager = self._manager
+        return manager
+
+    def configure(self, backend='json', path=None, **options):
+        """
+        Replace the current manager with a new one.
+
+        Args:
+            backend (str, optional): One of the keys of BACKENDS. Defaults to 'json'.
+            path (str, optional): Path of the main file of the backend. Defaults to
+                the default path of the backend.
+            **options: Other constructor arguments of the backend.
+
+        Returns:
+            IPersistenceManager: The new manager.
+        """
+        if path is not None and backend in PATH_OPTIONS:
+            options[PATH_OPTIONS[backend]] = path
+        manager = create_storage(backend, **options)
+        self.use(manager)
+        return manager
+
+    def use(self, manager, close=True):
+        """
+        Replace the current manager with the given one, closing the previous one.
+
+        Args:
+            manager (IPersistenceManager): The manager to use, or None to
+                create the default one again on next use.
+            close (bool, optional): Whether to close the previous manager. Pass
+                False to keep it open and restore it later. Defaults to True.
+
+        Returns:
+            IPersistenceManager: The previous manager, or None if none was created yet.
+        """
+        with self._lock:
+            previous, self._manager = self._manager, manager
+        if close and previous is not None and previous is not manager and hasattr(previous, 'close'):
+            previous.close()
+        return previous
+
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+
+
+storage = StorageRegistry()
@@ -0,0 +1,128 @@
+"""
+Serialization codecs for the data files of DataManager.
+
+A codec turns the stored dataset into bytes and back:
+
+- 'json': indented JSON, easy to read and diff (the default).
+- 'json-compact': JSON without whitespace, about half the size.
+- 'pickle': pickle protocol 5, the fastest to load and save.
+- 'marshal': marshal, compact and fast but tied to the Python version.
+
+Binary codecs must only be used on trusted files. Data files can be
+converted between codecs offline with:
+
+    python -m app.persistence.codecs data.json data.pickle --to pickle
+"""
+import argparse
+import json
+import marshal
+import pickle
+
+
+class JSONCodec:
+    """A codec storing data as JSON text."""
+
+    extension = '.json'
+
+    def __init__(self, indent=None):
+        """
+        Initialize the codec.
+
+        Args:
+            indent (int, optional): Indentation of the output, or None for compact output. Defaults to None.
+        """
+        self.indent = indent
+        self.separators = None if indent else (',', ':')
+
+    def dumps(self, data):
+        """Serialize data to bytes."""
+        return json.dumps(data, indent=self.indent, separators=self.separators).encode()
+
+    def loads(self, raw):
+        """Deserialize data from bytes."""
+        return json.loads(raw)
+
+
+class PickleCodec:
+    """A codec storing data with pickle protocol 5."""
+
+    extension = '.pickle'
+
+    def dumps(self, data):
+        """Serialize data to bytes."""
+        return pickle.dumps(data, protocol=5)
+
+    def loads(self, raw):
+        """Deserialize data from bytes."""
+        return pickle.loads(raw)
+
+
+class MarshalCodec:
+    """A codec storing data with marshal."""
+
+    extension = '.marshal'
+
+    def dumps(self, data):
+        """Serialize data to bytes."""
+        return marshal.dumps(data)
+
+    def loads(self, raw):
+        """Deserialize data from bytes."""
+        return marshal.loads(raw)
+
+
+CODECS = {
+    'json': JSONCodec(indent=4),
+    'json-compact': JSONCodec(),
+    'pickle': PickleCodec(),
+    'marshal': MarshalCodec(),
+}
+
+
+def get_codec(codec):
+    """
+    Return the codec with the given name, or the given codec object itself.
+
+    Args:
+        codec (str or object): A key of CODECS or an object with `dumps`,
+            `loads` and `extension` attributes.
+
+    Raises:
+        ValueError: If the codec name is unknown.
+    """
+    if not isinstance(codec, str):
+        return codec
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    return CODECS[codec]
+
+
+def convert(src_path, dst_path, src_codec='json', dst_codec='json-compact'):
+    """
+    Convert a data file from one codec to another.
+
+    Args:
+        src_path (str): Path of the file to read.
+        dst_path (str): Path of the file to write.
+        src_codec (str, optional): Codec of the source file. Defaults to 'json'.
+        dst_codec (str, optional): Codec of the destination file. Defaults to 'json-compact'.
+    """
+    with open(src_path, 'rb') as f:
+        data = get_codec(src_codec).loads(f.read())
+    with open(dst_path, 'wb') as f:
+        f.write(get_codec(dst_codec).dumps(data))
+
+
+def main(argv=None):
+    """Command line entry point of the codec converter."""
+    parser = argparse.ArgumentParser(description='Convert a data file between codecs.')
+    parser.add_argument('src', help='file to read')
+    parser.add_argument('dst', help='file to write')
+    parser.add_argument('--from', dest='src_codec', default='json', choices=sorted(CODECS))
+    parser.add_argument('--to', dest='dst_codec', default='json-compact', choices=sorted(CODECS))
+    args = parser.parse_args(argv)
+    convert(args.src, args.dst, args.src_codec, args.dst_codec)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,418 @@
-import json
+import atexit
+import bisect
+import logging
 import os
+import threading
+import time
+import weakref
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from app.persistence.persistence_manager import IPersistenceManager
+from app.persistence.codecs import get_codec
+from app.persistence.persistence_manager import (
+    DEFAULT_INDEXES, DEFAULT_SORTED_INDEXES, IPersistenceManager, check_filters, check_timestamp_format,
+    index_key, matches, page_ids, project, select, sort_key
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Write-behind managers still holding unflushed mutations at interpreter exit.
+_write_behind_managers = weakref.WeakSet()
+
+@atexit.register
+def _flush_write_behind_managers():
+    """Flush every write-behind DataManager at interpreter exit."""
+    for manager in list(_write_behind_managers):
+        manager.flush()
 
 class DataManager(IPersistenceManager):
-    """A class that manages the persistence of data in a JSON file."""
+    """
+    A class that manages the persistence of data in a JSON file.
+
+    The parsed file is kept in memory and served to readers for as long as
+    the file on disk is unchanged. Every write goes straight through to the
+    file, and a change made by another process (detected through the file's
+    mtime, size and inode) triggers a reload on the next access.
 
-    def __init__(self):
-        """Initialize the DataManager object."""
-        self.file_path = "data.json"
-        self._initialize_file()
+    The file format is set by `codec` (see app.persistence.codecs): indented
+    JSON by default, or compact JSON, pickle or marshal for faster loads
+    and saves.
 
-    def _initialize_file(self):
+    When `shard_dir` is given, each entity type is kept in its own
+    `<shard_dir>/<EntityType><extension>` file instead, so a write only rewrites
+    the data of its own type and reading a small type never parses a large
+    one.
+
+    `find_by` answers lookups on the fields declared in `indexes` from
+    in-memory secondary indexes, built when a file is loaded and kept up to
+    date by every write. The fields declared in `sorted_indexes` are also
+    kept in sorted lists, which `query` bisects for range filters and walks
+    in order for sorting.
+
+    Several processes (e.g. gunicorn workers) can share the same files:
+    every read-modify-write holds an exclusive lock on `<file>.lock`, and
+    files are replaced atomically by renaming a fully written temporary
+    file, so readers never see a partial write and need no lock. Within a
+    process, writes copy the cached mapping of a type and its indexes
+    before changing them, so threads reading without a lock never see them
+    change under them either.
+
+    With `write_behind`, mutations are applied to the cached data at once
+    and a background thread writes them out, coalesced, at most every
+    `flush_interval` seconds or as soon as `flush_threshold` of them are
+    pending. `flush()` writes them out immediately, and it runs for every
+    write-behind manager at interpreter exit. Pending mutations are
+    re-applied if the file is changed by another process in the meantime,
+    but they are lost if this process is killed before they are flushed.
+    """
+
+    def __init__(self, file_path="data.json", shard_dir=None, fsync=True, codec='json', indexes=None,
+                 write_behind=False, flush_interval=0.05, flush_threshold=1000, timestamp_format='iso',
+                 sorted_indexes=None):
+        """
+        Initialize the DataManager object.
+
+        Args:
+            file_path (str, optional): Path of the data file. Defaults to "data.json".
+            shard_dir (str, optional): Directory holding one file per entity type.
+                When set, `file_path` is not used. Defaults to None.
+            fsync (bool, optional): Whether written files are fsynced before being
+                renamed into place. Defaults to True.
+            codec (str, optional): Name of the codec of the data files. Defaults to 'json'.
+            indexes (dict, optional): Indexed fields of each entity type. Defaults to DEFAULT_INDEXES.
+            write_behind (bool, optional): Whether writes are deferred to a background
+                thread. Defaults to False.
+            flush_interval (float, optional): Longest delay in seconds before a deferred
+                write is flushed. Defaults to 0.05.
+            flush_threshold (int, optional): Number of pending mutations that triggers
+                a flush without waiting for `flush_interval`. Defaults to 1000.
+            timestamp_format (str, optional): Format of the stored timestamps, 'iso' or 'epoch_us'. Defaults to 'iso'.
+            sorted_indexes (dict, optional): Fields of each entity type kept sorted.
+                Defaults to DEFAULT_SORTED_INDEXES.
+        """
+        self.file_path = file_path
+        self.shard_dir = shard_dir
+        self.fsync = fsync
+        self.codec = get_codec(codec)
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        self.sorted_indexes = DEFAULT_SORTED_INDEXES if sorted_indexes is None else sorted_indexes
+        self.timestamp_format = check_timestamp_format(timestamp_format)
+        self._index_cache = {}
+        self._cache = {}
+        self._changes = {}
+        self._mutexes = {}
+        self._local = threading.local()
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = {}
+        self._pending_count = 0
+        self._pending_changed = threading.Condition()
+        self._flusher = None
+        self._closed = False
+        if self.shard_dir is not None:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        else:
+            self._initialize_file()
+
+    def _path_for(self, entity_type):
+        """Return the path of the file holding the entities of the given type."""
+        if self.shard_dir is None:
+            return self.file_path
+        return os.path.join(self.shard_dir, entity_type + self.codec.extension)
+
+    def _initialize_file(self, path=None):
         """Initialize the data file if it doesn't exist."""
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w') as f:
-                json.dump({}, f)
-
-    def _read_data(self):
-        """Read the data from the file and return it as a dictionary."""
-        self._initialize_file()
-        with open(self.file_path, 'r') as f:
+        path = path or self.file_path
+        if not os.path.exists(path):
+            with self._locked(path):
+                if not os.path.exists(path):
+                    self._write_data({}, path)
+
+    def _mutex(self, path):
+        """Return the lock serializing the threads of this process on a data file."""
+        return self._mutexes.setdefault(path, threading.RLock())
+
+    @contextmanager
+    def _locked(self, path, keep_cache=False):
+        """
+        Hold the exclusive lock of a data file for the calling thread.
+
+        The lock is taken on a separate `<path>.lock` file because the data
+        file itself is replaced on every write. It is reentrant, and unless
+        `keep_cache` is set, the cached copy of the file is dropped if the
+        locked block fails, since it may have been modified without being
+        written.
+        """
+        held = getattr(self._local, 'paths', None)
+        if held is None:
+            held = self._local.paths = set()
+        if path in held:
+            yield
+            return
+        with self._mutex(path):
+            with open(path + '.lock', 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                held.add(path)
+                try:
+                    yield
+                except BaseException:
+                    if not keep_cache:
+                        self._cache.pop(path, None)
+                    raise
+                finally:
+                    held.discard(path)
+
+    @staticmethod
+    def _file_stamp(path):
+        """Return the (mtime, size, inode) signature of a data file, or None if it is missing."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _read_data(self, path=None):
+        """
+        Return the contents of a data file as a dictionary.
+
+        The cached copy is returned unless the file changed on disk since it
+        was last read or written by this instance. Mutations still waiting
+        to be flushed are re-applied to a freshly loaded file.
+        """
+        path = path or self.file_path
+        stamp = self._file_stamp(path)
+        cached = self._cache.get(path)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            return cached[1]
+        with self._mutex(path):
+            if stamp is None:
+                self._initialize_file(path)
+                stamp = self._file_stamp(path)
+            with open(path, 'rb') as f:
+                data = self.codec.loads(f.read())
+            self._apply(data, self._pending.get(path, ()))
+            self._cache[path] = (stamp, data)
+        return data
+
+    def _write_data(self, data, path=None):
+        """
+        Write the given data dictionary to a data file and keep it as the cached copy.
+
+        The data is written to `<path>.tmp` and renamed over the data file,
+        so the file is never seen half written. Callers must hold the lock
+        of the file.
+        """
+        path = path or self.file_path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.codec.dumps(data))
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._cache[path] = (self._file_stamp(path), data)
+
+    def _entities(self, entity_type):
+        """Return the cached {id: data} mapping of the given type, without copying it."""
+        return self._read_data(self._path_for(entity_type)).get(entity_type, {})
+
+    def _index_for(self, entity_type):
+        """
+        Return the entities of the given type and their secondary indexes.
+
+        The indexes map each indexed field to {index_key: {id: None}} buckets,
+        and each sorted field to the sorted list of the `sort_key` tuples of
+        the entities. They are rebuilt whenever the entities of the type were
+        reloaded or replaced since they were last built.
+
+        Returns:
+            tuple: The {id: data} mapping, the indexes and the sorted indexes.
+        """
+        entities = self._entities(entity_type)
+        cached = self._index_cache.get(entity_type)
+        if cached is None or cached[0] is not entities:
+            index = {field: {} for field in self.indexes.get(entity_type, ())}
+            for entity_id, entity_data in entities.items():
+                for field, buckets in index.items():
+                    buckets.setdefault(index_key(entity_type, field, entity_data.get(field)), {})[entity_id] = None
+            sorted_index = {field: sorted(tuple(sort_key(entity_data, field)) for entity_data in entities.values())
+                            for field in self.sorted_indexes.get(entity_type, ())}
+            cached = (entities, index, sorted_index)
+            self._index_cache[entity_type] = cached
+        return cached
+
+    def _working_copy(self, entity_type, entities):
+        """
+        Return copies of the entities of a type and of their indexes, to be changed by `_apply`.
+
+        The indexes are None if they were not built for `entities`, since
+        they will then be rebuilt from scratch on their next use. Buckets
+        are shared with the published indexes until `_reindex` changes them.
+        """
+        cached = self._index_cache.get(entity_type)
+        if cached is None or cached[0] is not entities:
+            return dict(entities), None, None, set()
+        return (dict(entities), {field: dict(buckets) for field, buckets in cached[1].items()},
+                {field: list(keys) for field, keys in cached[2].items()}, set())
+
+    @staticmethod
+    def _reindex(entity_type, working, entity_id, old_data, new_data):
+        """Move an entity between the buckets of working indexes after it was saved or deleted."""
+        _, index, sorted_index, copied = working
+        for field, buckets in index.items():
+            keys = []
+            if old_data is not None:
+                keys.append(index_key(entity_type, field, old_data.get(field)))
+            if new_data is not None:
+                keys.append(index_key(entity_type, field, new_data.get(field)))
+            for key in keys:
+                if (field, key) not in copied:
+                    buckets[key] = dict(buckets.get(key, ()))
+                    copied.add((field, key))
+            if old_data is not None:
+                buckets[keys[0]].pop(entity_id, None)
+            if new_data is not None:
+                buckets[keys[-1]][entity_id] = None
+        for field, keys in sorted_index.items():
+            if old_data is not None:
+                key = tuple(sort_key(old_data, field))
+                position = bisect.bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    del keys[position]
+            if new_data is not None:
+                bisect.insort(keys, tuple(sort_key(new_data, field)))
+
+    def _apply(self, data, ops):
+        """
+        Apply mutations to the contents of a data file.
+
+        The {id: data} mapping of each changed type and its indexes are
+        copied, changed and then swapped in, so that readers, which take no
+        lock, can keep iterating the mappings they got.
+
+        Args:
+            data (dict): The contents of the data file.
+            ops (list): ('save', type, id, data), ('delete', type, id) or ('clear', type) tuples.
+
+        Returns:
+            list: The mutations that changed the contents.
+        """
+        working = {}
+        applied = []
+        for op in ops:
+            kind, entity_type = op[0], op[1]
+            if entity_type not in working:
+                working[entity_type] = self._working_copy(entity_type, data.get(entity_type, {}))
+            entities, index = working[entity_type][:2]
+            if kind == 'clear':
+                if entities:
+                    working[entity_type] = ({}, None, None, set())
+                    applied.append(op)
+                continue
+            if kind == 'save':
+                old_data = entities.get(op[2])
+                entities[op[2]] = new_data = op[3]
+            elif op[2] in entities:
+                old_data, new_data = entities.pop(op[2]), None
+            else:
+                continue
+            if index is not None:
+                self._reindex(entity_type, working[entity_type], op[2], old_data, new_data)
+            applied.append(op)
+        for entity_type in {op[1] for op in applied}:
+            entities, index, sorted_index, _ = working[entity_type]
+            data[entity_type] = entities
+            if index is not None:
+                self._index_cache[entity_type] = (entities, index, sorted_index)
+        return applied
+
+    def _commit(self, path, ops):
+        """
+        Apply mutations to a data file and write it, or queue it for the flusher.
+
+        Args:
+            path (str): The path of the data file.
+            ops (list): The mutations, as accepted by `_apply`.
+        """
+        if not self.write_behind:
+            with self._locked(path):
+                data = self._read_data(path)
+                if self._apply(data, ops):
+                    self._write_data(data, path)
+                    self._changes[path] = self._changes.get(path, 0) + 1
+            return
+        with self._mutex(path):
+            data = self._read_data(path)
+            ops = self._apply(data, ops)
+            if ops:
+                self._pending.setdefault(path, []).extend(ops)
+                self._changes[path] = self._changes.get(path, 0) + 1
+        if ops:
+            self._schedule(len(ops))
+
+    def _schedule(self, count):
+        """Record newly pending mutations and wake up the flusher thread."""
+        with self._pending_changed:
+            if self._flusher is None:
+                _write_behind_managers.add(self)
+                self._flusher = threading.Thread(target=self._flush_loop, name='DataManager-flusher', daemon=True)
+                self._flusher.start()
+            self._pending_count += count
+            self._pending_changed.notify()
+
+    def _flush_loop(self):
+        """Flush pending mutations at most every `flush_interval` seconds or `flush_threshold` mutations."""
+        while True:
+            with self._pending_changed:
+                while not self._pending_count and not self._closed:
+                    self._pending_changed.wait()
+                if self._closed:
+                    return
+                deadline = time.monotonic() + self.flush_interval
+                while self._pending_count < self.flush_threshold and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._pending_changed.wait(remaining)
             try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush pending writes; retrying")
+                time.sleep(self.flush_interval)
 
-    def _write_data(self, data):
-        """Write the given data dictionary to the file."""
-        with open(self.file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+    def flush(self):
+        """
+        Write every pending mutation of a write-behind manager to disk.
+
+        Mutations stay pending until their file was replaced, and the cached
+        data, which holds them, is kept if the write fails, so a failed
+        flush loses nothing and can be retried.
+        """
+        for path in list(self._pending):
+            with self._locked(path, keep_cache=True):
+                data = self._read_data(path)
+                ops = self._pending.get(path)
+                if ops:
+                    self._write_data(data, path)
+                    del self._pending[path]
+                    with self._pending_changed:
+                        self._pending_count = max(0, self._pending_count - len(ops))
+
+    def close(self):
+        """Flush pending mutations and stop the flusher thread."""
+        self.flush()
+        with self._pending_changed:
+            self._closed = True
+            self._pending_changed.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        _write_behind_managers.discard(self)
 
     def save(self, entity):
         """
@@ -38,15 +421,8 @@ class DataManager(IPersistenceManager):
         Args:
             entity: The entity object to be saved.
         """
-        self._initialize_file()
-        data = self._read_data()
-        entity_data = entity.to_dict()
         entity_type = entity.__class__.__name__
-        entity_id = entity.id
-        if entity_type not in data:
-            data[entity_type] = {}
-        data[entity_type][entity_id] = entity_data
-        self._write_data(data)
+        self._commit(self._path_for(entity_type), [('save', entity_type, entity.id, entity.to_dict(self.timestamp_format))])
 
     def get(self, entity_id, entity_type):
         """
@@ -59,9 +435,8 @@ class DataManager(IPersistenceManager):
         Returns:
             The entity with the given ID and type, or None if not found.
         """
-        self._initialize_file()
-        data = self._read_data()
-        return data.get(entity_type, {}).get(entity_id)
+        entity_data = self._entities(entity_type).get(entity_id)
+        return dict(entity_data) if entity_data is not None else None
 
     def update(self, entity):
         """
@@ -80,11 +455,7 @@ class DataManager(IPersistenceManager):
             entity_id: The ID of the entity to delete.
             entity_type: The type of the entity to delete.
         """
-        self._initialize_file()
-        data = self._read_data()
-        if entity_type in data and entity_id in data[entity_type]:
-            del data[entity_type][entity_id]
-            self._write_data(data)
+        self._commit(self._path_for(entity_type), [('delete', entity_type, entity_id)])
 
     def get_all(self, entity_type):
         """
@@ -96,9 +467,283 @@ class DataManager(IPersistenceManager):
         Returns:
             A list of all entities of the given type.
         """
-        self._initialize_file()
-        data = self._read_data()
-        return list(data.get(entity_type, {}).values())
+        return [dict(item) for item in self._entities(entity_type).values()]
+
+    def iter_all(self, entity_type, batch_size=1000):
+        """
+        Iterate over all entities of the given type, copying them one at a time.
+
+        The data file is resident in memory already, so `batch_size` is not
+        used. Each entity is read from the latest cached mapping, so entities
+        deleted during the iteration are skipped; entities saved during it
+        may or may not be seen.
+
+        Args:
+            entity_type: The type of the entities to iterate over.
+            batch_size: Unused.
+
+        Yields:
+            The entities of the given type.
+        """
+        path = self._path_for(entity_type)
+        for entity_id in list(self._entities(entity_type)):
+            cached = self._cache.get(path)
+            entities = cached[1].get(entity_type, {}) if cached is not None else self._entities(entity_type)
+            entity_data = entities.get(entity_id)
+            if entity_data is not None:
+                yield dict(entity_data)
+
+    def page(self, entity_type, limit, after=None, fields=None):
+        """
+        Retrieve a page of the entities of the given type in ID order, copying only them.
+
+        Args:
+            entity_type: The type of the entities.
+            limit: The number of entities to return at most.
+            after: The ID the page starts after, or None for the first page.
+            fields: The names of the fields to copy besides the ID, or None for all of them.
+
+        Returns:
+            A list of the entities of the page.
+        """
+        entities = self._entities(entity_type)
+        entity_ids = page_ids(list(entities), limit, after)
+        if fields is None:
+            return self.get_many(entity_ids, entity_type)
+        return [project(entities[entity_id], fields) for entity_id in entity_ids if entity_id in entities]
+
+    @contextmanager
+    def transaction(self, entity_types=()):
+        """
+        Hold the exclusive lock of the data files of entity types.
+
+        The locks are taken in path order, so that transactions on several
+        files do not deadlock, and they also exclude other processes.
+
+        Args:
+            entity_types (iterable, optional): The types read and written in the block.
+        """
+        with ExitStack() as stack:
+            for path in sorted({self._path_for(entity_type) for entity_type in entity_types}):
+                stack.enter_context(self._locked(path))
+            yield
+
+    def save_many(self, entities):
+        """
+        Save several entities with a single write per data file.
+
+        Args:
+            entities: The entity objects to be saved.
+        """
+        self.commit(saved=entities)
+
+    def commit(self, saved=(), deleted=()):
+        """
+        Save and delete entities of any types with a single write per data file.
+
+        Args:
+            saved: The entity objects to be saved.
+            deleted: (type, id) pairs of the entities to delete.
+        """
+        by_path = {}
+        for entity in saved:
+            entity_type = entity.__class__.__name__
+            by_path.setdefault(self._path_for(entity_type), []).append(('save', entity_type, entity.id, entity.to_dict(self.timestamp_format)))
+        for entity_type, entity_id in deleted:
+            by_path.setdefault(self._path_for(entity_type), []).append(('delete', entity_type, entity_id))
+        for path, ops in by_path.items():
+            self._commit(path, ops)
+
+    def get_many(self, entity_ids, entity_type):
+        """
+        Retrieve several entities of the same type with a single read.
+
+        Args:
+            entity_ids: The IDs of the entities to retrieve.
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of the entities found, in the order of `entity_ids`.
+        """
+        entities = self._entities(entity_type)
+        return [dict(entities[entity_id]) for entity_id in entity_ids if entity_id in entities]
+
+    def delete_many(self, entity_ids, entity_type):
+        """
+        Delete several entities of the same type with a single write.
+
+        Args:
+            entity_ids: The IDs of the entities to delete.
+            entity_type: The type of the entities to delete.
+        """
+        self._commit(self._path_for(entity_type), [('delete', entity_type, entity_id) for entity_id in entity_ids])
+
+    def find_by(self, entity_type, field, value):
+        """
+        Retrieve all entities of the given type whose field equals a value.
+
+        Indexed fields are looked up in their secondary index; other fields
+        fall back to a scan. Fields listed in CASE_INSENSITIVE_FIELDS are
+        compared by `index_key`.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            value: The value the field must equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        entities, index, _ = self._index_for(entity_type)
+        key = index_key(entity_type, field, value)
+        if field not in index:
+            return [dict(entity) for entity in entities.values() if index_key(entity_type, field, entity.get(field)) == key]
+        return [dict(entities[entity_id]) for entity_id in list(index[field].get(key, ())) if entity_id in entities]
+
+    def find_by_any(self, entity_type, field, values):
+        """
+        Retrieve all entities of the given type whose field equals any of several values.
+
+        Indexed fields are looked up in their secondary index; other fields
+        fall back to a single scan.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            values: The values the field may equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        entities, index, _ = self._index_for(entity_type)
+        keys = {index_key(entity_type, field, value) for value in values}
+        if field not in index:
+            return [dict(entity) for entity in entities.values() if index_key(entity_type, field, entity.get(field)) in keys]
+        entity_ids = [entity_id for key in keys for entity_id in list(index[field].get(key, ()))]
+        return [dict(entities[entity_id]) for entity_id in entity_ids if entity_id in entities]
+
+    def query(self, entity_type, filters=(), order=None, limit=None, after=None, fields=None):
+        """
+        Retrieve the entities of the given type that pass filters, in a given order.
+
+        An equality filter on an indexed field narrows the query to the
+        smallest matching bucket. Otherwise, an order on a sorted field walks
+        its sorted index from the cursor and stops after `limit` matches,
+        and range filters on a sorted field only read the bisected slice.
+        Other queries fall back to a scan.
+
+        Args:
+            entity_type: The type of the entities.
+            filters: (field, operator, value) tuples, with an operator of FILTER_OPERATORS.
+            order: The field to sort on, prefixed with '-' for descending order, or None.
+            limit: The number of entities to return at most, or None for all of them.
+            after: The `sort_key` of the entity to resume after, or None to start at the first one.
+            fields: The names of the fields to copy besides the ID, or None for all of them.
+
+        Returns:
+            A list of the matching entities.
+
+        Raises:
+            ValueError: If a filter operator is unknown.
+        """
+        filters = check_filters(filters)
+        entities, index, sorted_index = self._index_for(entity_type)
+        buckets = [index[field].get(index_key(entity_type, field, value), {})
+                   for field, op, value in filters if op == '=' and field in index]
+        ranged = [field for field, op, value in filters if field in sorted_index and value is not None]
+        field = order.lstrip('-') if order is not None else None
+        if buckets:
+            bucket = min(buckets, key=len)
+            selected = select(entity_type, [entities[entity_id] for entity_id in list(bucket) if entity_id in entities],
+                              filters, order, limit, after)
+        elif field in sorted_index:
+            selected = self._walk(entity_type, entities, sorted_index[field], field, filters, order != field,
+                                  limit, after)
+        elif ranged:
+            keys = sorted_index[ranged[0]]
+            lo, hi = self._bounds(keys, ranged[0], filters)
+            selected = select(entity_type, [entities[key[2]] for key in keys[lo:hi] if key[2] in entities],
+                              filters, order, limit, after)
+        else:
+            selected = select(entity_type, list(entities.values()), filters, order, limit, after)
+        if fields is None:
+            return [dict(entity_data) for entity_data in selected]
+        return [project(entity_data, fields) for entity_data in selected]
+
+    @staticmethod
+    def _bounds(keys, field, filters):
+        """
+        Return the slice of a sorted index holding the values the filters on its field allow.
+
+        Args:
+            keys (list): The sorted `sort_key` tuples of the field.
+            field (str): The name of the field.
+            filters (list): The (field, operator, value) filters of the query.
+
+        Returns:
+            tuple: The start and end positions of the slice.
+        """
+        lo, hi = 0, len(keys)
+        for name, op, value in filters:
+            if name != field or value is None:
+                continue
+            rank, value, _ = sort_key({'id': '', field: value}, field)
+            if op in ('=', '>='):
+                lo = max(lo, bisect.bisect_left(keys, (rank, value, '')))
+            if op in ('=', '<='):
+                hi = min(hi, bisect.bisect_right(keys, (rank, value, '\U0010ffff')))
+        return lo, hi
+
+    def _walk(self, entity_type, entities, keys, field, filters, descending, limit, after):
+        """
+        Read the matches of a query in the order of a sorted index, from the cursor on.
+
+        Args:
+            entity_type (str): The type of the entities.
+            entities (dict): The {id: data} mapping of the type.
+            keys (list): The sorted `sort_key` tuples of the order field.
+            field (str): The name of the order field.
+            filters (list): The (field, operator, value) filters of the query.
+            descending (bool): Whether to walk the index backwards.
+            limit (int): The number of matches to return at most, or None for all of them.
+            after (list): The `sort_key` of the entity to resume after, or None.
+
+        Returns:
+            list: The stored data of the matches.
+        """
+        lo, hi = self._bounds(keys, field, filters)
+        if after is not None:
+            if descending:
+                hi = min(hi, bisect.bisect_left(keys, tuple(after)))
+            else:
+                lo = max(lo, bisect.bisect_right(keys, tuple(after)))
+        selected = []
+        for position in (range(hi - 1, lo - 1, -1) if descending else range(lo, hi)):
+            if position >= len(keys):
+                break
+            entity_data = entities.get(keys[position][2])
+            if entity_data is not None and matches(entity_type, entity_data, filters):
+                selected.append(entity_data)
+                if limit is not None and len(selected) >= limit:
+                    break
+        return selected
+
+    def version(self, entity_type):
+        """
+        Return the version of the data file holding the given type.
+
+        It combines the signature of the file, which changes when any
+        process writes it, with the number of changes made by this instance,
+        which also counts the mutations still waiting to be flushed.
+
+        Args:
+            entity_type: The type of the entities.
+
+        Returns:
+            tuple: The version of the data file.
+        """
+        path = self._path_for(entity_type)
+        return self._file_stamp(path), self._changes.get(path, 0)
 
     def clear(self, entity_type):
         """
@@ -107,7 +752,4 @@ class DataManager(IPersistenceManager):
         Args:
             entity_type: The type of the entities to clear.
         """
-        data = self._read_data()
-        if entity_type in data:
-            data[entity_type] = {}
-            self._write_data(data)
+        self._commit(self._path_for(entity_type), [('clear', entity_type)])
@@ -0,0 +1,499 @@
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+import uuid
+from app.persistence.persistence_manager import (DEFAULT_INDEXES, FieldIndex, IPersistenceManager, check_timestamp_format,
+                                                 page_ids, project)
+
+class IndexedDataManager(IPersistenceManager):
+    """
+    A persistence manager that reads single records without parsing the dataset.
+
+    Records are appended to a data file as compact `[type, id, data]` JSON
+    lines, and every write also appends an entry to an index file mapping
+    (type, id) to the (offset, length) of the latest version of the record.
+    The index is loaded on startup, and a point lookup decodes only its own
+    slice of the memory-mapped data file, so its cost does not grow with the
+    dataset.
+
+    Superseded and deleted records are reclaimed by `compact()`, which runs
+    automatically once they exceed `compact_threshold` bytes and half of the
+    data file. Both files start with the same generation header; if a crash
+    leaves them out of step, or leaves a torn entry in the index, the index
+    is rebuilt from the data file. A torn record at the end of the data file
+    is cut off on startup, before anything is appended after it.
+
+    `find_by` answers lookups on the fields declared in `indexes` from an
+    in-memory secondary index of each type. It is built by decoding the
+    records of the type once, on its first lookup, and kept up to date by
+    every write.
+
+    A lock serializes writes, compactions and reads of the memory map, so
+    threads of one process can share an instance.
+    """
+
+    def __init__(self, data_path="data.dat", index_path="data.idx", compact_threshold=16 * 1024 * 1024,
+                 timestamp_format='iso', indexes=None):
+        """
+        Initialize the IndexedDataManager object and load the index.
+
+        Args:
+            data_path (str, optional): Path of the data file. Defaults to "data.dat".
+            index_path (str, optional): Path of the index file. Defaults to "data.idx".
+            compact_threshold (int, optional): Number of dead bytes in the data file
+                from which it may be compacted. Defaults to 16 MiB.
+            timestamp_format (str, optional): Format of the stored timestamps, 'iso' or 'epoch_us'. Defaults to 'iso'.
+            indexes (dict, optional): Indexed fields of each entity type. Defaults to DEFAULT_INDEXES.
+        """
+        self.data_path = data_path
+        self.index_path = index_path
+        self.compact_threshold = compact_threshold
+        self.timestamp_format = check_timestamp_format(timestamp_format)
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        self._index = {}
+        self._field_indexes = {}
+        self._dead_bytes = 0
+        self._map = None
+        self._version = 0
+        self._lock = threading.RLock()
+        self._load()
+        self._open()
+
+    @staticmethod
+    def _encode(value):
+        """Encode a value as one compact JSON line."""
+        return json.dumps(value, separators=(',', ':')) + '\n'
+
+    @staticmethod
+    def _read_header(path):
+        """Return the generation written on the first line of a file, or None."""
+        try:
+            with open(path, 'rb') as f:
+                return json.loads(f.readline())['generation']
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return None
+
+    def _load(self):
+        """Load the index, rebuilding it if it does not match the data file."""
+        generation = self._read_header(self.data_path)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self._write_file(self.data_path, self._encode({'generation': generation}).encode())
+        data_size = self._truncate_torn_tail(self.data_path)
+        if self._read_header(self.index_path) != generation:
+            self._rebuild_index(generation)
+            return
+        with open(self.index_path, 'rb') as f:
+            f.readline()
+            for line in f:
+                try:
+                    entry = json.loads(line) if line.endswith(b'\n') else None
+                except ValueError:
+                    entry = None
+                if entry is None or (len(entry) == 4 and entry[2] + entry[3] > data_size):
+                    # A torn entry, or one written before its record reached the data file:
+                    # rebuild rather than append new entries after it.
+                    self._index = {}
+                    self._dead_bytes = 0
+                    self._rebuild_index(generation)
+                    return
+                self._apply(entry)
+
+    @staticmethod
+    def _truncate_torn_tail(path):
+        """
+        Cut a partial last line, left by a crash mid-append, off a file.
+
+        Returns:
+            int: The size of the file.
+        """
+        with open(path, 'r+b') as f:
+            size = end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+        return end
+
+    def _rebuild_index(self, generation):
+        """Rebuild the index file by scanning the data file."""
+        lines = [self._encode({'generation': generation})]
+        with open(self.data_path, 'rb') as f:
+            offset = len(f.readline())
+            for line in f:
+                try:
+                    entity_type, entity_id, _ = json.loads(line)
+                except ValueError:
+                    break
+                entry = [entity_type, entity_id, offset, len(line) - 1]
+                self._apply(entry)
+                lines.append(self._encode(entry))
+                offset += len(line)
+        if offset < os.path.getsize(self.data_path):
+            with open(self.data_path, 'r+b') as f:
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+        self._write_file(self.index_path, ''.join(lines).encode())
+
+    @staticmethod
+    def _write_file(path, content):
+        """Atomically replace a file with the given bytes."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _apply(self, entry):
+        """Apply an index entry: [type, id, offset, length], [type, id] to delete, [type] to clear."""
+        entities = self._index.setdefault(entry[0], {})
+        if len(entry) == 1:
+            self._dead_bytes += sum(length for _, length in entities.values())
+            entities.clear()
+            return
+        previous = entities.pop(entry[1], None)
+        if previous is not None:
+            self._dead_bytes += previous[1]
+        if len(entry) == 4:
+            entities[entry[1]] = (entry[2], entry[3])
+
+    def _open(self):
+        """Open the data and index files for appending."""
+        self._data_file = open(self.data_path, 'ab')
+        self._data_size = self._data_file.seek(0, os.SEEK_END)
+        self._index_file = open(self.index_path, 'a')
+
+    def _slice(self, location):
+        """Return the raw bytes stored at the given (offset, length) location; callers hold the lock."""
+        offset, length = location
+        if self._map is None or len(self._map) < offset + length:
+            if self._map is not None:
+                self._map.close()
+            with open(self.data_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def _read_many(self, entity_type, entity_ids=None):
+        """
+        Decode the stored entities of a type with the given IDs, or all of them.
+
+        The records are sliced under the lock, so that a concurrent write or
+        compaction cannot move them in between, and decoded after it.
+        """
+        with self._lock:
+            index = self._index.get(entity_type, {})
+            if entity_ids is None:
+                entity_ids = list(index)
+            records = [self._slice(index[entity_id]) for entity_id in entity_ids if entity_id in index]
+        return [json.loads(record)[2] for record in records]
+
+    def _write(self, records=(), entries=()):
+        """
+        Append records to the data file and entries to the index.
+
+        Args:
+            records: (type, id, data) tuples to save.
+            entries: Index entries deleting or clearing records.
+        """
+        lines = [self._encode(list(record)).encode() for record in records]
+        with self._lock:
+            payload = bytearray()
+            index_entries = []
+            for record, line in zip(records, lines):
+                index_entries.append([record[0], record[1], self._data_size + len(payload), len(line) - 1])
+                payload += line
+            index_entries.extend(entries)
+            if not index_entries:
+                return
+            if payload:
+                self._data_file.write(payload)
+                self._data_file.flush()
+                self._data_size += len(payload)
+            self._index_file.write(''.join(self._encode(entry) for entry in index_entries))
+            self._index_file.flush()
+            for entry in index_entries:
+                self._apply(entry)
+            self._update_field_indexes(records, entries)
+            self._version += 1
+            if self._dead_bytes >= self.compact_threshold and self._dead_bytes * 2 >= self._data_size:
+                self.compact()
+
+    def _update_field_indexes(self, records, entries):
+        """Apply written records and index entries to the secondary indexes already built."""
+        for entity_type, entity_id, data in records:
+            if entity_type in self._field_indexes:
+                self._field_indexes[entity_type].put(entity_id, data)
+        for entry in entries:
+            if len(entry) == 1:
+                self._field_indexes.pop(entry[0], None)
+            elif entry[0] in self._field_indexes:
+                self._field_indexes[entry[0]].discard(entry[1])
+
+    def _field_index(self, entity_type):
+        """Return the secondary index of a type, decoding its records on its first use; callers hold the lock."""
+        field_index = self._field_indexes.get(entity_type)
+        if field_index is None:
+            field_index = FieldIndex(entity_type, self.indexes.get(entity_type, ()),
+                                     ((data['id'], data) for data in self._read_many(entity_type)))
+            self._field_indexes[entity_type] = field_index
+        return field_index
+
+    def compact(self):
+        """
+        Rewrite the data file and the index with the live records only.
+
+        The data file is replaced before the index, so a crash in between
+        leaves a new data file with an index of the previous generation,
+        which is then rebuilt from the data file on startup.
+        """
+        with self._lock:
+            generation = self._encode({'generation': uuid.uuid4().hex})
+            data = bytearray(generation.encode())
+            index_lines = [generation]
+            index = {}
+            for entity_type, entities in self._index.items():
+                index[entity_type] = {}
+                for entity_id, location in entities.items():
+                    index_lines.append(self._encode([entity_type, entity_id, len(data), location[1]]))
+                    index[entity_type][entity_id] = (len(data), location[1])
+                    data += self._slice(location) + b'\n'
+            self.close()
+            self._write_file(self.data_path, bytes(data))
+            self._write_file(self.index_path, ''.join(index_lines).encode())
+            self._index = index
+            self._dead_bytes = 0
+            self._open()
+
+    def close(self):
+        """Close the data file, the index file and the memory map."""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._data_file.close()
+            self._index_file.close()
+
+    def save(self, entity):
+        """
+        Save the given entity by appending it to the data file.
+
+        Args:
+            entity: The entity object to be saved.
+        """
+        self.save_many([entity])
+
+    def get(self, entity_id, entity_type):
+        """
+        Retrieve the entity with the given ID and type, decoding only its record.
+
+        Args:
+            entity_id: The ID of the entity to retrieve.
+            entity_type: The type of the entity to retrieve.
+
+        Returns:
+            The entity with the given ID and type, or None if not found.
+        """
+        entities = self._read_many(entity_type, [entity_id])
+        return entities[0] if entities else None
+
+    def update(self, entity):
+        """
+        Update the given entity.
+
+        Args:
+            entity: The entity object to be updated.
+        """
+        self.save(entity)
+
+    def delete(self, entity_id, entity_type):
+        """
+        Delete the entity with the given ID and type.
+
+        Args:
+            entity_id: The ID of the entity to delete.
+            entity_type: The type of the entity to delete.
+        """
+        self.delete_many([entity_id], entity_type)
+
+    def get_all(self, entity_type):
+        """
+        Retrieve all entities of the given type.
+
+        Args:
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of all entities of the given type.
+        """
+        return self._read_many(entity_type)
+
+    def iter_all(self, entity_type, batch_size=1000):
+        """
+        Iterate over all entities of the given type, decoding them one at a time.
+
+        Args:
+            entity_type: The type of the entities to iterate over.
+            batch_size: Unused, records are decoded one by one.
+
+        Yields:
+            The entities of the given type.
+        """
+        with self._lock:
+            entity_ids = list(self._index.get(entity_type, {}))
+        for entity_id in entity_ids:
+            yield from self._read_many(entity_type, [entity_id])
+
+    def page(self, entity_type, limit, after=None, fields=None):
+        """
+        Retrieve a page of the entities of the given type in ID order, decoding only them.
+
+        Args:
+            entity_type: The type of the entities.
+            limit: The number of entities to return at most.
+            after: The ID the page starts after, or None for the first page.
+            fields: The names of the fields to return besides the ID, or None for all of them.
+
+        Returns:
+            A list of the entities of the page.
+        """
+        with self._lock:
+            entity_ids = list(self._index.get(entity_type, {}))
+        entities = self.get_many(page_ids(entity_ids, limit, after), entity_type)
+        if fields is None:
+            return entities
+        return [project(entity, fields) for entity in entities]
+
+    @contextmanager
+    def transaction(self, entity_types=()):
+        """
+        Hold the lock serializing the reads and writes of this manager.
+
+        Args:
+            entity_types (iterable, optional): Unused; the lock covers every type.
+        """
+        with self._lock:
+            yield
+
+    def save_many(self, entities):
+        """
+        Save several entities with a single append to each file.
+
+        Args:
+            entities: The entity objects to be saved.
+        """
+        self.commit(saved=entities)
+
+    def commit(self, saved=(), deleted=()):
+        """
+        Save and delete entities of any types with a single append to each file.
+
+        Args:
+            saved: The entity objects to be saved.
+            deleted: (type, id) pairs of the entities to delete.
+        """
+        records = [(entity.__class__.__name__, entity.id, entity.to_dict(self.timestamp_format)) for entity in saved]
+        saved_keys = {record[:2] for record in records}
+        with self._lock:
+            self._write(records=records, entries=[
+                [entity_type, entity_id] for entity_type, entity_id in dict.fromkeys(deleted)
+                if entity_id in self._index.get(entity_type, {}) or (entity_type, entity_id) in saved_keys
+            ])
+
+    def get_many(self, entity_ids, entity_type):
+        """
+        Retrieve several entities of the same type.
+
+        Args:
+            entity_ids: The IDs of the entities to retrieve.
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of the entities found, in the order of `entity_ids`.
+        """
+        return self._read_many(entity_type, list(entity_ids))
+
+    def find_by(self, entity_type, field, value):
+        """
+        Retrieve all entities of the given type whose field equals a value.
+
+        Indexed fields are looked up in the secondary index of the type, so
+        only the matching records are decoded; other fields fall back to a
+        scan.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            value: The value the field must equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        return self.find_by_any(entity_type, field, [value])
+
+    def find_by_any(self, entity_type, field, values):
+        """
+        Retrieve all entities of the given type whose field equals any of several values.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            values: The values the field may equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        if field not in self.indexes.get(entity_type, ()):
+            return super().find_by_any(entity_type, field, values)
+        with self._lock:
+            entity_ids = self._field_index(entity_type).lookup(field, values)
+        return self._read_many(entity_type, entity_ids)
+
+    def delete_many(self, entity_ids, entity_type):
+        """
+        Delete several entities of the same type with a single append to the index.
+
+        Args:
+            entity_ids: The IDs of the entities to delete.
+            entity_type: The type of the entities to delete.
+        """
+        with self._lock:
+            index = self._index.get(entity_type, {})
+            self._write(entries=[[entity_type, entity_id] for entity_id in dict.fromkeys(entity_ids) if entity_id in index])
+
+    def version(self, entity_type):
+        """
+        Return the number of writes made by this instance.
+
+        The index is only read on startup, so the dataset changes through
+        this instance alone.
+
+        Args:
+            entity_type: Unused; every type shares the version of the data file.
+
+        Returns:
+            int: The version of the dataset.
+        """
+        return self._version
+
+    def clear(self, entity_type):
+        """
+        Clear all entities of the given type.
+
+        Args:
+            entity_type: The type of the entities to clear.
+        """
+        with self._lock:
+            if self._index.get(entity_type):
+                self._write(entries=[[entity_type]])
@@ -0,0 +1,424 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from app.persistence.persistence_manager import (DEFAULT_INDEXES, FieldIndex, IPersistenceManager, check_timestamp_format,
+                                                 page_ids, project)
+
+class LogDataManager(IPersistenceManager):
+    """
+    A persistence manager backed by an append-only log of mutations.
+
+    Every save, delete and clear is appended to the log as one compact JSON
+    line, so the cost of a write does not depend on the size of the dataset.
+    On startup the latest snapshot is loaded and the log is replayed on top
+    of it. Once the log holds `compact_threshold` records it is folded into
+    a new snapshot and truncated, which keeps startup time bounded.
+
+    `find_by` answers lookups on the fields declared in `indexes` from an
+    in-memory secondary index of each type, built on its first lookup and
+    kept up to date as records are applied.
+
+    A lock serializes appends and the reads of the in-memory dataset, so
+    threads of one process can share an instance.
+    """
+
+    def __init__(self, log_path="data.log", snapshot_path="data.snapshot.json", compact_threshold=1000, fsync=False, timestamp_format='iso',
+                 indexes=None):
+        """
+        Initialize the LogDataManager object and replay the existing log.
+
+        Args:
+            log_path (str, optional): Path of the append-only log. Defaults to "data.log".
+            snapshot_path (str, optional): Path of the snapshot file. Defaults to "data.snapshot.json".
+            compact_threshold (int, optional): Number of log records that triggers a compaction. Defaults to 1000.
+            fsync (bool, optional): Whether every appended record is fsynced to disk. Defaults to False.
+            timestamp_format (str, optional): Format of the stored timestamps, 'iso' or 'epoch_us'. Defaults to 'iso'.
+            indexes (dict, optional): Indexed fields of each entity type. Defaults to DEFAULT_INDEXES.
+        """
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.timestamp_format = check_timestamp_format(timestamp_format)
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        self._data = {}
+        self._field_indexes = {}
+        self._log_records = 0
+        self._version = 0
+        self._lock = threading.RLock()
+        self._load()
+        self._log = open(self.log_path, 'a')
+
+    def _load(self):
+        """
+        Load the snapshot and replay the log records written after it.
+
+        A torn record can only be the last one, left by a crash mid-append.
+        The log is truncated before it, so that new records are not
+        appended to the partial line and lost on the next replay.
+        """
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                self._data = json.load(f)
+        if not os.path.exists(self.log_path):
+            return
+        offset = 0
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                self._log_records += 1
+                offset += len(line)
+        if offset < os.path.getsize(self.log_path):
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, record):
+        """Apply a single log record to the in-memory dataset and to the secondary index of its type."""
+        op = record['op']
+        entities = self._data.setdefault(record['type'], {})
+        field_index = self._field_indexes.get(record['type'])
+        if op == 'save':
+            entities[record['id']] = record['data']
+        elif op == 'patch':
+            entities[record['id']] = {**entities.get(record['id'], {}), **record['data']}
+        elif op == 'delete':
+            entities.pop(record['id'], None)
+        elif op == 'clear':
+            entities.clear()
+            self._field_indexes.pop(record['type'], None)
+            return
+        if field_index is not None:
+            if record['id'] in entities:
+                field_index.put(record['id'], entities[record['id']])
+            else:
+                field_index.discard(record['id'])
+
+    def _field_index(self, entity_type):
+        """Return the secondary index of a type, building it on its first use; callers hold the lock."""
+        field_index = self._field_indexes.get(entity_type)
+        if field_index is None:
+            field_index = FieldIndex(entity_type, self.indexes.get(entity_type, ()), self._data.get(entity_type, {}).items())
+            self._field_indexes[entity_type] = field_index
+        return field_index
+
+    def _append(self, *records):
+        """
+        Append records to the log, apply them, and compact the log when it grows too long.
+
+        The records are encoded and written before they are applied, so a
+        record that cannot be serialized or written is never visible, and a
+        failed write is cut from the log.
+        """
+        if not records:
+            return
+        lines = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        with self._lock:
+            offset = self._log.tell()
+            try:
+                self._log.write(lines)
+                self._log.flush()
+                if self.fsync:
+                    os.fsync(self._log.fileno())
+            except BaseException:
+                self._truncate_log(offset)
+                raise
+            for record in records:
+                self._apply(record)
+            self._version += 1
+            self._log_records += len(records)
+            if self._log_records >= self.compact_threshold:
+                self.compact()
+
+    def _truncate_log(self, offset):
+        """Cut the log back to `offset` after a failed append, and reopen it."""
+        try:
+            self._log.close()
+        except OSError:
+            # The records still buffered could not be written either.
+            pass
+        with open(self.log_path, 'r+b') as f:
+            f.truncate(offset)
+        self._log = open(self.log_path, 'a')
+
+    def compact(self):
+        """
+        Write the current dataset to the snapshot file and truncate the log.
+
+        The snapshot is replaced atomically, and replaying records that are
+        already in the snapshot is harmless, so a crash at any point leaves
+        a consistent state behind.
+        """
+        with self._lock:
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._data, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._log.close()
+            self._log = open(self.log_path, 'w')
+            self._log_records = 0
+
+    def close(self):
+        """Close the log file."""
+        with self._lock:
+            self._log.close()
+
+    def save(self, entity):
+        """
+        Save the given entity by appending it to the log.
+
+        Args:
+            entity: The entity object to be saved.
+        """
+        self._append(self._save_record(entity))
+
+    def _save_record(self, entity):
+        """Return the log record saving the given entity."""
+        return {
+            'op': 'save',
+            'type': entity.__class__.__name__,
+            'id': entity.id,
+            'data': entity.to_dict(self.timestamp_format)
+        }
+
+    def patch(self, entity, changes):
+        """
+        Save the changed fields of an entity by appending only them to the log.
+
+        Args:
+            entity: The entity object to be saved.
+            changes (dict): The changed fields of the entity and their new values.
+        """
+        entity_type = entity.__class__.__name__
+        with self._lock:
+            if entity.id not in self._data.get(entity_type, {}):
+                self.save(entity)
+                return
+            self._append({'op': 'patch', 'type': entity_type, 'id': entity.id, 'data': changes})
+
+    def get(self, entity_id, entity_type):
+        """
+        Retrieve the entity with the given ID and type.
+
+        Args:
+            entity_id: The ID of the entity to retrieve.
+            entity_type: The type of the entity to retrieve.
+
+        Returns:
+            The entity with the given ID and type, or None if not found.
+        """
+        with self._lock:
+            entity_data = self._data.get(entity_type, {}).get(entity_id)
+            return dict(entity_data) if entity_data is not None else None
+
+    def update(self, entity):
+        """
+        Update the given entity.
+
+        Args:
+            entity: The entity object to be updated.
+        """
+        self.save(entity)
+
+    def delete(self, entity_id, entity_type):
+        """
+        Delete the entity with the given ID and type.
+
+        Args:
+            entity_id: The ID of the entity to delete.
+            entity_type: The type of the entity to delete.
+        """
+        with self._lock:
+            if entity_id in self._data.get(entity_type, {}):
+                self._append({'op': 'delete', 'type': entity_type, 'id': entity_id})
+
+    def get_all(self, entity_type):
+        """
+        Retrieve all entities of the given type.
+
+        Args:
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of all entities of the given type.
+        """
+        with self._lock:
+            return [dict(item) for item in self._data.get(entity_type, {}).values()]
+
+    def iter_all(self, entity_type, batch_size=1000):
+        """
+        Iterate over all entities of the given type, copying them one at a time.
+
+        Args:
+            entity_type: The type of the entities to iterate over.
+            batch_size: Unused, the dataset is resident in memory.
+
+        Yields:
+            The entities of the given type.
+        """
+        with self._lock:
+            entity_ids = list(self._data.get(entity_type, {}))
+        for entity_id in entity_ids:
+            with self._lock:
+                entity_data = self._data.get(entity_type, {}).get(entity_id)
+                entity_data = dict(entity_data) if entity_data is not None else None
+            if entity_data is not None:
+                yield entity_data
+
+    def page(self, entity_type, limit, after=None, fields=None):
+        """
+        Retrieve a page of the entities of the given type in ID order, copying only them.
+
+        Args:
+            entity_type: The type of the entities.
+            limit: The number of entities to return at most.
+            after: The ID the page starts after, or None for the first page.
+            fields: The names of the fields to copy besides the ID, or None for all of them.
+
+        Returns:
+            A list of the entities of the page.
+        """
+        with self._lock:
+            entities = self._data.get(entity_type, {})
+            entity_ids = page_ids(list(entities), limit, after)
+            if fields is None:
+                return self.get_many(entity_ids, entity_type)
+            return [project(entities[entity_id], fields) for entity_id in entity_ids if entity_id in entities]
+
+    @contextmanager
+    def transaction(self, entity_types=()):
+        """
+        Hold the lock serializing the reads and writes of this manager.
+
+        Args:
+            entity_types (iterable, optional): Unused; the lock covers every type.
+        """
+        with self._lock:
+            yield
+
+    def save_many(self, entities):
+        """
+        Save several entities with a single append to the log.
+
+        Args:
+            entities: The entity objects to be saved.
+        """
+        self._append(*[self._save_record(entity) for entity in entities])
+
+    def commit(self, saved=(), deleted=()):
+        """
+        Save and delete entities of any types with a single append to the log.
+
+        Args:
+            saved: The entity objects to be saved.
+            deleted: (type, id) pairs of the entities to delete.
+        """
+        records = [self._save_record(entity) for entity in saved]
+        saved_keys = {(record['type'], record['id']) for record in records}
+        with self._lock:
+            records += [
+                {'op': 'delete', 'type': entity_type, 'id': entity_id}
+                for entity_type, entity_id in dict.fromkeys(deleted)
+                if entity_id in self._data.get(entity_type, {}) or (entity_type, entity_id) in saved_keys
+            ]
+            self._append(*records)
+
+    def get_many(self, entity_ids, entity_type):
+        """
+        Retrieve several entities of the same type.
+
+        Args:
+            entity_ids: The IDs of the entities to retrieve.
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of the entities found, in the order of `entity_ids`.
+        """
+        with self._lock:
+            entities = self._data.get(entity_type, {})
+            return [dict(entities[entity_id]) for entity_id in entity_ids if entity_id in entities]
+
+    def find_by(self, entity_type, field, value):
+        """
+        Retrieve all entities of the given type whose field equals a value.
+
+        Indexed fields are looked up in the secondary index of the type;
+        other fields fall back to a scan.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            value: The value the field must equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        return self.find_by_any(entity_type, field, [value])
+
+    def find_by_any(self, entity_type, field, values):
+        """
+        Retrieve all entities of the given type whose field equals any of several values.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            values: The values the field may equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        if field not in self.indexes.get(entity_type, ()):
+            return super().find_by_any(entity_type, field, values)
+        with self._lock:
+            return self.get_many(self._field_index(entity_type).lookup(field, values), entity_type)
+
+    def delete_many(self, entity_ids, entity_type):
+        """
+        Delete several entities of the same type with a single append to the log.
+
+        Args:
+            entity_ids: The IDs of the entities to delete.
+            entity_type: The type of the entities to delete.
+        """
+        with self._lock:
+            entities = self._data.get(entity_type, {})
+            self._append(*[
+                {'op': 'delete', 'type': entity_type, 'id': entity_id}
+                for entity_id in dict.fromkeys(entity_ids) if entity_id in entities
+            ])
+
+    def version(self, entity_type):
+        """
+        Return the number of appends made by this instance.
+
+        The log is only read on startup, so the dataset changes through
+        this instance alone.
+
+        Args:
+            entity_type: Unused; every type shares the version of the log.
+
+        Returns:
+            int: The version of the dataset.
+        """
+        return self._version
+
+    def clear(self, entity_type):
+        """
+        Clear all entities of the given type.
+
+        Args:
+            entity_type: The type of the entities to clear.
+        """
+        with self._lock:
+            if self._data.get(entity_type):
+                self._append({'op': 'clear', 'type': entity_type})
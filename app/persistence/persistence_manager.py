@@ -1,12 +1,255 @@
+import heapq
+import operator
+import threading
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 from abc import ABC, abstractmethod
 
+# Fields of each entity type that backends keep a secondary index on.
+DEFAULT_INDEXES = {
+    'User': ('email',),
+    'City': ('country_code',),
+    'Place': ('city_id', 'host_id'),
+    'Review': ('place_id', 'user_id'),
+}
+
+# Fields of each entity type that backends keep a sorted index on, for
+# range filters and sorting.
+DEFAULT_SORTED_INDEXES = {
+    'Place': ('price_per_night', 'max_guests', 'num_rooms', 'num_bathrooms', 'created_at'),
+}
+
+# Operators of the (field, operator, value) filters of `query`.
+FILTER_OPERATORS = {'=': operator.eq, '>=': operator.ge, '<=': operator.le}
+
+# Indexed fields matched case-insensitively, such as emails.
+CASE_INSENSITIVE_FIELDS = {
+    'User': ('email',),
+}
+
+# Lock of the transactions of backends that do not provide their own.
+_TRANSACTION_LOCK = threading.RLock()
+
+# Formats of the stored `created_at` and `updated_at` timestamps: ISO 8601
+# strings, or integer microseconds since the Unix epoch.
+TIMESTAMP_FORMATS = ('iso', 'epoch_us')
+
+# Fields holding timestamps, in either format.
+TIMESTAMP_FIELDS = ('created_at', 'updated_at')
+
+_EPOCH = datetime(1970, 1, 1)
+
+def check_timestamp_format(timestamp_format):
+    """
+    Return the given timestamp format if it is one of TIMESTAMP_FORMATS.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if timestamp_format not in TIMESTAMP_FORMATS:
+        raise ValueError(f"Unknown timestamp format: {timestamp_format}")
+    return timestamp_format
+
+def index_key(entity_type, field, value):
+    """
+    Return the key under which a field value is indexed and looked up.
+
+    Values of the fields in CASE_INSENSITIVE_FIELDS are lowercased; other
+    values are returned unchanged.
+    """
+    if isinstance(value, str) and field in CASE_INSENSITIVE_FIELDS.get(entity_type, ()):
+        return value.lower()
+    return value
+
+def page_ids(entity_ids, limit, after=None):
+    """
+    Return the `limit` smallest IDs greater than `after`, in order, without sorting them all.
+
+    Args:
+        entity_ids (iterable): The IDs to choose from.
+        limit (int): The number of IDs to return at most.
+        after (str, optional): The ID to start after. Defaults to None.
+    """
+    if after is not None:
+        entity_ids = (entity_id for entity_id in entity_ids if entity_id > after)
+    return heapq.nsmallest(limit, entity_ids)
+
+def sort_value(field, value):
+    """
+    Return a field value as queries compare and sort it.
+
+    Timestamps stored as ISO 8601 strings are converted to epoch
+    microseconds, so that entities written before and after a change of
+    `timestamp_format` sort in time order; their UTC offset, which the
+    models never write, is ignored, and a string that is not a timestamp
+    counts as missing. Other values are returned unchanged.
+    """
+    if field not in TIMESTAMP_FIELDS or not isinstance(value, str):
+        return value
+    try:
+        return (datetime.fromisoformat(value).replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+    except ValueError:
+        return None
+
+def check_filters(filters):
+    """
+    Return the given query filters as a list if their operators are known.
+
+    Raises:
+        ValueError: If an operator is not one of FILTER_OPERATORS.
+    """
+    filters = list(filters)
+    for field, op, value in filters:
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {op}")
+    return filters
+
+def matches(entity_type, data, filters):
+    """
+    Return whether stored entity data passes every (field, operator, value) filter.
+
+    Equality compares `index_key`s; range filters compare `sort_value`s and
+    never match a missing value, nor a value that cannot be compared with
+    the bound.
+    """
+    for field, op, value in filters:
+        actual = data.get(field)
+        if op == '=':
+            if index_key(entity_type, field, actual) != index_key(entity_type, field, value):
+                return False
+            continue
+        actual, value = sort_value(field, actual), sort_value(field, value)
+        try:
+            if actual is None or not FILTER_OPERATORS[op](actual, value):
+                return False
+        except TypeError:
+            return False
+    return True
+
+def sort_key(data, order=None):
+    """
+    Return the position of stored entity data in a query order.
+
+    It is what `query` takes as `after` to resume after the entity: the ID
+    when there is no order, otherwise `[rank, value, id]`, with the
+    `sort_value` of the field. Values are ranked like in SQLite, missing
+    values first, then numbers, then strings, so that values of different
+    types can be compared.
+
+    Args:
+        data (dict): The stored entity data.
+        order (str, optional): A field name, prefixed with '-' for descending order. Defaults to None.
+    """
+    if order is None:
+        return data['id']
+    field = order.lstrip('-')
+    value = sort_value(field, data.get(field))
+    if value is None:
+        return [0, 0, data['id']]
+    if isinstance(value, (int, float)):
+        return [1, value, data['id']]
+    return [2, str(value), data['id']]
+
+def _position(key):
+    """Return a sort key as a comparable value."""
+    return tuple(key) if isinstance(key, list) else key
+
+def select(entity_type, entities, filters=(), order=None, limit=None, after=None):
+    """
+    Run a query over stored entity data in memory, holding at most `limit` matches.
+
+    See `IPersistenceManager.query` for the arguments.
+    """
+    descending = order is not None and order.startswith('-')
+    after = _position(after)
+
+    def key(data):
+        return _position(sort_key(data, order))
+
+    selected = (data for data in entities if matches(entity_type, data, filters)
+                and (after is None or (key(data) < after if descending else key(data) > after)))
+    if limit is None:
+        return sorted(selected, key=key, reverse=descending)
+    return (heapq.nlargest if descending else heapq.nsmallest)(limit, selected, key=key)
+
+def project(data, fields):
+    """
+    Return the ID and the given fields of stored entity data, leaving out missing fields.
+
+    Args:
+        data (dict): The stored entity data.
+        fields (iterable): The names of the fields to keep.
+    """
+    return {key: data[key] for key in ('id', *fields) if key in data}
+
+class FieldIndex:
+    """
+    In-memory secondary index of some fields of one entity type.
+
+    Each field maps to {index_key: {id: None}} buckets. The keys of every
+    entity are remembered, so that an entity can be moved between buckets
+    without its previous data, which backends storing their records on disk
+    would otherwise have to read back.
+    """
+
+    def __init__(self, entity_type, fields, entities=()):
+        """
+        Build the index of the given entities.
+
+        Args:
+            entity_type: The type of the entities.
+            fields (iterable): The names of the indexed fields.
+            entities (iterable, optional): (id, data) pairs of the entities to index.
+        """
+        self.entity_type = entity_type
+        self.fields = tuple(fields)
+        self._buckets = {field: {} for field in self.fields}
+        self._keys = {}
+        for entity_id, data in entities:
+            self.put(entity_id, data)
+
+    def put(self, entity_id, data):
+        """Index the data of a saved entity, replacing its previous keys."""
+        self.discard(entity_id)
+        keys = tuple(index_key(self.entity_type, field, data.get(field)) for field in self.fields)
+        for field, key in zip(self.fields, keys):
+            self._buckets[field].setdefault(key, {})[entity_id] = None
+        self._keys[entity_id] = keys
+
+    def discard(self, entity_id):
+        """Remove a deleted entity from the index, if it is indexed."""
+        keys = self._keys.pop(entity_id, None)
+        if keys is None:
+            return
+        for field, key in zip(self.fields, keys):
+            bucket = self._buckets[field][key]
+            del bucket[entity_id]
+            if not bucket:
+                del self._buckets[field][key]
+
+    def lookup(self, field, values):
+        """
+        Return the IDs of the entities whose field equals any of the given values.
+
+        Args:
+            field: The name of an indexed field.
+            values (iterable): The values the field may equal, compared by `index_key`.
+        """
+        buckets = self._buckets[field]
+        keys = dict.fromkeys(index_key(self.entity_type, field, value) for value in values)
+        return [entity_id for key in keys for entity_id in buckets.get(key, ())]
+
 class IPersistenceManager(ABC):
     """
     Interface for a persistence manager that handles saving, retrieving, updating, and deleting entities.
+
+    Entities are stored as returned by `entity.to_dict(self.timestamp_format)`.
     """
 
+    timestamp_format = 'iso'
+
     @abstractmethod
     def save(self, entity):
         """
@@ -64,3 +307,221 @@ class IPersistenceManager(ABC):
             A list of all entities of the given type.
         """
         pass
+
+    def iter_all(self, entity_type, batch_size=1000):
+        """
+        Iterate over all entities of the given type.
+
+        Backends should override this to yield entities lazily, holding at
+        most about `batch_size` of them in memory; the default
+        implementation iterates over `get_all`.
+
+        Args:
+            entity_type: The type of the entities.
+            batch_size: The number of entities fetched from storage at a time.
+
+        Yields:
+            The entities of the given type.
+        """
+        yield from self.get_all(entity_type)
+
+    def page(self, entity_type, limit, after=None, fields=None):
+        """
+        Retrieve a page of the entities of the given type in ID order.
+
+        The ID of the last entity of a page is the `after` of the next one,
+        so pages stay consistent while entities are added or deleted.
+        Backends should override this to read only the entities of the page;
+        the default implementation scans `iter_all`, keeping at most `limit`
+        entities in memory.
+
+        Args:
+            entity_type: The type of the entities.
+            limit: The number of entities to return at most.
+            after: The ID the page starts after, or None for the first page.
+            fields: The names of the fields to return besides the ID, or None for all of them.
+
+        Returns:
+            A list of the entities of the page.
+        """
+        entities = self.iter_all(entity_type)
+        if after is not None:
+            entities = (entity for entity in entities if entity['id'] > after)
+        entities = heapq.nsmallest(limit, entities, key=lambda entity: entity['id'])
+        if fields is None:
+            return entities
+        return [project(entity, fields) for entity in entities]
+
+    def query(self, entity_type, filters=(), order=None, limit=None, after=None, fields=None):
+        """
+        Retrieve the entities of the given type that pass filters, in a given order.
+
+        Entities with the same value, and all of them without an order,
+        are ordered by ID. Backends should override this to use their
+        indexes; the default implementation scans `iter_all`, keeping at
+        most `limit` matches in memory.
+
+        Args:
+            entity_type: The type of the entities.
+            filters: (field, operator, value) tuples, with an operator of FILTER_OPERATORS.
+            order: The field to sort on, prefixed with '-' for descending order, or None.
+            limit: The number of entities to return at most, or None for all of them.
+            after: The `sort_key` of the entity to resume after, or None to start at the first one.
+            fields: The names of the fields to return besides the ID, or None for all of them.
+
+        Returns:
+            A list of the matching entities.
+
+        Raises:
+            ValueError: If a filter operator is unknown.
+        """
+        entities = select(entity_type, self.iter_all(entity_type), check_filters(filters), order, limit, after)
+        if fields is None:
+            return entities
+        return [project(entity, fields) for entity in entities]
+
+    def patch(self, entity, changes):
+        """
+        Save the changed fields of an entity that is already stored.
+
+        Backends that can update part of a record should override this to
+        write `changes` only; the default implementation saves the whole
+        entity.
+
+        Args:
+            entity: The entity object to be saved.
+            changes (dict): The changed fields of the entity and their new values.
+        """
+        self.save(entity)
+
+    def save_many(self, entities):
+        """
+        Save several entities, possibly of different types.
+
+        Backends should override this to apply all the writes at once; the
+        default implementation saves the entities one by one.
+
+        Args:
+            entities: The entities to be saved.
+        """
+        for entity in entities:
+            self.save(entity)
+
+    def commit(self, saved=(), deleted=()):
+        """
+        Save and delete entities of any types together.
+
+        Backends should override this to write everything at once; the
+        default implementation calls `save_many` and then `delete_many` for
+        each type.
+
+        Args:
+            saved: The entity objects to be saved.
+            deleted: (type, id) pairs of the entities to delete.
+        """
+        if saved:
+            self.save_many(saved)
+        by_type = {}
+        for entity_type, entity_id in deleted:
+            by_type.setdefault(entity_type, []).append(entity_id)
+        for entity_type, entity_ids in by_type.items():
+            self.delete_many(entity_ids, entity_type)
+
+    @contextmanager
+    def transaction(self, entity_types=()):
+        """
+        Hold the write lock of entity types, so that what is read and written
+        in the block sees no other write in between.
+
+        Models use this for read-modify-writes, such as updating aggregates.
+        Transactions are reentrant. Backends should override this; the
+        default implementation serializes the transactions of the process.
+
+        Args:
+            entity_types (iterable, optional): The types read and written in the block.
+        """
+        with _TRANSACTION_LOCK:
+            yield
+
+    def get_many(self, entity_ids, entity_type):
+        """
+        Retrieve several entities of the same type by their IDs.
+
+        Args:
+            entity_ids: The IDs of the entities.
+            entity_type: The type of the entities.
+
+        Returns:
+            A list of the entities found, in the order of `entity_ids`.
+        """
+        entities = []
+        for entity_id in entity_ids:
+            entity = self.get(entity_id, entity_type)
+            if entity is not None:
+                entities.append(entity)
+        return entities
+
+    def delete_many(self, entity_ids, entity_type):
+        """
+        Delete several entities of the same type by their IDs.
+
+        Args:
+            entity_ids: The IDs of the entities.
+            entity_type: The type of the entities.
+        """
+        for entity_id in entity_ids:
+            self.delete(entity_id, entity_type)
+
+    def find_by(self, entity_type, field, value):
+        """
+        Retrieve all entities of the given type whose field equals a value.
+
+        Fields listed in CASE_INSENSITIVE_FIELDS are compared by `index_key`.
+        Backends should override this to use a secondary index; the default
+        implementation scans every entity of the type.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            value: The value the field must equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        key = index_key(entity_type, field, value)
+        return [entity for entity in self.get_all(entity_type) if index_key(entity_type, field, entity.get(field)) == key]
+
+    def find_by_any(self, entity_type, field, values):
+        """
+        Retrieve all entities of the given type whose field equals any of several values.
+
+        Backends should override this to use a secondary index; the default
+        implementation scans every entity of the type once.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            values: The values the field may equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        keys = {index_key(entity_type, field, value) for value in values}
+        return [entity for entity in self.get_all(entity_type) if index_key(entity_type, field, entity.get(field)) in keys]
+
+    def version(self, entity_type):
+        """
+        Return a value that changes whenever entities of the given type may have changed.
+
+        Caches of stored entities compare it between reads to know when to
+        drop their copies. Backends may return a version covering more than
+        the given type; the default implementation returns None, meaning
+        that changes cannot be detected and stored entities must not be cached.
+
+        Args:
+            entity_type: The type of the entities.
+
+        Returns:
+            The current version, or None.
+        """
+        return None
@@ -0,0 +1,599 @@
+import json
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from app.persistence.persistence_manager import (
+    CASE_INSENSITIVE_FIELDS, DEFAULT_INDEXES, DEFAULT_SORTED_INDEXES, TIMESTAMP_FIELDS, IPersistenceManager,
+    check_filters, check_timestamp_format, index_key, sort_value
+)
+
+class _ThreadConnection:
+    """The connection of one thread, closed when the thread-local storage holding it is released."""
+
+    __slots__ = ('connection', '__weakref__')
+
+    def __init__(self, connection):
+        self.connection = connection
+
+def _close_connection(conn, connections, lock):
+    """Close the connection of a thread that exited and forget it."""
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
+class SQLiteDataManager(IPersistenceManager):
+    """
+    A persistence manager backed by an SQLite database.
+
+    Each entity type is stored in its own table keyed by the entity ID, so
+    point lookups use the primary key index and writes are transactional
+    without loading the whole dataset. The database runs in WAL mode so
+    readers never block the writer. Every thread gets its own connection,
+    which is reused for all of its calls together with the compiled
+    statements cached on it. The fields declared in `indexes` get an index
+    on their JSON value, which `find_by` uses; the fields listed in
+    CASE_INSENSITIVE_FIELDS are indexed and matched on their lowercased value.
+    The fields declared in `sorted_indexes` get an index on their JSON value
+    and the ID, which `query` uses for range filters and keyset sorting.
+
+    Every write transaction also increments the counter row of the
+    `_version` table, which `version` returns, so the version is the same
+    for every connection and changes with the writes of any of them.
+    """
+
+    STATEMENTS = {
+        'save': 'INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)',
+        'get': 'SELECT data FROM {table} WHERE id = ?',
+        'delete': 'DELETE FROM {table} WHERE id = ?',
+        'get_all': 'SELECT data FROM {table}',
+        'clear': 'DELETE FROM {table}',
+        'get_many': 'SELECT id, data FROM {table} WHERE id IN (SELECT value FROM json_each(?))',
+        'iter_all': 'SELECT id, data FROM {table} WHERE id > ? ORDER BY id LIMIT ?',
+        'page': 'SELECT data FROM {table} WHERE id > ? ORDER BY id LIMIT ?',
+        'find_by': 'SELECT data FROM {table} WHERE {expression} = ?',
+        'find_by_any': 'SELECT data FROM {table} WHERE {expression} IN (SELECT value FROM json_each(?))',
+        'version': 'SELECT value FROM _version WHERE id = 0',
+        'bump_version': 'INSERT INTO _version (id, value) VALUES (0, 1) ON CONFLICT (id) DO UPDATE SET value = value + 1',
+    }
+
+    def __init__(self, db_path="data.db", timeout=30.0, indexes=None, timestamp_format='iso', sorted_indexes=None):
+        """
+        Initialize the SQLiteDataManager object.
+
+        Args:
+            db_path (str, optional): Path of the SQLite database file. Defaults to "data.db".
+            timeout (float, optional): Seconds to wait for a lock held by another connection. Defaults to 30.0.
+            indexes (dict, optional): Indexed fields of each entity type. Defaults to DEFAULT_INDEXES.
+            timestamp_format (str, optional): Format of the stored timestamps, 'iso' or 'epoch_us'. Defaults to 'iso'.
+            sorted_indexes (dict, optional): Fields of each entity type indexed in order.
+                Defaults to DEFAULT_SORTED_INDEXES.
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        self.sorted_indexes = DEFAULT_SORTED_INDEXES if sorted_indexes is None else sorted_indexes
+        self.timestamp_format = check_timestamp_format(timestamp_format)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+        self._tables = set()
+        self._statements = {}
+
+    def _connection(self):
+        """
+        Return the connection of the calling thread, opening it on first use.
+
+        The connection is closed when the thread exits, so servers running
+        each request on a new thread do not leak connections.
+        """
+        holder = getattr(self._local, 'connection', None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS _version (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            holder = self._local.connection = _ThreadConnection(conn)
+            with self._lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _close_connection, conn, self._connections, self._lock)
+        return holder.connection
+
+    @contextmanager
+    def _writing(self):
+        """
+        Return the connection of the calling thread for writes committed at
+        the end of the block, or with the enclosing `transaction`.
+        """
+        conn = self._connection()
+        if getattr(self._local, 'transaction', False):
+            yield conn
+            return
+        with conn:
+            yield conn
+            conn.execute(self.STATEMENTS['bump_version'])
+
+    @contextmanager
+    def transaction(self, entity_types=()):
+        """
+        Run the block in a single transaction of the connection of the calling thread.
+
+        The transaction starts with `BEGIN IMMEDIATE`, which takes the write
+        lock of the database at once, so no other connection writes between
+        the reads and the writes of the block. It is committed at the end of
+        the block, or rolled back if the block fails. Tables created in the
+        block are only known to exist once it is committed.
+
+        Args:
+            entity_types (iterable, optional): Unused; the lock covers the whole database.
+        """
+        if getattr(self._local, 'transaction', False):
+            yield
+            return
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.transaction = True
+        self._local.created = set()
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.execute(self.STATEMENTS['bump_version'])
+            conn.commit()
+            self._tables.update(self._local.created)
+        finally:
+            self._local.transaction = False
+            self._local.created = set()
+
+    def _remember(self, key, sql):
+        """
+        Cache the SQL text of a statement, unless its table was created by the
+        open transaction of the thread, which may still be rolled back.
+        """
+        if key[0] not in getattr(self._local, 'created', ()):
+            self._statements[key] = sql
+
+    def _sql(self, entity_type, statement, field=None):
+        """
+        Return the SQL text of a statement for the given entity type.
+
+        The text is built once per (type, statement, field) so that every
+        call passes the very same string and hits the connection's statement
+        cache.
+        """
+        key = (entity_type, statement, field)
+        sql = self._statements.get(key)
+        if sql is None:
+            for name in (entity_type, field or 'id'):
+                if not name.isidentifier():
+                    raise ValueError(f"Invalid identifier: {name!r}")
+            self._ensure_table(entity_type)
+            sql = self.STATEMENTS[statement].format(table=f'"{entity_type}"', expression=self._expression(entity_type, field))
+            self._remember(key, sql)
+        return sql
+
+    def _patch_sql(self, entity_type, fields):
+        """Return the SQL text of an update setting the given fields of a record."""
+        key = (entity_type, 'patch', fields)
+        sql = self._statements.get(key)
+        if sql is None:
+            for name in (entity_type, *fields):
+                if not name.isidentifier():
+                    raise ValueError(f"Invalid identifier: {name!r}")
+            self._ensure_table(entity_type)
+            assignments = ', '.join(f"'$.{field}', json(?)" for field in fields)
+            sql = f'UPDATE "{entity_type}" SET data = json_set(data, {assignments}) WHERE id = ?'
+            self._remember(key, sql)
+        return sql
+
+    def _page_sql(self, entity_type, fields):
+        """Return the SQL text of a page query returning the ID and the given fields of records."""
+        key = (entity_type, 'page', fields)
+        sql = self._statements.get(key)
+        if sql is None:
+            for name in (entity_type, *fields):
+                if not name.isidentifier():
+                    raise ValueError(f"Invalid identifier: {name!r}")
+            self._ensure_table(entity_type)
+            sql = f'SELECT {self._columns(fields)} FROM "{entity_type}" WHERE id > ? ORDER BY id LIMIT ?'
+            self._remember(key, sql)
+        return sql
+
+    def _query_sql(self, entity_type, filters, order, rank, fields):
+        """
+        Return the SQL text of a query for the given shape of filters, order and cursor.
+
+        Args:
+            entity_type (str): The type of the entities.
+            filters (tuple): The (field, operator, JSON types) of the filters, where the
+                JSON types are those a range filter can match, or None for any.
+            order (str): The field to sort on, prefixed with '-' for descending order, or None.
+            rank (int): The rank of the value of the cursor, -1 for an ID cursor, or None without a cursor.
+            fields (tuple): The names of the fields to return besides the ID, or None for all of them.
+        """
+        key = (entity_type, 'query', filters, order, rank, fields)
+        sql = self._statements.get(key)
+        if sql is None:
+            field = order.lstrip('-') if order is not None else None
+            for name in (entity_type, *(name for name, _, _ in filters), *(fields or ()), *([field] if field else [])):
+                if not name.isidentifier():
+                    raise ValueError(f"Invalid identifier: {name!r}")
+            self._ensure_table(entity_type)
+            conditions = [f"{self._expression(entity_type, name) if op == '=' else self._value(name)} {op} ?"
+                          for name, op, _ in filters]
+            # SQLite ranks text above numbers, where `matches` never compares them.
+            conditions[:0] = [f"json_type(data, '$.{name}') IN ({', '.join(repr(kind) for kind in types)})"
+                              for name, _, types in filters if types]
+            descending = field is not None and order != field
+            if field is None:
+                if rank is not None:
+                    conditions.append('id > ?')
+                ordering = 'id'
+            else:
+                value = self._value(field)
+                if rank == 0:
+                    conditions.append(f'({value} IS NULL AND id < ?)' if descending
+                                      else f'(({value} IS NULL AND id > ?) OR {value} IS NOT NULL)')
+                elif rank is not None:
+                    conditions.append(f'({value} < ? OR ({value} = ? AND id < ?) OR {value} IS NULL)' if descending
+                                      else f'({value} > ? OR ({value} = ? AND id > ?))')
+                ordering = f'{value} DESC, id DESC' if descending else f'{value}, id'
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+            columns = 'data' if fields is None else self._columns(fields)
+            sql = f'SELECT {columns} FROM "{entity_type}"{where} ORDER BY {ordering} LIMIT ?'
+            self._remember(key, sql)
+        return sql
+
+    @staticmethod
+    def _range_types(field, op, value):
+        """
+        Return the JSON types of the values a range filter can match, like
+        `matches`: numbers for a numeric bound and text for a string one, or
+        None if the filter needs no type condition.
+        """
+        if op == '=' or field in TIMESTAMP_FIELDS:
+            return None
+        if isinstance(value, str):
+            return ('text',)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return ('integer', 'real')
+        return None
+
+    @staticmethod
+    def _columns(fields):
+        """Return the SQL expression of a JSON object with the ID and the given fields of a record."""
+        # `->` keeps the JSON type of each value, unlike json_extract which turns booleans into integers.
+        columns = ''.join(f", '{field}', json(data -> '$.{field}')" for field in fields)
+        return f"json_object('id', id{columns})"
+
+    @staticmethod
+    def _value(field):
+        """
+        Return the SQL expression of the JSON value of a field, as sorted and compared.
+
+        Like `sort_value`, it turns ISO 8601 timestamps into epoch microseconds,
+        from their whole seconds and their fraction.
+        """
+        value = f"json_extract(data, '$.{field}')"
+        if field not in TIMESTAMP_FIELDS:
+            return value
+        return (f"CASE WHEN json_type(data, '$.{field}') = 'text' "
+                f"THEN CAST(strftime('%s', substr({value}, 1, 19)) AS INTEGER) * 1000000 "
+                f"+ CASE WHEN substr({value}, 20, 1) = '.' "
+                f"THEN CAST(substr(substr({value}, 21) || '000000', 1, 6) AS INTEGER) ELSE 0 END ELSE {value} END")
+
+    @staticmethod
+    def _expression(entity_type, field):
+        """Return the SQL expression a field is indexed and matched on."""
+        if field is None:
+            return None
+        expression = f"json_extract(data, '$.{field}')"
+        if field in CASE_INSENSITIVE_FIELDS.get(entity_type, ()):
+            # SQLite only lowercases ASCII letters, which covers email addresses.
+            expression = f'lower({expression})'
+        return expression
+
+    def _ensure_table(self, entity_type):
+        """Create the table of the given entity type if it does not exist yet."""
+        if entity_type in self._tables or entity_type in getattr(self._local, 'created', ()):
+            return
+        with self._writing() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{entity_type}" (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            for field in self.indexes.get(entity_type, ()):
+                expression = self._expression(entity_type, field)
+                name = f'{entity_type}_{field}_lower' if expression.startswith('lower(') else f'{entity_type}_{field}'
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{entity_type}" ({expression})')
+            for field in self.sorted_indexes.get(entity_type, ()):
+                name = f'{entity_type}_{field}_sorted'
+                if field in TIMESTAMP_FIELDS:
+                    # Timestamps were indexed on their stored value before being sorted in time order.
+                    conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+                    name += '_us'
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{entity_type}" ({self._value(field)}, id)')
+        if getattr(self._local, 'transaction', False):
+            self._local.created.add(entity_type)
+        else:
+            self._tables.add(entity_type)
+
+    def close(self):
+        """Close every connection opened by this manager."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def save(self, entity):
+        """
+        Save the given entity to its table.
+
+        Args:
+            entity: The entity object to be saved.
+        """
+        sql = self._sql(entity.__class__.__name__, 'save')
+        with self._writing() as conn:
+            conn.execute(sql, (entity.id, json.dumps(entity.to_dict(self.timestamp_format))))
+
+    def patch(self, entity, changes):
+        """
+        Save the changed fields of an entity with an in-place JSON update of its row.
+
+        Args:
+            entity: The entity object to be saved.
+            changes (dict): The changed fields of the entity and their new values.
+        """
+        entity_type = entity.__class__.__name__
+        sql = self._patch_sql(entity_type, tuple(changes))
+        with self._writing() as conn:
+            cursor = conn.execute(sql, [json.dumps(value) for value in changes.values()] + [entity.id])
+            if cursor.rowcount == 0:
+                conn.execute(self._sql(entity_type, 'save'), (entity.id, json.dumps(entity.to_dict(self.timestamp_format))))
+
+    def get(self, entity_id, entity_type):
+        """
+        Retrieve the entity with the given ID and type.
+
+        Args:
+            entity_id: The ID of the entity to retrieve.
+            entity_type: The type of the entity to retrieve.
+
+        Returns:
+            The entity with the given ID and type, or None if not found.
+        """
+        row = self._connection().execute(self._sql(entity_type, 'get'), (entity_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, entity):
+        """
+        Update the given entity.
+
+        Args:
+            entity: The entity object to be updated.
+        """
+        self.save(entity)
+
+    def delete(self, entity_id, entity_type):
+        """
+        Delete the entity with the given ID and type.
+
+        Args:
+            entity_id: The ID of the entity to delete.
+            entity_type: The type of the entity to delete.
+        """
+        sql = self._sql(entity_type, 'delete')
+        with self._writing() as conn:
+            conn.execute(sql, (entity_id,))
+
+    def get_all(self, entity_type):
+        """
+        Retrieve all entities of the given type.
+
+        Args:
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of all entities of the given type.
+        """
+        rows = self._connection().execute(self._sql(entity_type, 'get_all'))
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_all(self, entity_type, batch_size=1000):
+        """
+        Iterate over all entities of the given type in ID order, one batch at a time.
+
+        Each batch is a separate primary key range query, so no read
+        transaction is held open between batches.
+
+        Args:
+            entity_type: The type of the entities to iterate over.
+            batch_size: The number of entities fetched per query.
+
+        Yields:
+            The entities of the given type.
+        """
+        sql = self._sql(entity_type, 'iter_all')
+        last_id = ''
+        while True:
+            rows = self._connection().execute(sql, (last_id, batch_size)).fetchall()
+            for entity_id, data in rows:
+                yield json.loads(data)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def page(self, entity_type, limit, after=None, fields=None):
+        """
+        Retrieve a page of the entities of the given type with a primary key range query.
+
+        When `fields` is given, only those fields are extracted from the
+        stored JSON; fields an entity lacks are returned as None.
+
+        Args:
+            entity_type: The type of the entities.
+            limit: The number of entities to return at most.
+            after: The ID the page starts after, or None for the first page.
+            fields: The names of the fields to return besides the ID, or None for all of them.
+
+        Returns:
+            A list of the entities of the page.
+        """
+        sql = self._sql(entity_type, 'page') if fields is None else self._page_sql(entity_type, tuple(fields))
+        rows = self._connection().execute(sql, (after or '', limit)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_many(self, entities):
+        """
+        Save several entities in a single transaction.
+
+        Args:
+            entities: The entity objects to be saved.
+        """
+        self.commit(saved=entities)
+
+    def commit(self, saved=(), deleted=()):
+        """
+        Save and delete entities of any types in a single transaction.
+
+        Args:
+            saved: The entity objects to be saved.
+            deleted: (type, id) pairs of the entities to delete.
+        """
+        saved_by_type = {}
+        for entity in saved:
+            saved_by_type.setdefault(entity.__class__.__name__, []).append((entity.id, json.dumps(entity.to_dict(self.timestamp_format))))
+        deleted_by_type = {}
+        for entity_type, entity_id in deleted:
+            deleted_by_type.setdefault(entity_type, []).append((entity_id,))
+        statements = [(self._sql(entity_type, 'save'), rows) for entity_type, rows in saved_by_type.items()]
+        statements += [(self._sql(entity_type, 'delete'), rows) for entity_type, rows in deleted_by_type.items()]
+        with self._writing() as conn:
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+
+    def get_many(self, entity_ids, entity_type):
+        """
+        Retrieve several entities of the same type with a single query.
+
+        Args:
+            entity_ids: The IDs of the entities to retrieve.
+            entity_type: The type of the entities to retrieve.
+
+        Returns:
+            A list of the entities found, in the order of `entity_ids`.
+        """
+        entity_ids = list(entity_ids)
+        rows = self._connection().execute(self._sql(entity_type, 'get_many'), (json.dumps(entity_ids),))
+        found = dict(rows.fetchall())
+        return [json.loads(found[entity_id]) for entity_id in entity_ids if entity_id in found]
+
+    def delete_many(self, entity_ids, entity_type):
+        """
+        Delete several entities of the same type in a single transaction.
+
+        Args:
+            entity_ids: The IDs of the entities to delete.
+            entity_type: The type of the entities to delete.
+        """
+        sql = self._sql(entity_type, 'delete')
+        with self._writing() as conn:
+            conn.executemany(sql, [(entity_id,) for entity_id in entity_ids])
+
+    def find_by(self, entity_type, field, value):
+        """
+        Retrieve all entities of the given type whose field equals a value.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            value: The value the field must equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        sql = self._sql(entity_type, 'find_by', field)
+        rows = self._connection().execute(sql, (index_key(entity_type, field, value),))
+        return [json.loads(row[0]) for row in rows]
+
+    def find_by_any(self, entity_type, field, values):
+        """
+        Retrieve all entities of the given type whose field equals any of several values.
+
+        Args:
+            entity_type: The type of the entities.
+            field: The name of the field to match.
+            values: The values the field may equal.
+
+        Returns:
+            A list of the matching entities.
+        """
+        sql = self._sql(entity_type, 'find_by_any', field)
+        keys = list({index_key(entity_type, field, value) for value in values})
+        rows = self._connection().execute(sql, (json.dumps(keys),))
+        return [json.loads(row[0]) for row in rows]
+
+    def query(self, entity_type, filters=(), order=None, limit=None, after=None, fields=None):
+        """
+        Retrieve the entities of the given type that pass filters, in a given order.
+
+        Filters and the order are compiled to a single SQL query. Equality
+        filters on indexed fields and range filters or an order on sorted
+        fields use their index, and the cursor is a keyset condition, so a
+        page reads no more than `limit` rows past the cursor when the
+        index order serves the query.
+
+        Args:
+            entity_type: The type of the entities.
+            filters: (field, operator, value) tuples, with an operator of FILTER_OPERATORS.
+            order: The field to sort on, prefixed with '-' for descending order, or None.
+            limit: The number of entities to return at most, or None for all of them.
+            after: The `sort_key` of the entity to resume after, or None to start at the first one.
+            fields: The names of the fields to return besides the ID, or None for all of them.
+
+        Returns:
+            A list of the matching entities.
+
+        Raises:
+            ValueError: If a filter operator is unknown.
+        """
+        filters = check_filters(filters)
+        rank = None
+        params = [index_key(entity_type, field, value) if op == '=' else sort_value(field, value)
+                  for field, op, value in filters]
+        if after is not None and order is None:
+            rank = -1
+            params.append(after)
+        elif after is not None:
+            rank = after[0]
+            params += [after[2]] if rank == 0 else [after[1], after[1], after[2]]
+        sql = self._query_sql(entity_type, tuple((field, op, self._range_types(field, op, value))
+                                                 for field, op, value in filters), order, rank,
+                              None if fields is None else tuple(fields))
+        rows = self._connection().execute(sql, params + [-1 if limit is None else limit])
+        return [json.loads(row[0]) for row in rows]
+
+    def version(self, entity_type):
+        """
+        Return the version of the whole database: the number of write
+        transactions committed by any connection.
+
+        Args:
+            entity_type: Unused; every type shares the version of the database.
+
+        Returns:
+            int: The version of the database.
+        """
+        row = self._connection().execute(self.STATEMENTS['version']).fetchone()
+        return row[0] if row else 0
+
+    def clear(self, entity_type):
+        """
+        Clear all entities of the given type.
+
+        Args:
+            entity_type: The type of the entities to clear.
+        """
+        sql = self._sql(entity_type, 'clear')
+        with self._writing() as conn:
+            conn.execute(sql)
@@ -0,0 +1,254 @@
+import threading
+from collections import OrderedDict
+from app.models import unit_of_work
+from app.persistence import storage
+
+# Number of entities each repository keeps in memory by default.
+DEFAULT_CACHE_SIZE = 1024
+
+# Repositories by entity type, shared by every endpoint and thread.
+_repositories = {}
+
+# Cache size of the repositories, set by `configure`.
+_cache_size = DEFAULT_CACHE_SIZE
+
+class Repository:
+    """
+    The entities of one model as the API endpoints read and write them.
+
+    Entities read by ID go through a bounded, least recently used cache of
+    their stored data, in front of the configured persistence manager. The
+    cache is validated against `storage.version()` on every read and
+    dropped as soon as the stored entities may have changed, whether
+    through this process or through another worker sharing the storage.
+    Backends that cannot tell when their data changed are never cached.
+
+    Inside a unit of work, entities it already loaded or saved are returned
+    from its identity map.
+    """
+
+    def __init__(self, model, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            model (type): The model class of the entities.
+            cache_size (int, optional): Number of entities kept in memory; 0 disables
+                the cache. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        self.model = model
+        self.entity_type = model.__name__
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _storage_version(manager, entity_type):
+        """Return the version of a type in a persistence manager, or None if it has none."""
+        version = manager.version(entity_type)
+        if version is None:
+            return None
+        # Versions of different managers must not compare equal.
+        return manager, version
+
+    def _cached(self, entity_id, version):
+        """Return the cached data of an entity, after dropping the cache if `version` changed."""
+        with self._lock:
+            if version is None or version != self._version:
+                self._cache.clear()
+                self._version = version
+                return None
+            data = self._cache.get(entity_id)
+            if data is not None:
+                self._cache.move_to_end(entity_id)
+            return data
+
+    def _remember(self, entity_id, data, version):
+        """Cache the data of an entity read at `version`, evicting the least recently used ones."""
+        with self._lock:
+            if version is None or version != self._version or not self.cache_size:
+                return
+            self._cache[entity_id] = data
+            self._cache.move_to_end(entity_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def forget(self, entity_id=None):
+        """
+        Drop an entity, or every entity, from the cache.
+
+        Args:
+            entity_id (str, optional): The ID of the entity. Defaults to None.
+        """
+        with self._lock:
+            if entity_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(entity_id, None)
+
+    def get(self, entity_id):
+        """
+        Retrieves an entity by its ID, from the cache when it is still valid.
+
+        Args:
+            entity_id (str): The ID of the entity.
+
+        Returns:
+            BaseModel or None: The entity if found, None otherwise.
+        """
+        unit = unit_of_work.current()
+        if unit is not None:
+            entity = unit.get(self.entity_type, entity_id)
+            if entity is not None:
+                return entity
+        manager = storage.manager
+        version = self._storage_version(manager, self.entity_type)
+        data = self._cached(entity_id, version)
+        if data is None:
+            data = manager.get(entity_id, self.entity_type)
+            if data is None:
+                return None
+            self._remember(entity_id, data, version)
+        return self.model._load(data)
+
+    def list(self):
+        """
+        Retrieves all entities of the model.
+
+        Returns:
+            list: The entities.
+        """
+        return self.model.get_all()
+
+    def page(self, limit, after=None, fields=None):
+        """
+        Retrieves a page of the entities of the model in ID order.
+
+        With `fields`, only those fields are read from the storage and the
+        page holds their stored data rather than entities, which must not
+        be saved with the other fields missing.
+
+        Args:
+            limit (int): The number of entities to return at most.
+            after (str, optional): The ID the page starts after. Defaults to None.
+            fields (tuple, optional): The fields to read besides the ID. Defaults to None.
+
+        Returns:
+            list: The entities of the page, or their data if `fields` is given.
+        """
+        if fields is None:
+            return self.model.page(limit, after)
+        unit_of_work.flush()
+        return storage.page(self.entity_type, limit, after, fields)
+
+    def query(self, filters=(), order=None, limit=None, after=None, fields=None):
+        """
+        Retrieves the entities of the model that pass filters, in a given order.
+
+        Like `page`, the result holds stored data rather than entities
+        when `fields` is given.
+
+        Args:
+            filters (list, optional): (field, operator, value) filters. Defaults to ().
+            order (str, optional): The field to sort on, prefixed with '-' for descending
+                order. Defaults to None, for ID order.
+            limit (int, optional): The number of entities to return at most. Defaults to None.
+            after (optional): The `sort_key` of the entity to resume after. Defaults to None.
+            fields (tuple, optional): The fields to read besides the ID. Defaults to None.
+
+        Returns:
+            list: The matching entities, or their data if `fields` is given.
+        """
+        if fields is None:
+            return self.model.query(filters, order, limit, after)
+        unit_of_work.flush()
+        return storage.query(self.entity_type, filters, order, limit, after, fields)
+
+    def create(self, values):
+        """
+        Creates and saves an entity.
+
+        Args:
+            values (dict): Values of the fields of the model; missing ones are None
+                and other keys are ignored.
+
+        Returns:
+            BaseModel: The new entity.
+
+        Raises:
+            ValueError: If the model refuses to save the entity.
+        """
+        entity = self.model(**{field: values.get(field) for field in self.model.fields})
+        entity.save()
+        return entity
+
+    def update(self, entity_id, values):
+        """
+        Updates the given fields of an entity and saves it.
+
+        Args:
+            entity_id (str): The ID of the entity.
+            values (dict): New values of fields of the model; other keys are ignored.
+
+        Returns:
+            BaseModel or None: The entity, or None if it does not exist.
+
+        Raises:
+            ValueError: If the model refuses to save the entity.
+        """
+        entity = self.get(entity_id)
+        if entity is None:
+            return None
+        for field in self.model.fields:
+            if field in values:
+                setattr(entity, field, values[field])
+        entity.save()
+        self.forget(entity_id)
+        return entity
+
+    def delete(self, entity_id):
+        """
+        Deletes an entity, together with the dependents its model cascades to.
+
+        Args:
+            entity_id (str): The ID of the entity.
+
+        Returns:
+            bool: Whether the entity existed.
+        """
+        entity = self.get(entity_id)
+        if entity is None:
+            return False
+        entity.delete()
+        self.forget(entity_id)
+        return True
+
+
+def repository(model):
+    """
+    Return the repository shared by every user of a model.
+
+    Args:
+        model (type): The model class.
+
+    Returns:
+        Repository: The repository of the model.
+    """
+    repo = _repositories.get(model.__name__)
+    if repo is None:
+        repo = _repositories.setdefault(model.__name__, Repository(model, _cache_size))
+    return repo
+
+
+def configure(cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Set the cache size of every repository and empty their caches.
+
+    Args:
+        cache_size (int, optional): Number of entities each repository keeps in
+            memory; 0 disables the caches. Defaults to DEFAULT_CACHE_SIZE.
+    """
+    global _cache_size
+    _cache_size = cache_size
+    for repo in _repositories.values():
+        repo.cache_size = cache_size
+        repo.forget()
@@ -0,0 +1,21 @@
+import os
+import tempfile
+import unittest
+from app.persistence import storage
+from app.persistence.data_manager import DataManager
+
+class StorageTestCase(unittest.TestCase):
+    """
+    Base test case running each test against a data file in a temporary directory.
+
+    The manager shared by the models is replaced by `self.storage` for the
+    test, and the previous one restored afterwards, so tests never write to
+    the default data file nor close the manager other tests use.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, 'data.json')
+        self.storage = DataManager(self.file_path)
+        self.addCleanup(storage.use, storage.use(self.storage, close=False))
@@ -1,13 +1,15 @@
 import unittest
 import json
 from app import create_app
+from tests import StorageTestCase
 
-class APITestCase(unittest.TestCase):
+class APITestCase(StorageTestCase):
     """
     Test case for the API endpoints related to reviews.
     """
 
     def setUp(self):
+        super().setUp()
         self.app = create_app()
         self.client = self.app.test_client()
 
@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+from app.models.amenity import Amenity
+from app.models.base_model import BaseModel
+from app.models.place import Place
+from app.models.review import Review
+
+class BaseModelTestCase(unittest.TestCase):
+    """
+    Test case for the BaseModel class.
+    """
+
+    def setUp(self):
+        self.review = Review(user_id='123', place_id='456', rating=5, comment='Great place!')
+
+    def test_to_dict(self):
+        data = self.review.to_dict()
+        self.assertEqual(list(data), ['id', 'user_id', 'place_id', 'rating', 'comment', 'created_at', 'updated_at'])
+        self.assertEqual(data['created_at'], self.review.created_at.isoformat())
+
+    def test_from_dict_round_trip(self):
+        copy = Review.from_dict(self.review.to_dict())
+        self.assertIsInstance(copy, Review)
+        self.assertEqual(copy.to_dict(), self.review.to_dict())
+
+    def test_from_dict_generates_no_id_or_timestamp(self):
+        data = self.review.to_dict()
+        with mock.patch('app.models.base_model.uuid.uuid4') as uuid4, \
+                mock.patch('app.models.base_model.datetime') as datetime_mock:
+            datetime_mock.fromisoformat.side_effect = lambda value: value
+            Review.from_dict(data)
+        uuid4.assert_not_called()
+        datetime_mock.utcnow.assert_not_called()
+
+    def test_entities_use_slots(self):
+        self.assertFalse(hasattr(self.review, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.review.unknown = 1
+
+    def test_entity_type_is_class_name(self):
+        amenity = Amenity(name='WiFi')
+        with mock.patch('app.models.base_model.storage') as storage:
+            amenity.delete()
+        storage.delete.assert_called_once_with(amenity.id, 'Amenity')
+        self.assertTrue(issubclass(Place, BaseModel))
+
+    def test_iter_all_builds_entities_lazily(self):
+        with mock.patch('app.models.base_model.storage') as storage:
+            storage.iter_all.return_value = iter([self.review.to_dict()])
+            iterator = Review.iter_all(batch_size=10)
+            storage.iter_all.assert_not_called()
+            self.assertEqual([review.id for review in iterator], [self.review.id])
+        storage.iter_all.assert_called_once_with('Review', 10)
+
+    def test_unchanged_entity_is_not_saved(self):
+        loaded = Review.from_dict(self.review.to_dict())
+        updated_at = loaded.updated_at
+        with mock.patch('app.models.base_model.storage') as storage:
+            loaded.save()
+            Review.save_many([loaded])
+        self.assertEqual(storage.mock_calls, [])
+        self.assertEqual(loaded.updated_at, updated_at)
+
+    def test_save_patches_changed_fields(self):
+        loaded = Review.from_dict(self.review.to_dict())
+        loaded.comment = 'Updated'
+        self.assertEqual(loaded.changed_fields(), ['comment'])
+        with mock.patch('app.models.base_model.storage') as storage:
+            loaded.save()
+            loaded.save()
+        storage.patch.assert_called_once_with(loaded, {'comment': 'Updated', 'updated_at': loaded.updated_at.isoformat()})
+        self.assertEqual(loaded.changed_fields(), [])
+
+    def test_new_and_deleted_entities_are_saved_whole(self):
+        amenity = Amenity(name='WiFi')
+        with mock.patch('app.models.base_model.storage') as storage:
+            amenity.save()
+            amenity.delete()
+            amenity.save()
+        self.assertEqual(storage.save.call_count, 2)
+        storage.patch.assert_not_called()
+
+    def test_epoch_timestamps_round_trip(self):
+        data = self.review.to_dict('epoch_us')
+        self.assertIsInstance(data['created_at'], int)
+        copy = Review.from_dict(data)
+        self.assertEqual(copy.created_at, self.review.created_at)
+        self.assertEqual(copy.to_dict(), self.review.to_dict())
+
+    def test_timestamps_are_parsed_on_access(self):
+        data = self.review.to_dict()
+        copy = Review.from_dict(data)
+        with mock.patch('app.models.base_model._to_datetime') as to_datetime:
+            self.assertEqual(copy.to_dict(), data)
+        to_datetime.assert_not_called()
+        self.assertEqual(copy.updated_at.isoformat(), data['updated_at'])
+
+if __name__ == '__main__':
+    unittest.main()
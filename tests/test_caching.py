@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+from app import create_app
+from tests import StorageTestCase
+
+class CachingTestCase(StorageTestCase):
+    """
+    Test case for the ETags, conditional GETs and Cache-Control headers.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.app = create_app({'CACHE_CONTROL': {'amenities': 'max-age=60'}})
+        self.client = self.app.test_client()
+        self.place_id = self.client.post('/api/v1/places/', json={
+            'name': 'Loft', 'description': 'Nice', 'price_per_night': 80.0, 'max_guests': 2
+        }).get_json()['id']
+
+    def _revalidate(self, url, response, **kwargs):
+        return self.client.get(url, headers={'If-None-Match': response.headers['ETag']}, **kwargs)
+
+    def test_unchanged_entity_is_not_modified(self):
+        url = f'/api/v1/places/{self.place_id}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        with mock.patch('flask_restx.marshalling.marshal') as marshal:
+            not_modified = self._revalidate(url, response)
+        marshal.assert_not_called()
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.data, b'')
+        self.assertEqual(not_modified.headers['ETag'], response.headers['ETag'])
+        self.assertEqual(not_modified.headers['Cache-Control'], 'no-cache')
+        self.assertEqual(self._revalidate(url + '?fields=name', response).status_code, 200)
+
+    def test_changes_make_a_new_etag(self):
+        url = f'/api/v1/places/{self.place_id}'
+        response = self.client.get(url)
+        self.client.put(url, json={'name': 'Loft', 'description': 'Nicer'})
+        updated = self._revalidate(url, response)
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated.headers['ETag'], response.headers['ETag'])
+        self.client.post('/api/v1/reviews/', json={'user_id': 'u1', 'place_id': self.place_id, 'rating': 4, 'text': 'Ok'})
+        rated = self._revalidate(url, updated)
+        self.assertEqual(rated.status_code, 200)
+        self.assertEqual(rated.get_json()['rating']['count'], 1)
+
+    def test_list_etag_follows_the_collection(self):
+        url = '/api/v1/amenities/?limit=2'
+        self.client.post('/api/v1/amenities/', json={'name': 'WiFi'})
+        response = self.client.get(url)
+        self.assertEqual(response.headers['Cache-Control'], 'max-age=60')
+        self.assertEqual(self._revalidate(url, response).status_code, 304)
+        self.assertEqual(self._revalidate(url + '&fields=name', response).status_code, 200)
+        self.client.post('/api/v1/amenities/', json={'name': 'Pool'})
+        self.assertEqual(self._revalidate(url, response).status_code, 200)
+        response = self.client.get('/api/v1/places/?fields=name')
+        self.assertEqual(self._revalidate('/api/v1/places/?fields=name', response).status_code, 304)
+        self.client.put(f'/api/v1/places/{self.place_id}', json={'name': 'Loft', 'description': 'Nicer'})
+        self.assertEqual(self._revalidate('/api/v1/places/?fields=name', response).status_code, 200)
+
+    def test_reads_do_not_convert_timestamps(self):
+        with mock.patch('app.models.base_model._to_datetime') as to_datetime, \
+                mock.patch('app.models.base_model._format_timestamp') as format_timestamp:
+            self.assertEqual(self.client.get(f'/api/v1/places/{self.place_id}').status_code, 200)
+            self.assertEqual(self.client.get('/api/v1/places/').status_code, 200)
+        to_datetime.assert_not_called()
+        format_timestamp.assert_not_called()
+
+    def test_missing_entities_and_writes_are_not_cached(self):
+        response = self.client.get('/api/v1/places/missing', headers={'If-None-Match': '*'})
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response.headers)
+        response = self.client.post('/api/v1/amenities/', json={'name': 'WiFi'})
+        self.assertNotIn('Cache-Control', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
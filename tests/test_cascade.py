@@ -0,0 +1,102 @@
+import os
+import unittest
+from unittest import mock
+from app.models.amenity import Amenity
+from app.models.city import City
+from app.models.country import Country
+from app.models.place import Place
+from app.models.place_rating import PlaceRating
+from app.models.review import Review
+from app.models.user import User
+from app.persistence import create_storage, storage
+from tests import StorageTestCase
+
+class CascadeTestCase(StorageTestCase):
+    """
+    Test case for the deletion of dependent entities.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.country = Country(name='France', code='FR')
+        self.cities = [City(name='Paris', country_code='FR'), City(name='Berlin', country_code='DE')]
+        self.users = [User(email=f'user{i}@example.com', first_name='User', last_name=str(i)) for i in range(2)]
+        self.places = [self._place(f'Place {i}', self.cities[i % 2].id, self.users[0].id) for i in range(4)]
+        self.reviews = [Review(user_id=self.users[i % 2].id, place_id=self.places[i % 4].id, rating=i % 5 + 1,
+                               comment='') for i in range(8)]
+        self.country.save()
+        City.save_many(self.cities)
+        User.save_many(self.users)
+        Place.save_many(self.places)
+        Review.save_many(self.reviews)
+
+    def _place(self, name, city_id, host_id):
+        return Place(name=name, description='Nice', address='1 Main St', city_id=city_id,
+                     latitude=1.0, longitude=2.0, host_id=host_id, num_rooms=1,
+                     num_bathrooms=1, price_per_night=50.0, max_guests=2)
+
+    def test_country_deletes_cities_places_and_reviews_in_one_commit(self):
+        with mock.patch.object(self.storage, 'commit', wraps=self.storage.commit) as commit, \
+                mock.patch.object(self.storage, 'find_by') as find_by:
+            self.country.delete()
+        commit.assert_called_once()
+        find_by.assert_not_called()
+        self.assertIsNone(Country.get(self.country.id))
+        self.assertEqual([city.id for city in City.get_all()], [self.cities[1].id])
+        self.assertEqual({place.city_id for place in Place.get_all()}, {self.cities[1].id})
+        self.assertEqual(len(Review.get_all()), 4)
+        self.assertEqual(PlaceRating.get_many([place.id for place in self.places[::2]]), [])
+        self.assertEqual(len(PlaceRating.get_all()), 2)
+
+    def test_countries_without_a_code_have_no_cities(self):
+        for backend in ('json', 'sqlite'):
+            with self.subTest(backend=backend):
+                if backend == 'sqlite':
+                    storage.use(create_storage('sqlite', db_path=os.path.join(self.tmp_dir.name, 'data.db')))
+                country = Country(name='Nowhere', code=None)
+                city = City(name='Atlantis', country_code=None)
+                country.save()
+                city.save()
+                self.assertEqual(country.cities, [])
+                country.delete()
+                self.assertIsNotNone(City.get(city.id))
+
+    def test_shared_country_codes_keep_their_cities(self):
+        other = Country(name='France', code='FR')
+        other.save()
+        self.country.delete()
+        self.assertEqual([city.name for city in other.cities], ['Paris'])
+        self.assertEqual(len(Place.get_all()), 4)
+        Country.delete_many([other.id])
+        self.assertEqual([city.id for city in City.get_all()], [self.cities[1].id])
+
+    def test_user_deletion_keeps_aggregates_of_other_places(self):
+        host, reviewer = self.users
+        place = self._place('Elsewhere', self.cities[1].id, reviewer.id)
+        place.save()
+        Review(user_id=host.id, place_id=place.id, rating=5, comment='').save()
+        Review(user_id=reviewer.id, place_id=place.id, rating=3, comment='').save()
+        host.delete()
+        self.assertEqual([item.id for item in Place.get_all()], [place.id])
+        self.assertEqual([review.user_id for review in Review.get_all()], [reviewer.id])
+        self.assertEqual(PlaceRating.summaries([place.id])[place.id],
+                         {'count': 1, 'average': 3.0, 'histogram': [0, 0, 1, 0, 0]})
+
+    def test_delete_many_cascades(self):
+        City.delete_many([city.id for city in self.cities] + ['missing'])
+        self.assertEqual(Place.get_all(), [])
+        self.assertEqual(Review.get_all(), [])
+        self.assertEqual(PlaceRating.get_all(), [])
+        self.assertEqual(len(Country.get_all()), 1)
+
+    def test_models_without_dependents_delete_directly(self):
+        amenity = Amenity(name='WiFi')
+        amenity.save()
+        with mock.patch.object(self.storage, 'commit') as commit:
+            amenity.delete()
+            Amenity.delete_many(['missing'])
+        commit.assert_not_called()
+        self.assertIsNone(Amenity.get(amenity.id))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,15 @@
 import unittest
 import json
 from app import create_app
+from tests import StorageTestCase
 
-class CityEndpointsTestCase(unittest.TestCase):
+class CityEndpointsTestCase(StorageTestCase):
     """
     Test case for the City endpoints in the API.
     """
 
     def setUp(self):
+        super().setUp()
         self.app = create_app()
         self.client = self.app.test_client()
 
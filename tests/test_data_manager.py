@@ -1,4 +1,12 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
+from app.persistence.codecs import CODECS, convert, main as codecs_main
 from app.persistence.data_manager import DataManager
 from app.models.user import User
 from app.models.city import City
@@ -166,5 +174,414 @@ class DataManagerTestCase(unittest.TestCase):
         countries = Country.get_all()
         self.assertEqual(len(countries), 2)
 
+class DataManagerCacheTestCase(unittest.TestCase):
+    """
+    Test case for the in-memory cache of the DataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'data.json')
+        self.data_manager = DataManager(self.file_path)
+        self.user = User(email='cache@example.com', password='password', first_name='Cache', last_name='User')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reads_are_served_from_memory(self):
+        self.data_manager.save(self.user)
+        with mock.patch.object(self.data_manager.codec, 'loads') as load:
+            self.assertEqual(self.data_manager.get(self.user.id, 'User')['email'], self.user.email)
+            self.assertEqual(len(self.data_manager.get_all('User')), 1)
+        load.assert_not_called()
+
+    def test_returned_records_are_copies(self):
+        self.data_manager.save(self.user)
+        self.data_manager.get(self.user.id, 'User')['email'] = 'changed@example.com'
+        self.assertEqual(self.data_manager.get(self.user.id, 'User')['email'], self.user.email)
+
+    def test_external_changes_are_detected(self):
+        self.data_manager.get_all('User')
+        other = DataManager(self.file_path)
+        other.save(self.user)
+        self.assertIsNotNone(self.data_manager.get(self.user.id, 'User'))
+        other.delete(self.user.id, 'User')
+        self.assertIsNone(self.data_manager.get(self.user.id, 'User'))
+
+    def test_version_changes_with_writes_of_any_process(self):
+        version = self.data_manager.version('User')
+        self.assertEqual(self.data_manager.version('User'), version)
+        self.data_manager.save(self.user)
+        self.assertNotEqual(self.data_manager.version('User'), version)
+        version = self.data_manager.version('User')
+        DataManager(self.file_path).delete(self.user.id, 'User')
+        self.assertNotEqual(self.data_manager.version('User'), version)
+
+    def test_writes_do_not_change_mappings_being_read(self):
+        self.data_manager.save(self.user)
+        self.data_manager.find_by('User', 'email', self.user.email)
+        iterator = iter(self.data_manager._entities('User').values())
+        next(iterator)
+        self.data_manager.save(User(email='other@example.com', first_name='Other', last_name='User'))
+        self.assertEqual(list(iterator), [])
+        self.assertEqual(len(self.data_manager.get_all('User')), 2)
+        self.assertEqual(len(self.data_manager.find_by('User', 'email', 'other@example.com')), 1)
+
+    def test_readers_run_alongside_a_writer_thread(self):
+        data_manager = DataManager(self.file_path, fsync=False)
+        errors = []
+
+        def write():
+            try:
+                for i in range(200):
+                    data_manager.save(Country(name=str(i), code=str(i)))
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        while writer.is_alive():
+            data_manager.get_all('Country')
+            data_manager.find_by('Country', 'name', '0')
+        writer.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(data_manager.get_all('Country')), 200)
+
+    def test_missing_file_is_recreated(self):
+        self.data_manager.save(self.user)
+        os.remove(self.file_path)
+        self.assertEqual(self.data_manager.get_all('User'), [])
+        self.assertTrue(os.path.exists(self.file_path))
+
+class DataManagerBulkTestCase(unittest.TestCase):
+    """
+    Test case for the bulk operations of the DataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_manager = DataManager(os.path.join(self.tmp_dir.name, 'data.json'))
+        self.reviews = [Review(user_id='123', place_id='456', rating=i % 5 + 1, comment=f'Review {i}') for i in range(50)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_many_writes_once(self):
+        with mock.patch.object(self.data_manager, '_write_data', wraps=self.data_manager._write_data) as write:
+            self.data_manager.save_many(self.reviews + [Country(name="France", code="FR")])
+        write.assert_called_once()
+        self.assertEqual(len(self.data_manager.get_all('Review')), 50)
+        self.assertEqual(len(self.data_manager.get_all('Country')), 1)
+
+    def test_get_many_keeps_order_and_skips_missing(self):
+        self.data_manager.save_many(self.reviews)
+        ids = [self.reviews[3].id, 'missing', self.reviews[1].id]
+        found = self.data_manager.get_many(ids, 'Review')
+        self.assertEqual([item['id'] for item in found], [self.reviews[3].id, self.reviews[1].id])
+
+    def test_delete_many_writes_once(self):
+        self.data_manager.save_many(self.reviews)
+        with mock.patch.object(self.data_manager, '_write_data', wraps=self.data_manager._write_data) as write:
+            self.data_manager.delete_many([review.id for review in self.reviews[:10]], 'Review')
+            self.data_manager.delete_many(['missing'], 'Review')
+        write.assert_called_once()
+        self.assertEqual(len(self.data_manager.get_all('Review')), 40)
+
+    def test_iter_all_yields_copies_lazily(self):
+        self.data_manager.save_many(self.reviews)
+        iterator = self.data_manager.iter_all('Review')
+        first = next(iterator)
+        first['comment'] = 'Changed'
+        self.data_manager.delete(self.reviews[-1].id, 'Review')
+        remaining = list(iterator)
+        self.assertEqual(len(remaining), 48)
+        self.assertNotEqual(self.data_manager.get(first['id'], 'Review')['comment'], 'Changed')
+
+def _save_countries(file_path, prefix, count):
+    data_manager = DataManager(file_path, fsync=False)
+    for i in range(count):
+        data_manager.save(Country(name=f"{prefix}{i}", code=prefix))
+
+class DataManagerConcurrencyTestCase(unittest.TestCase):
+    """
+    Test case for sharing a data file between several DataManager processes.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'data.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_concurrent_writers_lose_nothing(self):
+        processes = [
+            multiprocessing.Process(target=_save_countries, args=(self.file_path, f"P{n}", 25))
+            for n in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(len(DataManager(self.file_path).get_all('Country')), 100)
+
+    def test_writes_replace_the_file_atomically(self):
+        data_manager = DataManager(self.file_path)
+        inode = os.stat(self.file_path).st_ino
+        data_manager.save(Country(name="France", code="FR"))
+        self.assertNotEqual(os.stat(self.file_path).st_ino, inode)
+        self.assertFalse(os.path.exists(self.file_path + '.tmp'))
+
+    def test_corrupt_file_is_not_treated_as_empty(self):
+        data_manager = DataManager(self.file_path)
+        with open(self.file_path, 'w') as f:
+            f.write('{"Country": {')
+        with self.assertRaises(json.JSONDecodeError):
+            data_manager.save(Country(name="France", code="FR"))
+        with open(self.file_path) as f:
+            self.assertEqual(f.read(), '{"Country": {')
+
+class DataManagerCodecTestCase(unittest.TestCase):
+    """
+    Test case for the serialization codecs of the DataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.country = Country(name="France", code="FR")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_round_trip_with_every_codec(self):
+        for codec in CODECS:
+            with self.subTest(codec=codec):
+                data_manager = DataManager(self._path(f'data.{codec}'), codec=codec)
+                data_manager.save(self.country)
+                reloaded = DataManager(self._path(f'data.{codec}'), codec=codec)
+                self.assertEqual(reloaded.get(self.country.id, 'Country')['code'], 'FR')
+
+    def test_compact_json_is_smaller(self):
+        DataManager(self._path('pretty.json')).save(self.country)
+        DataManager(self._path('compact.json'), codec='json-compact').save(self.country)
+        self.assertLess(os.path.getsize(self._path('compact.json')), os.path.getsize(self._path('pretty.json')))
+
+    def test_offline_conversion(self):
+        DataManager(self._path('data.json')).save(self.country)
+        codecs_main([self._path('data.json'), self._path('data.pickle'), '--to', 'pickle'])
+        convert(self._path('data.pickle'), self._path('back.json'), 'pickle', 'json')
+        self.assertEqual(DataManager(self._path('back.json')).get(self.country.id, 'Country')['name'], 'France')
+
+    def test_shard_files_use_codec_extension(self):
+        data_manager = DataManager(shard_dir=self.tmp_dir.name, codec='marshal')
+        data_manager.save(self.country)
+        self.assertTrue(os.path.exists(self._path('Country.marshal')))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            DataManager(self._path('data.json'), codec='yaml')
+
+class DataManagerTimestampTestCase(unittest.TestCase):
+    """
+    Test case for the timestamp formats of the DataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'data.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_epoch_timestamps_are_stored_as_integers(self):
+        country = Country(name="France", code="FR")
+        DataManager(self.file_path, timestamp_format='epoch_us').save(country)
+        with open(self.file_path) as f:
+            stored = json.load(f)['Country'][country.id]
+        self.assertIsInstance(stored['created_at'], int)
+        self.assertEqual(Country.from_dict(stored).created_at, country.created_at)
+
+    def test_unknown_timestamp_format(self):
+        with self.assertRaises(ValueError):
+            DataManager(self.file_path, timestamp_format='rfc2822')
+
+class DataManagerIndexTestCase(unittest.TestCase):
+    """
+    Test case for the secondary indexes of the DataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'data.json')
+        self.data_manager = DataManager(self.file_path)
+        self.reviews = [Review(user_id='123', place_id=f'place{i % 3}', rating=5, comment='Nice') for i in range(9)]
+        self.data_manager.save_many(self.reviews)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _place_ids(self, place_id):
+        return sorted(item['id'] for item in self.data_manager.find_by('Review', 'place_id', place_id))
+
+    def test_find_by_indexed_field(self):
+        expected = sorted(review.id for review in self.reviews if review.place_id == 'place1')
+        with mock.patch.object(self.data_manager, 'get_all') as get_all:
+            self.assertEqual(self._place_ids('place1'), expected)
+        get_all.assert_not_called()
+        self.assertEqual(self.data_manager.find_by('Review', 'place_id', 'missing'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self._place_ids('place0')
+        moved = self.reviews[0]
+        moved.place_id = 'place9'
+        self.data_manager.save(moved)
+        self.data_manager.delete(self.reviews[3].id, 'Review')
+        self.data_manager.delete_many([self.reviews[6].id], 'Review')
+        self.assertEqual(self._place_ids('place0'), [])
+        self.assertEqual(self._place_ids('place9'), [moved.id])
+
+    def test_index_is_rebuilt_after_external_change(self):
+        self._place_ids('place0')
+        DataManager(self.file_path).delete(self.reviews[0].id, 'Review')
+        self.assertNotIn(self.reviews[0].id, self._place_ids('place0'))
+
+    def test_case_insensitive_index(self):
+        user = User(email='Mixed@Example.com', first_name='John', last_name='Doe')
+        self.data_manager.save(user)
+        self.assertEqual(self.data_manager.find_by('User', 'email', 'mixed@example.COM')[0]['id'], user.id)
+        self.assertEqual(self.data_manager.get(user.id, 'User')['email'], 'Mixed@Example.com')
+        user.email = 'other@example.com'
+        self.data_manager.save(user)
+        self.assertEqual(self.data_manager.find_by('User', 'email', 'MIXED@example.com'), [])
+
+    def test_find_by_unindexed_field(self):
+        self.assertEqual(len(self.data_manager.find_by('Review', 'comment', 'Nice')), 9)
+
+class WriteBehindDataManagerTestCase(unittest.TestCase):
+    """
+    Test case for the write-behind mode of the DataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'data.json')
+        self.data_manager = DataManager(self.file_path, write_behind=True, flush_interval=60, flush_threshold=10 ** 6)
+        self.countries = [Country(name=f"Country {i}", code=str(i)) for i in range(100)]
+
+    def tearDown(self):
+        self.data_manager.close()
+        self.tmp_dir.cleanup()
+
+    def _on_disk(self):
+        return DataManager(self.file_path).get_all('Country')
+
+    def test_writes_are_visible_before_flush(self):
+        with mock.patch.object(self.data_manager, '_write_data') as write:
+            for country in self.countries:
+                self.data_manager.save(country)
+            self.assertEqual(len(self.data_manager.get_all('Country')), 100)
+            self.assertEqual(self.data_manager.find_by('Country', 'code', '7')[0]['name'], 'Country 7')
+        write.assert_not_called()
+        self.assertEqual(self._on_disk(), [])
+
+    def test_flush_coalesces_writes(self):
+        with mock.patch.object(self.data_manager, '_write_data', wraps=self.data_manager._write_data) as write:
+            for country in self.countries:
+                self.data_manager.save(country)
+            self.data_manager.delete(self.countries[0].id, 'Country')
+            self.data_manager.flush()
+        write.assert_called_once()
+        self.assertEqual(len(self._on_disk()), 99)
+
+    def test_background_flush_after_threshold(self):
+        self.data_manager.close()
+        self.data_manager = DataManager(self.file_path, write_behind=True, flush_interval=60, flush_threshold=10)
+        for country in self.countries[:10]:
+            self.data_manager.save(country)
+        for _ in range(200):
+            if len(self._on_disk()) == 10:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(self._on_disk()), 10)
+
+    def test_background_flush_after_interval(self):
+        self.data_manager.close()
+        self.data_manager = DataManager(self.file_path, write_behind=True, flush_interval=0.01)
+        self.data_manager.save(self.countries[0])
+        for _ in range(200):
+            if self._on_disk():
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(self._on_disk()), 1)
+
+    def test_pending_writes_survive_external_changes(self):
+        self.data_manager.save(self.countries[0])
+        DataManager(self.file_path).save(self.countries[1])
+        self.assertEqual(len(self.data_manager.get_all('Country')), 2)
+        self.data_manager.flush()
+        self.assertEqual(len(self._on_disk()), 2)
+
+    def test_failed_flush_keeps_pending_writes(self):
+        self.data_manager.save(self.countries[0])
+        dumps, calls = self.data_manager.codec.dumps, []
+
+        def failing_once(data):
+            calls.append(data)
+            if len(calls) == 1:
+                raise OSError('disk full')
+            return dumps(data)
+
+        with mock.patch.object(self.data_manager.codec, 'dumps', side_effect=failing_once):
+            with self.assertRaises(OSError):
+                self.data_manager.flush()
+            self.assertEqual(len(self.data_manager.get_all('Country')), 1)
+            self.data_manager.flush()
+        self.assertEqual(len(self._on_disk()), 1)
+        self.assertEqual(self.data_manager._pending, {})
+
+    def test_close_flushes(self):
+        self.data_manager.save(self.countries[0])
+        self.data_manager.close()
+        self.assertEqual(len(self._on_disk()), 1)
+
+class ShardedDataManagerTestCase(unittest.TestCase):
+    """
+    Test case for the DataManager class with one file per entity type.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_manager = DataManager(shard_dir=self.tmp_dir.name)
+        self.country = Country(name="France", code="FR")
+        self.review = Review(user_id='123', place_id='456', rating=5, comment='Great place!')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_each_type_has_its_own_file(self):
+        self.data_manager.save(self.country)
+        self.data_manager.save(self.review)
+        shards = [name for name in os.listdir(self.tmp_dir.name) if name.endswith('.json')]
+        self.assertEqual(sorted(shards), ['Country.json', 'Review.json'])
+        self.assertEqual(self.data_manager.get(self.country.id, 'Country')['code'], 'FR')
+        self.assertEqual(self.data_manager.get(self.review.id, 'Review')['rating'], 5)
+
+    def test_write_leaves_other_types_untouched(self):
+        self.data_manager.save(self.review)
+        review_path = os.path.join(self.tmp_dir.name, 'Review.json')
+        before = os.stat(review_path).st_mtime_ns
+        self.data_manager.save(self.country)
+        self.data_manager.delete(self.country.id, 'Country')
+        self.assertEqual(os.stat(review_path).st_mtime_ns, before)
+
+    def test_shards_are_shared_between_instances(self):
+        self.data_manager.save(self.country)
+        other = DataManager(shard_dir=self.tmp_dir.name)
+        self.assertEqual(len(other.get_all('Country')), 1)
+        self.assertEqual(other.get_all('Review'), [])
+
 if __name__ == '__main__':
     unittest.main()
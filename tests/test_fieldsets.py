@@ -0,0 +1,54 @@
+import os
+import unittest
+from unittest import mock
+from app import create_app
+from app.models.place_rating import PlaceRating
+from app.persistence import create_storage, storage
+from tests import StorageTestCase
+
+class FieldsetsTestCase(StorageTestCase):
+    """
+    Test case for the sparse fieldsets selected with `?fields=`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.place_id = self.client.post('/api/v1/places/', json={
+            'name': 'Loft', 'description': 'Nice', 'price_per_night': 80.0, 'max_guests': 2
+        }).get_json()['id']
+
+    def test_list_returns_only_the_requested_fields(self):
+        with mock.patch.object(PlaceRating, 'summaries') as summaries, \
+                mock.patch.object(storage.manager, 'page', wraps=storage.manager.page) as page:
+            response = self.client.get('/api/v1/places/?fields=id,name,price_per_night')
+        self.assertEqual(response.get_json(), [{'id': self.place_id, 'name': 'Loft', 'price_per_night': 80.0}])
+        self.assertEqual(page.call_args[0][3], ('id', 'name', 'price_per_night', 'updated_at'))
+        summaries.assert_not_called()
+
+    def test_get_returns_only_the_requested_fields(self):
+        response = self.client.get(f'/api/v1/places/{self.place_id}?fields=name,rating{{count}}')
+        self.assertEqual(response.get_json(), {'name': 'Loft', 'rating': {'count': 0}})
+        response = self.client.get(f'/api/v1/places/{self.place_id}', headers={'X-Fields': 'id'})
+        self.assertEqual(response.get_json(), {'id': self.place_id})
+
+    def test_renamed_fields_are_read_from_their_attribute(self):
+        self.client.post('/api/v1/reviews/', json={'user_id': 'u1', 'place_id': self.place_id, 'rating': 5, 'text': 'Great'})
+        response = self.client.get('/api/v1/reviews/?fields=text')
+        self.assertEqual(response.get_json(), [{'text': 'Great'}])
+
+    def test_malformed_fields(self):
+        self.assertEqual(self.client.get('/api/v1/places/?fields=name{').status_code, 400)
+
+    def test_sqlite_projection_keeps_json_types(self):
+        db = create_storage('sqlite', db_path=os.path.join(self.tmp_dir.name, 'data.db'))
+        try:
+            db.save(PlaceRating(self.place_id))
+            self.assertEqual(db.page('PlaceRating', 10, fields=('histogram', 'missing')),
+                             [{'id': self.place_id, 'histogram': [0] * 5, 'missing': None}])
+        finally:
+            db.close()
+
+if __name__ == '__main__':
+    unittest.main()
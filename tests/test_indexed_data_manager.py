@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from app.persistence.indexed_data_manager import IndexedDataManager
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.models.user import User
+
+class IndexedDataManagerTestCase(unittest.TestCase):
+    """
+    Test case for the IndexedDataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'data.dat')
+        self.index_path = os.path.join(self.tmp_dir.name, 'data.idx')
+        self.storage = self._open()
+        self.reviews = [Review(user_id='123', place_id='456', rating=5, comment=f'Review {i}') for i in range(20)]
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def _open(self, compact_threshold=16 * 1024 * 1024):
+        return IndexedDataManager(self.data_path, self.index_path, compact_threshold=compact_threshold)
+
+    def _reopen(self, compact_threshold=16 * 1024 * 1024):
+        self.storage.close()
+        self.storage = self._open(compact_threshold)
+
+    def test_save_and_get(self):
+        self.storage.save_many(self.reviews)
+        self.assertEqual(self.storage.get(self.reviews[7].id, 'Review')['comment'], 'Review 7')
+        self.assertIsNone(self.storage.get('missing', 'Review'))
+        self.assertEqual(len(self.storage.get_all('Review')), 20)
+
+    def test_iter_all_decodes_records_on_demand(self):
+        self.storage.save_many(self.reviews)
+        with mock.patch('app.persistence.indexed_data_manager.json.loads', wraps=json.loads) as loads:
+            iterator = self.storage.iter_all('Review')
+            next(iterator)
+            loads.assert_called_once()
+            self.assertEqual(len(list(iterator)), 19)
+
+    def test_get_decodes_only_the_requested_record(self):
+        self.storage.save_many(self.reviews)
+        with mock.patch('app.persistence.indexed_data_manager.json.loads', wraps=json.loads) as loads:
+            self.storage.get(self.reviews[3].id, 'Review')
+        loads.assert_called_once()
+        self.assertIn(b'Review 3', loads.call_args[0][0])
+
+    def test_find_by_decodes_only_the_matching_records(self):
+        for i, review in enumerate(self.reviews):
+            review.user_id = f'user-{i % 4}'
+        self.storage.save_many(self.reviews)
+        self.storage.save(User(email='Guest@Example.com', first_name='Ada', last_name='Lovelace'))
+        self.assertEqual(len(self.storage.find_by('Review', 'user_id', 'user-0')), 5)
+        self.reviews[1].user_id = 'user-0'
+        self.storage.save(self.reviews[1])
+        self.storage.delete(self.reviews[4].id, 'Review')
+        with mock.patch('app.persistence.indexed_data_manager.json.loads', wraps=json.loads) as loads:
+            found = self.storage.find_by('Review', 'user_id', 'user-0')
+        self.assertEqual(loads.call_count, len(found))
+        self.assertEqual(sorted(item['id'] for item in found),
+                         sorted(self.reviews[i].id for i in (0, 1, 8, 12, 16)))
+        self._reopen()
+        self.assertEqual(self.storage.find_by('User', 'email', 'guest@example.COM')[0]['first_name'], 'Ada')
+        self.assertEqual(len(self.storage.find_by_any('Review', 'user_id', ['user-0', 'user-1'])), 9)
+
+    def test_index_is_persisted(self):
+        self.storage.save_many(self.reviews)
+        self.reviews[0].comment = 'Updated'
+        self.storage.save(self.reviews[0])
+        self.storage.delete(self.reviews[1].id, 'Review')
+        self._reopen()
+        self.assertEqual(self.storage.get(self.reviews[0].id, 'Review')['comment'], 'Updated')
+        self.assertIsNone(self.storage.get(self.reviews[1].id, 'Review'))
+        self.assertEqual(len(self.storage.get_all('Review')), 19)
+
+    def test_reads_see_records_appended_after_mapping(self):
+        self.storage.save(self.reviews[0])
+        self.storage.get(self.reviews[0].id, 'Review')
+        amenity = Amenity(name='WiFi')
+        self.storage.save(amenity)
+        self.assertEqual(self.storage.get(amenity.id, 'Amenity')['name'], 'WiFi')
+
+    def test_compaction_reclaims_dead_records(self):
+        self._reopen(compact_threshold=1)
+        self.storage.save_many(self.reviews)
+        size = os.path.getsize(self.data_path)
+        self.storage.delete_many([review.id for review in self.reviews[:15]], 'Review')
+        self.assertLess(os.path.getsize(self.data_path), size)
+        self._reopen()
+        self.assertEqual(
+            sorted(item['id'] for item in self.storage.get_all('Review')),
+            sorted(review.id for review in self.reviews[15:])
+        )
+
+    def test_index_is_rebuilt_when_out_of_step(self):
+        self.storage.save_many(self.reviews)
+        self.storage.close()
+        with open(self.index_path, 'w') as f:
+            f.write(json.dumps({'generation': 'stale'}) + '\n')
+        self.storage = self._open()
+        self.assertEqual(len(self.storage.get_all('Review')), 20)
+
+    def test_writes_after_a_torn_tail_survive_a_restart(self):
+        for path, fragment in ((self.index_path, '["Review","abc",12'), (self.data_path, '["Review","abc",{"com')):
+            with self.subTest(path=path):
+                self.storage.save(self.reviews[0])
+                self.storage.close()
+                with open(path, 'a') as f:
+                    f.write(fragment)
+                self.storage = self._open()
+                amenity = Amenity(name='WiFi')
+                self.storage.save(amenity)
+                self._reopen()
+                self.assertEqual(self.storage.get(amenity.id, 'Amenity')['name'], 'WiFi')
+                self.assertIsNotNone(self.storage.get(self.reviews[0].id, 'Review'))
+
+    def test_threads_share_an_instance(self):
+        self._reopen(compact_threshold=1)
+        writers = [threading.Thread(target=lambda part=part: [self.storage.save(review) for review in part * 5])
+                   for part in (self.reviews[:10], self.reviews[10:])]
+        for writer in writers:
+            writer.start()
+        while any(writer.is_alive() for writer in writers):
+            self.assertLessEqual(len(self.storage.get_all('Review')), 20)
+        for writer in writers:
+            writer.join()
+        self._reopen()
+        self.assertEqual(sorted(item['comment'] for item in self.storage.get_all('Review')),
+                         sorted(review.comment for review in self.reviews))
+
+    def test_clear(self):
+        self.storage.save_many(self.reviews)
+        self.storage.clear('Review')
+        self._reopen()
+        self.assertEqual(self.storage.get_all('Review'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+from app.persistence.log_data_manager import LogDataManager
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.models.user import User
+
+class LogDataManagerTestCase(unittest.TestCase):
+    """
+    Test case for the LogDataManager class.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, 'data.log')
+        self.snapshot_path = os.path.join(self.tmp_dir.name, 'data.snapshot.json')
+        self.storage = self._open()
+        self.review = Review(user_id='123', place_id='456', rating=5, comment='Great place!')
+        self.amenity = Amenity(name='WiFi')
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def _open(self, compact_threshold=1000):
+        return LogDataManager(self.log_path, self.snapshot_path, compact_threshold=compact_threshold)
+
+    def _reopen(self, compact_threshold=1000):
+        self.storage.close()
+        self.storage = self._open(compact_threshold)
+
+    def test_save_and_get(self):
+        self.storage.save(self.review)
+        self.assertEqual(self.storage.get(self.review.id, 'Review')['comment'], 'Great place!')
+        self.assertEqual(len(self.storage.get_all('Review')), 1)
+
+    def test_each_write_appends_one_record(self):
+        self.storage.save(self.review)
+        self.storage.save(self.amenity)
+        self.storage.delete(self.amenity.id, 'Amenity')
+        with open(self.log_path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_log_is_replayed_on_startup(self):
+        self.storage.save(self.review)
+        self.review.comment = 'Updated comment'
+        self.storage.save(self.review)
+        self.storage.save(self.amenity)
+        self.storage.delete(self.amenity.id, 'Amenity')
+        self._reopen()
+        self.assertEqual(self.storage.get(self.review.id, 'Review')['comment'], 'Updated comment')
+        self.assertIsNone(self.storage.get(self.amenity.id, 'Amenity'))
+
+    def test_torn_last_record_is_ignored(self):
+        self.storage.save(self.review)
+        with open(self.log_path, 'a') as f:
+            f.write('{"op":"save","type":"Amen')
+        self._reopen()
+        self.assertIsNotNone(self.storage.get(self.review.id, 'Review'))
+
+    def test_writes_after_a_torn_record_survive_a_restart(self):
+        self.storage.save(self.review)
+        self.storage.close()
+        with open(self.log_path, 'a') as f:
+            f.write('{"op":"save","type":"Amen')
+        self.storage = self._open()
+        other = Amenity(name='Pool')
+        self.storage.save_many([self.amenity, other])
+        self._reopen()
+        self.assertEqual(len(self.storage.get_all('Amenity')), 2)
+        self.assertIsNotNone(self.storage.get(self.review.id, 'Review'))
+
+    def test_failed_appends_are_not_applied(self):
+        self.storage.save(self.amenity)
+        version = self.storage.version('Amenity')
+        unserializable = Amenity(name=datetime.now())
+        with self.assertRaises(TypeError):
+            self.storage.save(unserializable)
+        self.storage._log = mock.Mock(wraps=self.storage._log, write=mock.Mock(side_effect=OSError))
+        with self.assertRaises(OSError):
+            self.storage.save(self.review)
+        self.assertIsNone(self.storage.get(unserializable.id, 'Amenity'))
+        self.assertIsNone(self.storage.get(self.review.id, 'Review'))
+        self.assertEqual(self.storage.version('Amenity'), version)
+        self.storage.save(self.review)
+        self._reopen()
+        self.assertEqual(len(self.storage.get_all('Amenity')), 1)
+        self.assertIsNotNone(self.storage.get(self.review.id, 'Review'))
+
+    def test_threads_share_an_instance(self):
+        reviews = [Review(user_id='123', place_id='456', rating=5, comment=str(i)) for i in range(200)]
+        writers = [threading.Thread(target=lambda part=part: [self.storage.save(review) for review in part])
+                   for part in (reviews[:100], reviews[100:])]
+        for writer in writers:
+            writer.start()
+        while any(writer.is_alive() for writer in writers):
+            self.storage.get_all('Review')
+        for writer in writers:
+            writer.join()
+        self._reopen()
+        self.assertEqual(len(self.storage.get_all('Review')), 200)
+
+    def test_compaction_bounds_the_log(self):
+        self._reopen(compact_threshold=3)
+        for _ in range(4):
+            self.storage.save(self.review)
+        self.storage.save(self.amenity)
+        with open(self.log_path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertTrue(os.path.exists(self.snapshot_path))
+        self._reopen()
+        self.assertIsNotNone(self.storage.get(self.review.id, 'Review'))
+        self.assertIsNotNone(self.storage.get(self.amenity.id, 'Amenity'))
+
+    def test_bulk_operations_append_once(self):
+        reviews = [Review(user_id='123', place_id='456', rating=5, comment=f'Review {i}') for i in range(5)]
+        self.storage.save_many(reviews)
+        self.storage.delete_many([reviews[0].id, reviews[1].id, 'missing'], 'Review')
+        self._reopen()
+        ids = [review.id for review in reviews]
+        self.assertEqual([item['id'] for item in self.storage.get_many(ids, 'Review')], ids[2:])
+        with open(self.log_path) as f:
+            self.assertEqual(len(f.readlines()), 7)
+
+    def test_iter_all(self):
+        reviews = [Review(user_id='123', place_id='456', rating=5, comment=f'Review {i}') for i in range(5)]
+        self.storage.save_many(reviews)
+        self.assertEqual(sorted(item['id'] for item in self.storage.iter_all('Review')), sorted(review.id for review in reviews))
+
+    def test_patch_appends_changed_fields_only(self):
+        self.storage.save(self.review)
+        self.storage.patch(self.review, {'rating': 3})
+        with open(self.log_path) as f:
+            self.assertNotIn('Great place!', f.readlines()[-1])
+        self._reopen()
+        stored = self.storage.get(self.review.id, 'Review')
+        self.assertEqual((stored['rating'], stored['comment']), (3, 'Great place!'))
+
+    def test_find_by_uses_a_secondary_index(self):
+        reviews = [Review(user_id=f'user-{i % 3}', place_id='456', rating=5, comment=f'Review {i}') for i in range(9)]
+        self.storage.save_many(reviews)
+        self.storage.save(User(email='Guest@Example.com', first_name='Ada', last_name='Lovelace'))
+        with mock.patch.object(self.storage, 'get_all', wraps=self.storage.get_all) as get_all:
+            self.assertEqual(len(self.storage.find_by('Review', 'user_id', 'user-1')), 3)
+            self.storage.patch(reviews[0], {'user_id': 'user-1'})
+            self.storage.delete(reviews[1].id, 'Review')
+            self.assertEqual(sorted(item['id'] for item in self.storage.find_by('Review', 'user_id', 'user-1')),
+                             sorted(review.id for review in (reviews[0], reviews[4], reviews[7])))
+            self.assertEqual(self.storage.find_by('User', 'email', 'guest@example.COM')[0]['first_name'], 'Ada')
+        get_all.assert_not_called()
+        self._reopen()
+        self.assertEqual(len(self.storage.find_by_any('Review', 'user_id', ['user-1', 'user-2'])), 6)
+
+    def test_clear(self):
+        self.storage.save(self.review)
+        self.storage.clear('Review')
+        self._reopen()
+        self.assertEqual(self.storage.get_all('Review'), [])
+
+if __name__ == '__main__':
+    unittest.main()
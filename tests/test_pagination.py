@@ -0,0 +1,71 @@
+import os
+import re
+import unittest
+from app import create_app
+from app.api.v1.pagination import decode_cursor, encode_cursor
+from app.models.amenity import Amenity
+from app.persistence import create_storage
+from app.persistence.persistence_manager import IPersistenceManager
+from tests import StorageTestCase
+
+class PaginationTestCase(StorageTestCase):
+    """
+    Test case for the cursor pagination of the list endpoints and storage.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def _next(self, response):
+        match = re.match(r'<http://localhost(.*)>; rel="next"$', response.headers.get('Link', ''))
+        return match and match.group(1)
+
+    def test_pages_follow_the_next_link(self):
+        names = sorted(str(i) for i in range(7))
+        for name in names:
+            self.client.post('/api/v1/amenities/', json={'name': name})
+        url, seen = '/api/v1/amenities/?limit=3', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.get_json()), 3)
+            seen.extend(response.get_json())
+            url = self._next(response)
+        self.assertEqual([item['id'] for item in seen], sorted(item['id'] for item in seen))
+        self.assertEqual(sorted(item['name'] for item in seen), names)
+        response = self.client.get('/api/v1/amenities/')
+        self.assertEqual(len(response.get_json()), 7)
+        self.assertNotIn('Link', response.headers)
+
+    def test_invalid_parameters(self):
+        for query in ('limit=0', 'limit=abc', 'limit=100000', 'cursor=abc', 'cursor=' + encode_cursor(1)[:-2]):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/api/v1/places/?' + query).status_code, 400)
+        self.assertEqual(decode_cursor(encode_cursor('é/+')), 'é/+')
+
+    def test_backends_page_in_id_order(self):
+        amenities = [Amenity(name=str(i)) for i in range(5)]
+        ids = sorted(amenity.id for amenity in amenities)
+        for backend in ('json', 'indexed', 'log', 'sqlite'):
+            with self.subTest(backend=backend):
+                storage = create_storage(backend, **{
+                    'json': {'file_path': os.path.join(self.tmp_dir.name, 'page.json')},
+                    'indexed': {'data_path': os.path.join(self.tmp_dir.name, 'page.dat'),
+                                'index_path': os.path.join(self.tmp_dir.name, 'page.idx')},
+                    'log': {'log_path': os.path.join(self.tmp_dir.name, 'page.log'),
+                            'snapshot_path': os.path.join(self.tmp_dir.name, 'page.snapshot.json')},
+                    'sqlite': {'db_path': os.path.join(self.tmp_dir.name, 'page.db')},
+                }[backend])
+                try:
+                    storage.save_many(amenities)
+                    self.assertEqual([item['id'] for item in storage.page('Amenity', 2)], ids[:2])
+                    self.assertEqual([item['id'] for item in storage.page('Amenity', 2, ids[1])], ids[2:4])
+                    self.assertEqual([item['id'] for item in IPersistenceManager.page(storage, 'Amenity', 9, ids[3])],
+                                     ids[4:])
+                finally:
+                    storage.close()
+
+if __name__ == '__main__':
+    unittest.main()
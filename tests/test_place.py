@@ -68,5 +68,11 @@ class PlaceModelTestCase(unittest.TestCase):
         places = Place.get_all()
         self.assertEqual(len(places), 2)
 
+    def test_in_city_and_hosted_by(self):
+        self.place.save()
+        self.assertEqual([place.id for place in Place.in_city("city123")], [self.place.id])
+        self.assertEqual([place.id for place in Place.hosted_by("host123")], [self.place.id])
+        self.assertEqual(Place.in_city("other"), [])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,15 @@
 import unittest
 import json
 from app import create_app
+from tests import StorageTestCase
 
-class PlaceEndpointsTestCase(unittest.TestCase):
+class PlaceEndpointsTestCase(StorageTestCase):
     """
     Test case for the endpoints related to the Place resource.
     """
 
     def setUp(self):
+        super().setUp()
         self.app = create_app()
         self.client = self.app.test_client()
 
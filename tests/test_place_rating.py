@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from app import create_app
+from app.models.place_rating import PlaceRating
+from app.models.review import Review
+from app.persistence import create_storage, storage
+from tests import StorageTestCase
+
+class PlaceRatingTestCase(StorageTestCase):
+    """
+    Test case for the rating aggregates maintained with the reviews.
+    """
+
+    def setUp(self):
+        super().setUp()
+
+    def _summary(self, place_id):
+        return PlaceRating.summaries([place_id])[place_id]
+
+    def test_save_counts_the_review_in_one_commit(self):
+        review = Review(user_id='u1', place_id='p1', rating=4, comment='Nice')
+        with mock.patch.object(self.storage, 'commit', wraps=self.storage.commit) as commit:
+            review.save()
+        commit.assert_called_once()
+        Review(user_id='u2', place_id='p1', rating=5, comment='Great').save()
+        self.assertEqual(self._summary('p1'), {'count': 2, 'average': 4.5, 'histogram': [0, 0, 0, 1, 1]})
+
+    def test_rating_change_and_move(self):
+        review = Review(user_id='u1', place_id='p1', rating=4, comment='Nice')
+        review.save()
+        review = Review.get(review.id)
+        review.rating = 2
+        review.save()
+        self.assertEqual(self._summary('p1')['histogram'], [0, 1, 0, 0, 0])
+        review.place_id = 'p2'
+        review.save()
+        self.assertEqual(self._summary('p1'), {'count': 0, 'average': None, 'histogram': [0] * 5})
+        self.assertEqual(self._summary('p2')['count'], 1)
+        with mock.patch.object(PlaceRating, 'for_reviews') as for_reviews:
+            review.comment = 'Changed my mind'
+            review.save()
+        for_reviews.assert_not_called()
+
+    def test_delete_counts_the_review_out(self):
+        reviews = [Review(user_id='u1', place_id='p1', rating=i, comment='') for i in range(1, 6)]
+        Review.save_many(reviews)
+        self.assertEqual(self._summary('p1')['count'], 5)
+        Review.get(reviews[0].id).delete()
+        Review.delete_many([reviews[1].id, reviews[2].id, 'missing'])
+        self.assertEqual(self._summary('p1'), {'count': 2, 'average': 4.5, 'histogram': [0, 0, 0, 1, 1]})
+
+    def test_missing_aggregates_are_rebuilt(self):
+        reviews = [Review(user_id='u1', place_id='p1', rating=3, comment='') for _ in range(2)]
+        Review.save_many(reviews)
+        self.storage.delete('p1', 'PlaceRating')
+        Review(user_id='u2', place_id='p1', rating=5, comment='').save()
+        self.assertEqual(self._summary('p1')['histogram'], [0, 0, 2, 0, 1])
+        self.storage.delete('p1', 'PlaceRating')
+        Review.get(reviews[0].id).delete()
+        self.assertEqual(self._summary('p1')['count'], 2)
+
+    def test_concurrent_reviews_are_all_counted(self):
+        add = PlaceRating.add
+
+        def slow_add(aggregate, *args):
+            time.sleep(0.001)
+            return add(aggregate, *args)
+
+        def post():
+            for _ in range(10):
+                Review(user_id='u1', place_id='p1', rating=5, comment='').save()
+
+        for backend in ('json', 'sqlite'):
+            with self.subTest(backend=backend):
+                if backend == 'sqlite':
+                    storage.use(create_storage('sqlite', db_path=os.path.join(self.tmp_dir.name, 'data.db')))
+                threads = [threading.Thread(target=post) for _ in range(4)]
+                with mock.patch.object(PlaceRating, 'add', slow_add):
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                self.assertEqual(self._summary('p1')['count'], 40)
+
+    def test_place_api_includes_ratings(self):
+        client = create_app().test_client()
+        place_id = client.post('/api/v1/places/', data=json.dumps({
+            'name': 'New Place',
+            'description': 'A nice place'
+        }), content_type='application/json').get_json()['id']
+        Review(user_id='u1', place_id=place_id, rating=4, comment='Nice').save()
+        rating = client.get(f'/api/v1/places/{place_id}').get_json()['rating']
+        self.assertEqual(rating, {'count': 1, 'average': 4.0, 'histogram': [0, 0, 0, 1, 0]})
+        places = client.get('/api/v1/places/').get_json()
+        self.assertEqual([place['rating']['count'] for place in places if place['id'] == place_id], [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import re
+import unittest
+from datetime import datetime
+from unittest import mock
+from app import create_app
+from app.models.place import Place
+from app.persistence import create_storage, storage
+from app.persistence.persistence_manager import IPersistenceManager, select, sort_key
+from tests import StorageTestCase
+
+class PlaceSearchTestCase(StorageTestCase):
+    """
+    Test case for the filtering and sorting of the place list and storage queries.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.places = {}
+        for name, city_id, price, guests in (('a', 'c1', 50.0, 2), ('b', 'c1', 120.0, 4), ('c', 'c2', 80.0, 6),
+                                             ('d', 'c1', 80.0, 3), ('e', 'c2', None, 1)):
+            place = self.client.post('/api/v1/places/', json={
+                'name': name, 'description': '', 'city_id': city_id, 'price_per_night': price,
+                'max_guests': guests, 'num_rooms': guests // 2, 'num_bathrooms': 1,
+            }).get_json()
+            self.places[place['id']] = name
+
+    def _names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [self.places[place['id']] for place in response.get_json()]
+
+    def test_filters(self):
+        self.assertEqual(sorted(self._names('/api/v1/places/?city_id=c1')), ['a', 'b', 'd'])
+        self.assertEqual(sorted(self._names('/api/v1/places/?min_price=60&max_price=100')), ['c', 'd'])
+        self.assertEqual(sorted(self._names('/api/v1/places/?city_id=c1&min_guests=3')), ['b', 'd'])
+        self.assertEqual(sorted(self._names('/api/v1/places/?min_rooms=2&min_bathrooms=1')), ['b', 'c'])
+        self.assertEqual(self._names('/api/v1/places/?host_id=nobody'), [])
+
+    def test_sort(self):
+        names = self._names('/api/v1/places/?sort=price_per_night')
+        self.assertEqual(names[:2] + names[4:], ['e', 'a', 'b'])
+        self.assertEqual(sorted(names[2:4]), ['c', 'd'])
+        self.assertEqual(self._names('/api/v1/places/?sort=-price_per_night&max_price=100')[-1], 'a')
+        self.assertEqual(self._names('/api/v1/places/?sort=-created_at'), ['e', 'd', 'c', 'b', 'a'])
+
+    def test_sorted_pages_follow_the_next_link(self):
+        for fields in ('', '&fields=name'):
+            with self.subTest(fields=fields):
+                url, seen = '/api/v1/places/?sort=-price_per_night&limit=2' + fields, []
+                while url:
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    seen.extend(self.places[place['id']] if 'id' in place else place['name']
+                                for place in response.get_json())
+                    match = re.match(r'<http://localhost(.*)>; rel="next"$', response.headers.get('Link', ''))
+                    url = match and match.group(1)
+                self.assertEqual(seen, self._names('/api/v1/places/?sort=-price_per_night'))
+
+    def test_invalid_parameters(self):
+        for query in ('min_price=abc', 'min_guests=1.5', 'sort=name', 'sort=price_per_night&cursor=abc'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/api/v1/places/?' + query).status_code, 400)
+
+    def test_search_reads_the_indexes(self):
+        with mock.patch.object(storage.manager, 'iter_all') as iter_all, \
+                mock.patch('app.persistence.data_manager.select', wraps=select) as spy:
+            self.assertEqual(self._names('/api/v1/places/?sort=price_per_night&limit=1'), ['e'])
+            self.assertEqual(len(self._names('/api/v1/places/?city_id=c2&min_price=10')), 1)
+        iter_all.assert_not_called()
+        self.assertEqual(len(spy.call_args[0][1]), 2)
+
+    def test_backends_agree_with_a_scan(self):
+        places = [Place(str(i), '', '', 'c%d' % (i % 3), 0, 0, 'h', i % 4, 1, [None, 10, 25.5, 40, '30'][i % 5], i % 5)
+                  for i in range(40)]
+        queries = [((), 'price_per_night'), ((('city_id', '=', 'c1'),), '-price_per_night'),
+                   ((('price_per_night', '>=', 20), ('price_per_night', '<=', 40)), None),
+                   ((('max_guests', '>=', 2),), '-created_at'), ((('price_per_night', '>=', 20),), None),
+                   ((('price_per_night', '<=', '5'),), 'price_per_night')]
+        for backend in ('json', 'sqlite'):
+            manager = create_storage(backend, **{
+                'json': {'file_path': os.path.join(self.tmp_dir.name, 'query.json')},
+                'sqlite': {'db_path': os.path.join(self.tmp_dir.name, 'query.db')},
+            }[backend])
+            try:
+                manager.save_many(places)
+                for filters, order in queries:
+                    with self.subTest(backend=backend, filters=filters, order=order):
+                        expected = [item['id'] for item in IPersistenceManager.query(manager, 'Place', filters, order)]
+                        seen, after = [], None
+                        while True:
+                            page = manager.query('Place', filters, order, 3, after, ('price_per_night', 'created_at'))
+                            seen.extend(item['id'] for item in page)
+                            if len(page) < 3:
+                                break
+                            after = sort_key(page[-1], order)
+                        self.assertEqual(seen, expected)
+            finally:
+                manager.close()
+
+    def test_timestamps_sort_in_time_order_across_formats(self):
+        places = [Place(str(i), '', '', 'c1', 0, 0, 'h', 1, 1, 10, 1) for i in range(6)]
+        for i, place in enumerate(places):
+            place.created_at = datetime(2024, 1, 1 + i, 12, 0, 0, i)
+        for backend, option, path in (('json', 'file_path', 'mixed.json'), ('sqlite', 'db_path', 'mixed.db')):
+            with self.subTest(backend=backend):
+                options = {option: os.path.join(self.tmp_dir.name, path)}
+                for timestamp_format, written in (('iso', places[::2]), ('epoch_us', places[1::2])):
+                    manager = create_storage(backend, timestamp_format=timestamp_format, **options)
+                    manager.save_many(written)
+                    manager.close()
+                manager = create_storage(backend, timestamp_format='epoch_us', **options)
+                try:
+                    newest = manager.query('Place', (), '-created_at')
+                    self.assertEqual([item['name'] for item in newest], ['5', '4', '3', '2', '1', '0'])
+                    page = manager.query('Place', (), 'created_at', 2, sort_key(newest[3], 'created_at'))
+                    self.assertEqual([item['name'] for item in page], ['3', '4'])
+                    since = manager.query('Place', (('created_at', '>=', '2024-01-04T00:00:00'),), 'created_at')
+                    self.assertEqual([item['name'] for item in since], ['3', '4', '5'])
+                finally:
+                    manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
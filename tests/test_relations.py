@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+from app.models.city import City
+from app.models.place import Place
+from app.models.relations import prefetch
+from app.models.review import Review
+from app.models.user import User
+from tests import StorageTestCase
+
+class RelationsTestCase(StorageTestCase):
+    """
+    Test case for the relationship accessors and prefetch.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.city = City(name='Paris', country_code='FR')
+        self.hosts = [User(email=f'host{i}@example.com', first_name='Host', last_name=str(i)) for i in range(2)]
+        self.places = [self._place(f'Place {i}', self.hosts[i % 2].id) for i in range(4)]
+        self.reviews = [Review(user_id=self.hosts[0].id, place_id=self.places[i % 3].id, rating=4, comment='Nice')
+                        for i in range(6)]
+        self.city.save()
+        User.save_many(self.hosts)
+        Place.save_many(self.places)
+        Review.save_many(self.reviews)
+
+    def _place(self, name, host_id):
+        return Place(name=name, description='Nice', address='1 Main St', city_id=self.city.id,
+                     latitude=1.0, longitude=2.0, host_id=host_id, num_rooms=1,
+                     num_bathrooms=1, price_per_night=50.0, max_guests=2)
+
+    def test_accessors(self):
+        place = self.places[1]
+        self.assertEqual(place.host.id, self.hosts[1].id)
+        self.assertEqual(place.city.name, 'Paris')
+        self.assertEqual(len(place.reviews), 2)
+        self.assertEqual(len(self.city.places), 4)
+        self.assertEqual(self.reviews[0].place.id, self.places[0].id)
+        self.assertEqual(len(self.hosts[0].reviews), 6)
+        self.assertEqual(len(self.hosts[1].places), 2)
+
+    def test_prefetch_uses_one_storage_call_per_relation(self):
+        places = Place.get_all()
+        with mock.patch.object(self.storage, 'get_many', wraps=self.storage.get_many) as get_many, \
+                mock.patch.object(self.storage, 'find_by_any', wraps=self.storage.find_by_any) as find_by_any:
+            prefetch(places, 'host', 'reviews.user')
+        self.assertEqual(get_many.call_count, 2)
+        find_by_any.assert_called_once()
+        with mock.patch.object(self.storage, 'get') as get, mock.patch.object(self.storage, 'find_by') as find_by:
+            counts = {place.name: (place.host.last_name, len(place.reviews)) for place in places}
+            self.assertEqual(places[0].reviews[0].user.id, self.hosts[0].id)
+        get.assert_not_called()
+        find_by.assert_not_called()
+        self.assertEqual(counts['Place 3'], ('1', 0))
+        self.assertEqual(counts['Place 0'], ('0', 2))
+
+    def test_changed_foreign_key_is_not_served_from_prefetch(self):
+        place = self.places[0]
+        prefetch([place], 'host')
+        place.host_id = self.hosts[1].id
+        self.assertEqual(place.host.id, self.hosts[1].id)
+
+    def test_unknown_relation(self):
+        with self.assertRaises(ValueError):
+            prefetch(self.places, 'owner')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import threading
+import unittest
+from unittest import mock
+from app import create_app, repositories
+from app.models import use_storage
+from app.models.amenity import Amenity
+from app.models.user import User
+from app.persistence.data_manager import DataManager
+from app.persistence.log_data_manager import LogDataManager
+from app.persistence.sqlite_data_manager import SQLiteDataManager
+from app.repositories import Repository, repository
+from tests import StorageTestCase
+
+class RepositoryTestCase(StorageTestCase):
+    """
+    Test case for the repositories and their read-through cache.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.amenities = Repository(Amenity, cache_size=2)
+
+    def test_reads_are_served_from_the_cache(self):
+        amenity = self.amenities.create({'name': 'WiFi', 'id': 'ignored'})
+        self.assertEqual(self.amenities.get(amenity.id).name, 'WiFi')
+        with mock.patch.object(self.storage, 'get') as get:
+            self.assertEqual(self.amenities.get(amenity.id).name, 'WiFi')
+        get.assert_not_called()
+        self.assertIsNone(self.amenities.get('missing'))
+
+    def test_writes_of_other_workers_invalidate_the_cache(self):
+        amenity = self.amenities.create({'name': 'WiFi'})
+        self.amenities.get(amenity.id)
+        other = DataManager(self.file_path)
+        other.delete(amenity.id, 'Amenity')
+        self.assertIsNone(self.amenities.get(amenity.id))
+        self.amenities.create({'name': 'Pool'})
+        self.assertIsNone(self.amenities.get(amenity.id))
+
+    def test_update_and_delete(self):
+        amenity = self.amenities.create({'name': 'WiFi'})
+        self.amenities.get(amenity.id)
+        self.assertEqual(self.amenities.update(amenity.id, {'name': 'Pool', 'other': 1}).name, 'Pool')
+        self.assertEqual(Amenity.get(amenity.id).name, 'Pool')
+        self.assertIsNone(self.amenities.update('missing', {'name': 'Spa'}))
+        self.assertTrue(self.amenities.delete(amenity.id))
+        self.assertFalse(self.amenities.delete(amenity.id))
+        self.assertEqual(self.amenities.list(), [])
+
+    def test_cache_is_bounded(self):
+        created = [self.amenities.create({'name': str(i)}) for i in range(3)]
+        for amenity in created:
+            self.amenities.get(amenity.id)
+        self.assertEqual(list(self.amenities._cache), [created[1].id, created[2].id])
+
+    def test_cache_is_not_shared_between_storages(self):
+        use_storage(LogDataManager(os.path.join(self.tmp_dir.name, 'a.log'), os.path.join(self.tmp_dir.name, 'a.json')))
+        amenity = self.amenities.create({'name': 'WiFi'})
+        self.amenities.get(amenity.id)
+        use_storage(LogDataManager(os.path.join(self.tmp_dir.name, 'b.log'), os.path.join(self.tmp_dir.name, 'b.json')))
+        self.assertIsNone(self.amenities.get(amenity.id))
+
+    def test_cache_follows_writes_of_other_sqlite_connections(self):
+        use_storage(SQLiteDataManager(os.path.join(self.tmp_dir.name, 'data.db')))
+        amenity = self.amenities.create({'name': 'WiFi'})
+        names = []
+
+        def in_thread(target):
+            thread = threading.Thread(target=target)
+            thread.start()
+            thread.join()
+
+        in_thread(lambda: self.amenities.get(amenity.id))
+        amenity.name = 'Fast WiFi'
+        in_thread(amenity.save)
+        in_thread(lambda: names.append(self.amenities.get(amenity.id).name))
+        self.assertEqual(names, ['Fast WiFi'])
+
+    def test_storage_without_version_is_not_cached(self):
+        amenity = self.amenities.create({'name': 'WiFi'})
+        with mock.patch.object(self.storage, 'version', return_value=None), \
+                mock.patch.object(self.storage, 'get', wraps=self.storage.get) as get:
+            self.amenities.get(amenity.id)
+            self.amenities.get(amenity.id)
+        self.assertEqual(get.call_count, 2)
+
+    def test_shared_repositories_are_configured_from_create_app(self):
+        users = repository(User)
+        self.assertIs(repository(User), users)
+        try:
+            create_app({'REPOSITORY_CACHE_SIZE': 10})
+            self.assertEqual(users.cache_size, 10)
+            self.assertEqual(repository(Amenity).cache_size, 10)
+        finally:
+            repositories.configure()
+
+if __name__ == '__main__':
+    unittest.main()
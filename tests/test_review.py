@@ -42,5 +42,20 @@ class ReviewModelTestCase(unittest.TestCase):
         retrieved_review = Review.get(review_id)
         self.assertIsNone(retrieved_review)
 
+    def test_save_many_get_many_delete_many(self):
+        reviews = [Review(user_id='123', place_id='456', rating=4, comment=f'Review {i}') for i in range(3)]
+        Review.save_many(reviews)
+        ids = [review.id for review in reviews]
+        self.assertEqual([review.comment for review in Review.get_many(ids)], ['Review 0', 'Review 1', 'Review 2'])
+        Review.delete_many(ids)
+        self.assertEqual(Review.get_many(ids), [])
+
+    def test_for_place(self):
+        self.review.save()
+        other = Review(user_id='123', place_id='789', rating=3, comment='Okay')
+        other.save()
+        self.assertIn(self.review.id, [review.id for review in Review.for_place('456')])
+        self.assertNotIn(other.id, [review.id for review in Review.for_place('456')])
+
 if __name__ == '__main__':
     unittest.main()
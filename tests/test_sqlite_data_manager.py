@@ -0,0 +1,163 @@
+import gc
+import os
+import sqlite3
+import threading
+import unittest
+from app import create_app
+from app.models.place import Place
+from app.models.user import User
+from app.persistence.sqlite_data_manager import SQLiteDataManager
+from tests import StorageTestCase
+
+class SQLiteDataManagerTestCase(StorageTestCase):
+    """
+    Test case for the SQLiteDataManager class.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.db_path = os.path.join(self.tmp_dir.name, 'data.db')
+        self.storage = SQLiteDataManager(self.db_path)
+        self.user = User(email='test@example.com', first_name='John', last_name='Doe', password='password')
+
+    def tearDown(self):
+        self.storage.close()
+
+    def test_save_and_get(self):
+        self.storage.save(self.user)
+        retrieved_user = self.storage.get(self.user.id, 'User')
+        self.assertEqual(retrieved_user['email'], 'test@example.com')
+        self.assertIsNone(self.storage.get('missing', 'User'))
+
+    def test_update(self):
+        self.storage.save(self.user)
+        self.user.first_name = 'Jane'
+        self.storage.update(self.user)
+        self.assertEqual(self.storage.get(self.user.id, 'User')['first_name'], 'Jane')
+        self.assertEqual(len(self.storage.get_all('User')), 1)
+
+    def test_delete_and_clear(self):
+        self.storage.save(self.user)
+        self.storage.delete(self.user.id, 'User')
+        self.assertIsNone(self.storage.get(self.user.id, 'User'))
+        self.storage.save(self.user)
+        self.storage.clear('User')
+        self.assertEqual(self.storage.get_all('User'), [])
+
+    def test_bulk_operations(self):
+        users = [User(email=f'user{i}@example.com', first_name='U', last_name=str(i)) for i in range(5)]
+        self.storage.save_many(users)
+        ids = [user.id for user in users]
+        self.assertEqual([item['id'] for item in self.storage.get_many(ids[::-1] + ['missing'], 'User')], ids[::-1])
+        self.storage.delete_many(ids[:3], 'User')
+        self.assertEqual(len(self.storage.get_all('User')), 2)
+
+    def test_iter_all_fetches_in_batches(self):
+        users = [User(email=f'user{i}@example.com', first_name='U', last_name=str(i)) for i in range(7)]
+        self.storage.save_many(users)
+        found = list(self.storage.iter_all('User', batch_size=3))
+        self.assertEqual([item['id'] for item in found], sorted(user.id for user in users))
+        self.assertEqual(list(self.storage.iter_all('Place', batch_size=3)), [])
+
+    def test_patch_updates_changed_fields_in_place(self):
+        self.storage.save(self.user)
+        self.user.first_name = 'Jane'
+        self.storage.patch(self.user, {'first_name': 'Jane', 'password': None})
+        stored = self.storage.get(self.user.id, 'User')
+        self.assertEqual(stored['first_name'], 'Jane')
+        self.assertIn('password', stored)
+        self.assertIsNone(stored['password'])
+        self.assertEqual(stored['last_name'], 'Doe')
+
+    def test_patch_saves_missing_entity(self):
+        self.storage.patch(self.user, {'first_name': 'John'})
+        self.assertEqual(self.storage.get(self.user.id, 'User')['email'], 'test@example.com')
+
+    def test_find_by_uses_index(self):
+        self.storage.save(self.user)
+        self.assertEqual(self.storage.find_by('User', 'email', 'test@example.com')[0]['id'], self.user.id)
+        self.assertEqual(self.storage.find_by('User', 'email', 'other@example.com'), [])
+        sql = self.storage._sql('User', 'find_by', 'email')
+        plan = self.storage._connection().execute('EXPLAIN QUERY PLAN ' + sql, ('x',)).fetchall()
+        self.assertIn('User_email', plan[0][-1])
+
+    def test_find_by_email_ignores_case(self):
+        self.storage.save(self.user)
+        self.assertEqual(self.storage.find_by('User', 'email', 'Test@Example.com')[0]['id'], self.user.id)
+        sql = self.storage._sql('User', 'find_by', 'email')
+        plan = self.storage._connection().execute('EXPLAIN QUERY PLAN ' + sql, ('x',)).fetchall()
+        self.assertIn('User_email_lower', plan[0][-1])
+
+    def test_find_by_any_uses_index(self):
+        users = [User(email=f'user{i}@example.com', first_name='U', last_name=str(i)) for i in range(3)]
+        self.storage.save_many(users)
+        found = self.storage.find_by_any('User', 'email', ['USER0@example.com', 'user2@example.com', 'missing'])
+        self.assertEqual(sorted(item['id'] for item in found), sorted([users[0].id, users[2].id]))
+        sql = self.storage._sql('User', 'find_by_any', 'email')
+        plan = self.storage._connection().execute('EXPLAIN QUERY PLAN ' + sql, ('[]',)).fetchall()
+        self.assertTrue(any('User_email_lower' in row[-1] for row in plan))
+
+    def test_wal_mode(self):
+        mode = self.storage._connection().execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_connection_per_thread(self):
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(self.storage._connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], self.storage._connection())
+        self.assertIs(self.storage._connection(), self.storage._connection())
+
+    def test_connections_of_exited_threads_are_closed(self):
+        connections, opened = [], len(self.storage._connections)
+        for _ in range(20):
+            thread = threading.Thread(target=lambda: connections.append(self.storage._connection()))
+            thread.start()
+            thread.join()
+        gc.collect()
+        self.assertEqual(len(self.storage._connections), opened)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connections[0].execute('SELECT 1')
+        self.assertIsNotNone(self.storage._connection().execute('SELECT 1').fetchone())
+
+    def test_writes_are_visible_to_other_threads(self):
+        thread = threading.Thread(target=self.storage.save, args=(self.user,))
+        thread.start()
+        thread.join()
+        self.assertIsNotNone(self.storage.get(self.user.id, 'User'))
+
+    def test_version_changes_with_writes_of_any_connection(self):
+        version = self.storage.version('User')
+        self.assertEqual(self.storage.version('User'), version)
+        self.storage.save(self.user)
+        self.assertNotEqual(self.storage.version('User'), version)
+        version = self.storage.version('User')
+        thread = threading.Thread(target=self.storage.delete, args=(self.user.id, 'User'))
+        thread.start()
+        thread.join()
+        self.assertNotEqual(self.storage.version('User'), version)
+
+    def test_tables_created_in_a_rolled_back_transaction_are_created_again(self):
+        with self.assertRaises(RuntimeError):
+            with self.storage.transaction(['User']):
+                self.storage.save(self.user)
+                raise RuntimeError
+        self.assertIsNone(self.storage.get(self.user.id, 'User'))
+        self.storage.save(self.user)
+        self.assertEqual(self.storage.get(self.user.id, 'User')['email'], 'test@example.com')
+
+    def test_invalid_entity_type(self):
+        with self.assertRaises(ValueError):
+            self.storage.get('1', 'User"; DROP TABLE User; --')
+
+    def test_backend_selected_from_create_app(self):
+        create_app({'STORAGE_BACKEND': 'sqlite', 'STORAGE_OPTIONS': {'db_path': self.db_path}})
+        place = Place(name='Loft', description='Nice', address='1 Main St', city_id='c1',
+                      latitude=1.0, longitude=2.0, host_id='h1', num_rooms=1,
+                      num_bathrooms=1, price_per_night=50.0, max_guests=2)
+        place.save()
+        self.assertEqual(self.storage.get(place.id, 'Place')['name'], 'Loft')
+
+if __name__ == '__main__':
+    unittest.main()
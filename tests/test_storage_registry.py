@@ -0,0 +1,62 @@
+import os
+import unittest
+from unittest import mock
+from app import create_app
+from app.models import base_model, use_storage
+from app.models.amenity import Amenity
+from app.persistence import StorageRegistry, create_storage, storage
+from app.persistence.data_manager import DataManager
+from app.persistence.sqlite_data_manager import SQLiteDataManager
+from tests import StorageTestCase
+
+class StorageRegistryTestCase(StorageTestCase):
+    """
+    Test case for the shared storage registry.
+    """
+
+    def setUp(self):
+        super().setUp()
+
+    def test_default_manager_is_created_on_first_use(self):
+        registry = StorageRegistry('json', file_path=self.file_path)
+        with mock.patch('app.persistence.create_storage', wraps=create_storage) as create:
+            registry.save(Amenity(name='WiFi'))
+            registry.get_all('Amenity')
+        create.assert_called_once_with('json', file_path=self.file_path)
+        self.assertIsInstance(registry.manager, DataManager)
+
+    def test_configure_sets_the_backend_path(self):
+        manager = storage.configure('json', self.file_path, fsync=False)
+        self.assertEqual((manager.file_path, manager.fsync), (self.file_path, False))
+        self.assertIs(storage.manager, manager)
+
+    def test_use_closes_the_previous_manager(self):
+        previous = storage.configure('json', self.file_path)
+        with mock.patch.object(previous, 'close') as close:
+            use_storage(DataManager(self.file_path))
+        close.assert_called_once()
+
+    def test_use_can_keep_the_previous_manager_to_restore_it(self):
+        with mock.patch.object(self.storage, 'close') as close:
+            previous = storage.use(DataManager(self.file_path), close=False)
+            self.assertIs(previous, self.storage)
+            storage.use(previous)
+        close.assert_not_called()
+        self.assertIs(storage.manager, self.storage)
+
+    def test_models_share_the_manager_configured_by_create_app(self):
+        db_path = os.path.join(self.tmp_dir.name, 'data.db')
+        create_app({'STORAGE_BACKEND': 'sqlite', 'STORAGE_PATH': db_path})
+        self.assertIs(base_model.storage, storage)
+        self.assertIsInstance(storage.manager, SQLiteDataManager)
+        amenity = Amenity(name='WiFi')
+        amenity.save()
+        self.assertEqual(storage.manager.get(amenity.id, 'Amenity')['name'], 'WiFi')
+
+    def test_create_app_keeps_the_manager_without_storage_config(self):
+        manager = storage.configure('json', self.file_path)
+        create_app()
+        self.assertIs(storage.manager, manager)
+
+if __name__ == '__main__':
+    unittest.main()
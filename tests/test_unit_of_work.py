@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+from app import create_app
+from app.models import base_model, unit_of_work
+from app.models.amenity import Amenity
+from app.models.user import User
+from tests import StorageTestCase
+
+class UnitOfWorkTestCase(StorageTestCase):
+    """
+    Test case for the per-request identity map and unit of work.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.app = create_app()
+        self.amenity = Amenity(name='WiFi')
+        self.amenity.save()
+
+    def test_identity_map_returns_the_loaded_instance(self):
+        with self.app.app_context():
+            first = Amenity.get(self.amenity.id)
+            with mock.patch.object(self.storage, 'get') as get:
+                self.assertIs(Amenity.get(self.amenity.id), first)
+            get.assert_not_called()
+            self.assertIs(Amenity.get_all()[0], first)
+        self.assertIsNot(Amenity.get(self.amenity.id), Amenity.get(self.amenity.id))
+
+    def test_iter_all_does_not_fill_the_identity_map(self):
+        Amenity.save_many([Amenity(name=str(i)) for i in range(50)])
+        with self.app.app_context():
+            first = Amenity.get(self.amenity.id)
+            loaded = {amenity.id: amenity for amenity in Amenity.iter_all(batch_size=10)}
+            self.assertEqual(len(loaded), 51)
+            self.assertIs(loaded[self.amenity.id], first)
+            self.assertEqual(list(unit_of_work.current().identity_map), [('Amenity', self.amenity.id)])
+
+    def test_saves_are_committed_together_after_the_request(self):
+        @self.app.route('/_create')
+        def create():
+            Amenity(name='Pool').save()
+            Amenity(name='Gym').save()
+            self.assertEqual(len(self.storage.get_all('Amenity')), 1)
+            return 'ok'
+
+        with mock.patch.object(self.storage, 'save_many', wraps=self.storage.save_many) as save_many:
+            self.assertEqual(self.app.test_client().get('/_create').status_code, 200)
+        save_many.assert_called_once()
+        self.assertEqual(len(self.storage.get_all('Amenity')), 3)
+
+    def test_saves_are_discarded_when_the_request_fails(self):
+        @self.app.route('/_fail')
+        def fail():
+            Amenity(name='Pool').save()
+            raise RuntimeError('boom')
+
+        self.assertEqual(self.app.test_client().get('/_fail').status_code, 500)
+        self.assertEqual(len(self.storage.get_all('Amenity')), 1)
+
+    def test_queries_see_pending_saves(self):
+        with self.app.app_context():
+            User(email='a@example.com', first_name='A', last_name='B').save()
+            with self.assertRaises(ValueError):
+                User(email='A@example.com', first_name='C', last_name='D').save()
+            self.assertEqual(len(Amenity.find_by('name', 'WiFi')), 1)
+
+    def test_delete_forgets_pending_entity(self):
+        with self.app.app_context():
+            pool = Amenity(name='Pool')
+            pool.save()
+            pool.delete()
+        self.assertIsNone(self.storage.get(pool.id, 'Amenity'))
+
+    def test_no_unit_of_work_outside_app_context(self):
+        with mock.patch.object(base_model.storage, 'save') as save:
+            Amenity(name='Pool').save()
+        save.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 from app.models.user import User
 from app.persistence.data_manager import DataManager
 
@@ -34,6 +35,45 @@ class DataManagerTestCase(unittest.TestCase):
         self.assertEqual(retrieved_user.last_name, self.user.last_name)
         self.assertEqual(retrieved_user.password, self.user.password)  # Assurez-vous que le mot de passe est géré correctement
 
+    def test_save_many_rejects_duplicate_emails(self):
+        twin = User(email="test@example.com", first_name="Twin", last_name="User")
+        with self.assertRaises(ValueError):
+            User.save_many([self.user, twin])
+        self.assertEqual(User.get_all(), [])
+
+    def test_save_many(self):
+        other = User(email="other@example.com", first_name="Other", last_name="User")
+        User.save_many([self.user, other])
+        self.assertEqual(len(User.get_many([self.user.id, other.id])), 2)
+
+    def test_by_email(self):
+        self.user.save()
+        self.assertEqual(User.by_email("test@example.com").id, self.user.id)
+        self.assertIsNone(User.by_email("missing@example.com"))
+
+    def test_get_by_email_ignores_case(self):
+        self.user.save()
+        self.assertEqual(User.get_by_email("Test@Example.COM").id, self.user.id)
+        self.assertIsNone(User.get_by_email("missing@example.com"))
+
+    def test_save_rejects_email_differing_only_in_case(self):
+        self.user.save()
+        twin = User(email="TEST@example.com", first_name="Twin", last_name="User")
+        with self.assertRaises(ValueError):
+            twin.save()
+        with self.assertRaises(ValueError):
+            User.save_many([twin])
+        self.user.first_name = "Renamed"
+        self.user.save()
+
+    def test_email_check_does_not_load_all_users(self):
+        self.user.save()
+        with mock.patch.object(User, 'get_all') as get_all, \
+                mock.patch.object(DataManager, 'get_all') as storage_get_all:
+            self.assertTrue(User(email="new@example.com", first_name="New", last_name="User").is_email_unique())
+        get_all.assert_not_called()
+        storage_get_all.assert_not_called()
+
     def tearDown(self):
         self.storage.clear('User')
 
@@ -1,8 +1,9 @@
 import unittest
 import json
 from app import create_app
+from tests import StorageTestCase
 
-class UserEndpointsTestCase(unittest.TestCase):
+class UserEndpointsTestCase(StorageTestCase):
     """
     Test case for the user endpoints.
 
@@ -10,6 +11,7 @@ class UserEndpointsTestCase(unittest.TestCase):
     """
 
     def setUp(self):
+        super().setUp()
         self.app = create_app()
         self.client = self.app.test_client()
 